@@ -0,0 +1,121 @@
+"""
+Benchmark della conservazione dei bandi scaduti (archivio.py)
+
+Un database temporaneo con N bandi sintetici e scadenze distribuite negli
+ultimi tre anni (più una parte ancora aperta). Misura, prima e dopo il ciclo
+di conservazione:
+- dimensione del file e righe nella tabella bandi;
+- le letture di ogni run: caricamento di IndiceBandi, riepilogo, top,
+  bandi in scadenza, ricerca full-text e get_tutti_bandi;
+e la durata del ciclo stesso, eseguito due volte (la seconda non deve
+trovare più nulla da fare).
+
+Uso: python benchmarks/bench_archivio.py [numero_bandi] [giorni_conservazione]
+"""
+
+import contextlib
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+import archivio
+from bench_keywords import genera_bandi
+from database import Database
+from dedup import IndiceBandi, chiave_url, impronta_bando
+
+# Quota di bandi ancora aperti
+APERTI = 0.1
+
+
+def prepara_database(percorso, n, rng):
+    with open(os.devnull, 'w') as nullo, contextlib.redirect_stdout(nullo):
+        db = Database(percorso)
+    oggi = date.today()
+    bandi = []
+    for i, (titolo, testo) in enumerate(genera_bandi(n, rng)):
+        if rng.random() < APERTI:
+            scadenza = oggi + timedelta(days=rng.randint(0, 90))
+        else:
+            scadenza = oggi - timedelta(days=rng.randint(1, 3 * 365))
+        bando = {
+            'titolo': titolo,
+            'testo': testo,
+            'url': f'https://esempio.it/bando/{i}',
+            'ente': rng.choice(['FILSE', 'Regione Liguria', 'ALFA Liguria']),
+            'data_scadenza': scadenza.strftime('%d/%m/%Y'),
+            'score': rng.randint(0, 100),
+            'data_trovato': (scadenza - timedelta(days=60)).isoformat(),
+        }
+        bando['chiave'] = chiave_url(bando['url'])
+        bando['impronta'] = impronta_bando(bando)
+        bandi.append(bando)
+    db.salva_bandi(bandi)
+    return db
+
+
+def dimensione(db):
+    db.conn.execute('PRAGMA wal_checkpoint(TRUNCATE)')
+    return os.path.getsize(db.db_path)
+
+
+def misura_letture(db):
+    letture = {
+        'IndiceBandi (avvio)': lambda: IndiceBandi(db),
+        'riepilogo': lambda: (db.conta_riepilogo(), list(db.itera_riepilogo())),
+        'top_bandi(50)': lambda: db.top_bandi(50),
+        'bandi_in_scadenza(30)': lambda: db.bandi_in_scadenza(30),
+        'cerca("formazione")': lambda: db.cerca('formazione', solo_attivi=False, limite=50),
+        'get_tutti_bandi': lambda: db.get_tutti_bandi(),
+    }
+    tempi = {}
+    for nome, funzione in letture.items():
+        inizio = time.perf_counter()
+        funzione()
+        tempi[nome] = (time.perf_counter() - inizio) * 1000
+    return tempi
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 50000
+    giorni = int(sys.argv[2]) if len(sys.argv) > 2 else archivio.GIORNI_CONSERVAZIONE
+    rng = random.Random(42)
+
+    with tempfile.TemporaryDirectory() as cartella:
+        inizio = time.perf_counter()
+        db = prepara_database(os.path.join(cartella, 'sentinel.db'), n, rng)
+        print(f"📊 {n} bandi sintetici salvati in {time.perf_counter() - inizio:.1f}s "
+              f"({APERTI:.0%} aperti, conservazione {giorni} giorni)")
+
+        righe_prima = db.conta_bandi()
+        byte_prima = dimensione(db)
+        letture_prima = misura_letture(db)
+
+        with open(os.devnull, 'w') as nullo, contextlib.redirect_stdout(nullo):
+            primo = archivio.esegui(db, giorni=giorni)
+            secondo = archivio.esegui(db, giorni=giorni)
+        print(f"\n🗄️ Primo ciclo:   {primo['durata'] * 1000:8.1f} ms  ({primo['scaduti']} scaduti, "
+              f"{primo['archiviati']} archiviati, {primo['byte_liberati'] / 1024 ** 2:.1f} MB liberati)")
+        print(f"🗄️ Secondo ciclo: {secondo['durata'] * 1000:8.1f} ms  ({secondo['scaduti']} scaduti, "
+              f"{secondo['archiviati']} archiviati)")
+
+        righe_dopo = db.conta_bandi()
+        byte_dopo = dimensione(db)
+        letture_dopo = misura_letture(db)
+        in_archivio = db.conn.execute('SELECT COUNT(*), SUM(LENGTH(dati)) FROM bandi_archivio').fetchone()
+
+        print(f"\n{'':<24} {'prima':>10} {'dopo':>10}")
+        print(f"{'righe in bandi':<24} {righe_prima:>10} {righe_dopo:>10}")
+        print(f"{'file (MB)':<24} {byte_prima / 1024 ** 2:>10.1f} {byte_dopo / 1024 ** 2:>10.1f}")
+        for nome in letture_prima:
+            print(f"{nome + ' (ms)':<24} {letture_prima[nome]:>10.1f} {letture_dopo[nome]:>10.1f}")
+        print(f"\n📦 Archivio: {in_archivio[0]} bandi, {(in_archivio[1] or 0) / 1024 ** 2:.1f} MB compressi")
+        db.chiudi()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+"""
+Benchmark del matcher di keywords contro le funzioni originali (substring)
+
+Uso: python benchmarks/bench_keywords.py [numero_bandi] [numero_keywords]
+"""
+
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from keywords import KEYWORDS_POSITIVE, KEYWORDS_NEGATIVE, MatcherKeywords
+
+
+# Implementazione originale: una scansione `in` per keyword, keyword rimesse
+# in minuscolo a ogni chiamata
+def filtra_originale(titolo, testo, negative):
+    contenuto = (titolo + ' ' + testo).lower()
+    for keyword in negative:
+        if keyword.lower() in contenuto:
+            return False
+    return True
+
+
+def estrai_originale(titolo, testo, positive):
+    contenuto = (titolo + ' ' + testo).lower()
+    return [k for k in positive.keys() if k.lower() in contenuto]
+
+
+def peso_originale(titolo, testo, positive):
+    contenuto = (titolo + ' ' + testo).lower()
+    return sum(peso for k, peso in positive.items() if k.lower() in contenuto)
+
+
+SILLABE = ['ba', 'ce', 'di', 'fo', 'gu', 'la', 'me', 'no', 'pi', 'ro', 'sa', 'te', 'vi', 'zo']
+PAROLE_COMUNI = ['avviso', 'pubblico', 'per', 'la', 'concessione', 'di', 'contributi', 'alle',
+                 'imprese', 'liguri', 'domande', 'dal', 'al', 'regione', 'liguria', 'progetti']
+
+
+def parola(rng):
+    return ''.join(rng.choice(SILLABE) for _ in range(rng.randint(2, 5)))
+
+
+def frase(rng, lunghezza):
+    # Testo realistico: una parola su dieci è una keyword
+    keywords = [k.lower() for k in KEYWORDS_POSITIVE] + KEYWORDS_NEGATIVE
+    parole = []
+    for _ in range(lunghezza):
+        caso = rng.random()
+        if caso < 0.1:
+            parole.append(rng.choice(keywords))
+        elif caso < 0.6:
+            parole.append(rng.choice(PAROLE_COMUNI))
+        else:
+            parole.append(parola(rng))
+    return ' '.join(parole)
+
+
+def genera_bandi(n, rng):
+    return [(frase(rng, 12), frase(rng, 80)) for _ in range(n)]
+
+
+def genera_vocabolario(n, rng):
+    positive = dict(KEYWORDS_POSITIVE)
+    while len(positive) < n:
+        positive[' '.join(parola(rng) for _ in range(rng.randint(1, 3)))] = rng.randint(1, 20)
+    return positive
+
+
+def misura(nome, funzione, bandi):
+    inizio = time.perf_counter()
+    for titolo, testo in bandi:
+        funzione(titolo, testo)
+    durata = time.perf_counter() - inizio
+    print(f"  {nome:<40} {durata * 1e6 / len(bandi):9.1f} µs/bando")
+    return durata
+
+
+def confronta(positive, negative, bandi):
+    def originale(titolo, testo):
+        filtra_originale(titolo, testo, negative)
+        estrai_originale(titolo, testo, positive)
+        peso_originale(titolo, testo, positive)
+
+    inizio = time.perf_counter()
+    matcher = MatcherKeywords(positive, negative)
+    costruzione = time.perf_counter() - inizio
+
+    def nuovo(titolo, testo):
+        matcher.analizza(titolo + ' ' + testo)
+
+    print(f"  costruzione automa: {costruzione * 1000:.1f} ms")
+    t_originale = misura('originale (3 passate substring)', originale, bandi)
+    t_nuovo = misura('MatcherKeywords.analizza (1 passata)', nuovo, bandi)
+    print(f"  speedup: {t_originale / t_nuovo:.1f}x")
+
+    diversi = 0
+    for titolo, testo in bandi:
+        _, trovate, _ = matcher.analizza(titolo + ' ' + testo)
+        if set(trovate) != set(estrai_originale(titolo, testo, positive)):
+            diversi += 1
+    print(f"  bandi con match diversi (confini di parola): {diversi}/{len(bandi)}")
+
+
+def main():
+    n_bandi = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    n_keywords = int(sys.argv[2]) if len(sys.argv) > 2 else 5000
+    rng = random.Random(42)
+    bandi = genera_bandi(n_bandi, rng)
+
+    print(f"📊 Tabelle attuali ({len(KEYWORDS_POSITIVE)} positive, {len(KEYWORDS_NEGATIVE)} negative), {n_bandi} bandi")
+    confronta(KEYWORDS_POSITIVE, KEYWORDS_NEGATIVE, bandi)
+
+    print(f"\n📊 Vocabolario esteso ({n_keywords} positive), {n_bandi} bandi")
+    confronta(genera_vocabolario(n_keywords, rng), KEYWORDS_NEGATIVE, bandi)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,190 @@
+"""
+Benchmark del parsing: BeautifulSoup/html.parser (originale) contro lxml mirato
+
+Per ogni fonte misura tempo di parsing e aumento del picco di memoria
+(RSS, in un processo separato) sulla fixture registrata e su una pagina
+sintetica.
+
+Uso: python benchmarks/bench_parsing.py [bandi_pagina_sintetica]
+"""
+
+import contextlib
+import gc
+import multiprocessing
+import os
+import re
+import resource
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from bs4 import BeautifulSoup
+import scrapers
+from dedup import chiave_titolo
+from sintetici import leggi_fixture, PAGINE_SINTETICHE
+
+
+# Estrazione originale (BeautifulSoup su response.text), solo la parte di parsing
+def originale_filse_privati(contenuto):
+    soup = BeautifulSoup(contenuto.decode('utf-8'), 'html.parser')
+    titoli = []
+    chiavi_viste = set()
+    for elem in soup.find_all('li'):
+        testo = elem.get_text(strip=True)
+        if len(testo) < 10 or len(testo) > 500:
+            continue
+        titolo = re.sub(r'Clicca qui per.*', '', testo).strip()
+        titolo = re.sub(r'\s+', ' ', titolo).strip()
+        if len(titolo) < 10:
+            continue
+        # Deduplica con l'identità attuale (titolo intero normalizzato), non
+        # più con lo slug dei primi 50 caratteri: si confronta solo il parsing
+        chiave = chiave_titolo('', titolo)
+        if chiave in chiavi_viste:
+            continue
+        chiavi_viste.add(chiave)
+        titoli.append(titolo)
+    return titoli
+
+
+def originale_filse_imprese(contenuto):
+    soup = BeautifulSoup(contenuto.decode('iso-8859-1'), 'html.parser')
+    righe = [r.strip() for r in soup.get_text(separator='\n').split('\n') if r.strip()]
+    titoli = []
+    i = 0
+    while i < len(righe):
+        riga = righe[i]
+        if len(riga) > 30 and i + 1 < len(righe):
+            testo_vicino = (righe[i+1] if i+1 < len(righe) else '') + ' ' + (righe[i+2] if i+2 < len(righe) else '')
+            if re.search(r'dal\s+(\d{2}-\d{2}-\d{4})\s*al\s+(\d{2}-\d{2}-\d{4})', testo_vicino, re.IGNORECASE):
+                titoli.append(riga)
+                i += 3
+                continue
+        i += 1
+    return titoli
+
+
+def _originale_link(contenuto, pattern, esclusi=()):
+    soup = BeautifulSoup(contenuto.decode('utf-8'), 'html.parser')
+    titoli = []
+    for link in soup.find_all('a', href=re.compile(pattern)):
+        titolo = link.get_text(strip=True)
+        if not titolo or len(titolo) < 10 or titolo.lower() in esclusi:
+            continue
+        link.parent.get_text(strip=True)
+        titoli.append(titolo)
+    return titoli
+
+
+def originale_regione(contenuto):
+    return _originale_link(contenuto, r'/publiccompetition/\d+:')
+
+
+def originale_alfa(contenuto):
+    return _originale_link(contenuto, r'/index\.php/avvisi-attivi-fse-e-altri-fondi/\d+',
+                           ['avvisi attivi fse e altri fondi', 'vai alla pagina dedicata'])
+
+
+ORIGINALI = {
+    'filse_privati': originale_filse_privati,
+    'filse_imprese': originale_filse_imprese,
+    'regione': originale_regione,
+    'alfa': originale_alfa,
+}
+
+
+FONTI = {fonte['id']: fonte for fonte in scrapers.carica_fonti()}
+
+
+def nuovo(id_fonte):
+    scraper = scrapers.crea_scraper(FONTI[id_fonte])
+
+    def estrai(contenuto):
+        return [b['titolo'] for b in scraper.estrai(contenuto, scraper.encoding)]
+    return estrai
+
+
+def _stato_memoria(campo):
+    with open('/proc/self/status') as f:
+        for riga in f:
+            if riga.startswith(campo + ':'):
+                return int(riga.split()[1])
+    return 0
+
+
+def _figlio(funzione, contenuto, coda):
+    with open(os.devnull, 'w') as nullo, contextlib.redirect_stdout(nullo):
+        # Riscaldamento su una pagina minima: le pagine di codice delle librerie
+        # non devono contare nel picco
+        funzione(b'<html><body><ul><li>riscaldamento</li></ul></body></html>')
+        gc.collect()
+        try:
+            # Azzera il picco di RSS (VmHWM) del processo (solo Linux)
+            with open('/proc/self/clear_refs', 'w') as f:
+                f.write('5')
+            prima = _stato_memoria('VmRSS')
+            funzione(contenuto)
+            coda.put(_stato_memoria('VmHWM') - prima)
+        except OSError:
+            prima = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+            funzione(contenuto)
+            coda.put(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - prima)
+
+
+def picco_memoria(funzione, contenuto):
+    """Aumento del picco di RSS (KB) durante il parsing, in un processo dedicato"""
+    contesto = multiprocessing.get_context('fork')
+    coda = contesto.Queue()
+    processo = contesto.Process(target=_figlio, args=(funzione, contenuto, coda))
+    processo.start()
+    risultato = coda.get()
+    processo.join()
+    return risultato
+
+
+def tempo(funzione, contenuto, ripetizioni):
+    migliore = float('inf')
+    with open(os.devnull, 'w') as nullo, contextlib.redirect_stdout(nullo):
+        for _ in range(ripetizioni):
+            inizio = time.perf_counter()
+            funzione(contenuto)
+            migliore = min(migliore, time.perf_counter() - inizio)
+    return migliore
+
+
+def confronta(etichetta, id_fonte, contenuto, ripetizioni, memoria):
+    originale = ORIGINALI[id_fonte]
+    lxml_mirato = nuovo(id_fonte)
+    m_orig, m_nuovo = memoria
+    with open(os.devnull, 'w') as nullo, contextlib.redirect_stdout(nullo):
+        uguali = originale(contenuto) == lxml_mirato(contenuto)
+    t_orig = tempo(originale, contenuto, ripetizioni)
+    t_nuovo = tempo(lxml_mirato, contenuto, ripetizioni)
+    print(f"  {id_fonte:<15} {etichetta:<11} {len(contenuto) / 1024:8.0f} KB "
+          f"| bs4 {t_orig * 1000:8.2f} ms {m_orig:7d} KB "
+          f"| lxml {t_nuovo * 1000:8.2f} ms {m_nuovo:7d} KB "
+          f"| {t_orig / t_nuovo:5.1f}x {'✓' if uguali else '✗ output diverso'}")
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    casi = []
+    for id_fonte in ORIGINALI:
+        casi.append(('fixture', id_fonte, leggi_fixture(id_fonte), 50))
+        casi.append((f'{n} bandi', id_fonte, PAGINE_SINTETICHE[id_fonte](n), 3))
+
+    # La memoria si misura prima dei tempi, finché l'heap del processo padre
+    # (ereditato dai figli) non è ancora cresciuto
+    memoria = [
+        (picco_memoria(ORIGINALI[id_fonte], contenuto), picco_memoria(nuovo(id_fonte), contenuto))
+        for _, id_fonte, contenuto, _ in casi
+    ]
+
+    print(f"📊 Parsing: fixture registrate e pagine sintetiche da {n} bandi (tempo migliore, aumento picco RSS)")
+    for caso, mem in zip(casi, memoria):
+        confronta(*caso, mem)
+
+
+if __name__ == "__main__":
+    main()
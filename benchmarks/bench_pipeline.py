@@ -0,0 +1,164 @@
+"""
+Benchmark offline della pipeline completa: scarica → parsing → analisi → database → notifiche
+
+Le pagine registrate (fixtures/) e le pagine sintetiche sono servite da un
+server HTTP locale; le notifiche vanno a un finto Telegram locale. Nessuna
+richiesta esce dalla macchina.
+
+Ogni fonte passa da scraper.elabora_esito, la stessa funzione del run vero,
+con due sostituti: una coda che invia subito (fino a max_notifiche messaggi)
+e uno scaricatore di allegati che non scarica nulla. I tempi per fase sono
+quelli di metriche.Metriche.
+
+Uso: python benchmarks/bench_pipeline.py [bandi_per_fonte_sintetica] [max_notifiche]
+"""
+
+import contextlib
+import os
+import resource
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+import http_client
+import motore
+import scraper as orchestratore
+import scrapers
+from database import Database
+from dedup import IndiceBandi
+from metriche import FASI, Metriche
+from simili import IndiceSimili
+from rilevanza import MotoreRilevanza
+from sintetici import leggi_fixture, PAGINE_SINTETICHE
+from server_locali import ServerPagine, TelegramFinto
+
+CONTENT_TYPE = {
+    'filse_imprese': 'text/html; charset=ISO-8859-1',
+}
+
+
+def picco_rss_mb():
+    # ru_maxrss è in KB su Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def prepara_pagine(n_sintetici):
+    pagine = {}
+    for id_fonte, genera in PAGINE_SINTETICHE.items():
+        content_type = CONTENT_TYPE.get(id_fonte, 'text/html; charset=utf-8')
+        pagine[f'/fixture/{id_fonte}'] = (leggi_fixture(id_fonte), content_type)
+        if n_sintetici:
+            pagine[f'/sintetico/{id_fonte}'] = (genera(n_sintetici), content_type)
+    return pagine
+
+
+class CodaLimitata:
+    """Al posto di CodaNotifiche: invia subito, in sequenza, i primi `massimo` messaggi"""
+
+    def __init__(self, massimo):
+        self.massimo = massimo
+        self.inviate = 0
+
+    def aggiungi(self, testo):
+        if self.inviate < self.massimo:
+            orchestratore.invia_notifica_telegram(testo)
+            self.inviate += 1
+
+
+class SenzaAllegati:
+    """Al posto di ScaricatorePdf: gli allegati non fanno parte del benchmark"""
+
+    def accoda(self, bandi, opzioni=None):
+        pass
+
+
+def giro(server, percorsi, db, max_notifiche):
+    """Esegue un giro completo della pipeline, ritorna (tempi per fase, conteggi)"""
+    conteggi = {'trovati': 0, 'nuovi': 0, 'notifiche': 0, 'byte': 0}
+    metriche = Metriche()
+    coda = CodaLimitata(max_notifiche)
+    scaricatore = SenzaAllegati()
+
+    inizio = time.perf_counter()
+    indice = IndiceBandi(db)
+    simili = IndiceSimili(db)
+    rilevanza = MotoreRilevanza(db.conn)
+    caricamento = time.perf_counter() - inizio
+
+    fonti = {fonte['id']: fonte for fonte in scrapers.carica_fonti()}
+    for percorso in percorsi:
+        # La fonte reale, ma con la pagina servita dal server locale
+        config = dict(fonti[percorso.rsplit('/', 1)[1]], url_bandi=server.url + percorso, verify=None)
+        scraper = scrapers.crea_scraper(config)
+
+        with open(os.devnull, 'w') as nullo, contextlib.redirect_stdout(nullo):
+            inizio = time.perf_counter()
+            bandi = scraper.scrape()
+            esito = motore.crea_esito(scraper, bandi, motore.esito_completato(scraper, bandi),
+                                      time.perf_counter() - inizio)
+            metriche.registra_scansione(esito)
+            nuovi, _ = orchestratore.elabora_esito(esito, db, indice, simili, rilevanza, coda, scaricatore, metriche)
+        conteggi['byte'] += scraper.statistiche['byte']
+        conteggi['trovati'] += len(bandi)
+        conteggi['nuovi'] += nuovi
+
+    tempi = {fase: sum(voce['tempi'][fase] for voce in metriche.fonti.values()) for fase in FASI}
+    tempi['database'] += caricamento
+    conteggi['notifiche'] = coda.inviate
+    return tempi, conteggi
+
+
+def stampa(titolo, tempi, conteggi):
+    totale = sum(tempi.values())
+    print(f"\n📊 {titolo}")
+    print(f"  bandi trovati: {conteggi['trovati']}, nuovi: {conteggi['nuovi']}, "
+          f"notifiche: {conteggi['notifiche']}, scaricati: {conteggi['byte'] / 1024:.0f} KB")
+    for fase in FASI:
+        quota = tempi[fase] / totale * 100 if totale else 0
+        print(f"  {fase:<10} {tempi[fase] * 1000:10.1f} ms  {quota:5.1f}%")
+    print(f"  {'totale':<10} {totale * 1000:10.1f} ms")
+    if totale:
+        print(f"  throughput: {conteggi['trovati'] / totale:,.0f} bandi/s")
+    if conteggi['notifiche']:
+        print(f"  notifiche: {tempi['notifiche'] / conteggi['notifiche'] * 1000:.2f} ms/messaggio")
+    print(f"  picco RSS: {picco_rss_mb():.1f} MB")
+
+
+def main():
+    n_sintetici = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    max_notifiche = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+
+    telegram = TelegramFinto()
+    os.environ['TELEGRAM_TOKEN'] = 'benchmark'
+    os.environ['TELEGRAM_CHAT_ID'] = '1'
+    os.environ['TELEGRAM_API_URL'] = telegram.url
+
+    pagine = prepara_pagine(n_sintetici)
+    server = ServerPagine(pagine)
+
+    with tempfile.TemporaryDirectory() as cartella:
+        with open(os.devnull, 'w') as nullo, contextlib.redirect_stdout(nullo):
+            db = Database(os.path.join(cartella, 'benchmark.db'))
+
+        fixture = [p for p in pagine if p.startswith('/fixture/')]
+        stampa('Fixture registrate (database vuoto)', *giro(server, fixture, db, max_notifiche))
+
+        if n_sintetici:
+            sintetici = [p for p in pagine if p.startswith('/sintetico/')]
+            stampa(f'Pagine sintetiche, {n_sintetici} bandi per fonte (tutti nuovi)',
+                   *giro(server, sintetici, db, max_notifiche))
+            stampa('Pagine sintetiche, secondo giro (tutti già noti)',
+                   *giro(server, sintetici, db, max_notifiche))
+
+        db.chiudi()
+
+    print(f"\n📨 Messaggi ricevuti dal finto Telegram: {len(telegram.messaggi)}")
+    server.chiudi()
+    telegram.chiudi()
+    http_client.chiudi()
+
+
+if __name__ == "__main__":
+    main()
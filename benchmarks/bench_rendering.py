@@ -0,0 +1,111 @@
+"""
+Benchmark del rendering JavaScript: download statico contro browser headless
+
+Un server locale serve un elenco costruito in JavaScript (fixture
+elenco_js.html, che legge /api/avvisi.json). Misura:
+- il download statico, che non vede nessun bando;
+- il fallback nel browser di una fonte statica con zero bandi;
+- il primo rendering (avvio del browser compreso) e i successivi sulla
+  stessa scheda, per più fonti di fila;
+- quali risorse (immagini, font, tracker) arrivano davvero al server.
+
+Serve selenium con Chrome/Chromium (SENTINEL_CHROME per un binario non di
+sistema); senza browser il benchmark lo segnala e termina.
+
+Uso: python benchmarks/bench_rendering.py [numero_fonti] [bandi_per_fonte]
+"""
+
+import contextlib
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+import http_client
+import scrapers
+from rendering import PoolBrowser
+from server_locali import ServerPagine
+from sintetici import CARTELLA_FIXTURE
+
+HTML = 'text/html; charset=utf-8'
+
+
+def prepara_pagine(bandi_per_fonte):
+    with open(os.path.join(CARTELLA_FIXTURE, 'elenco_js.html'), 'rb') as f:
+        elenco = f.read()
+    avvisi = [
+        {'id': i, 'titolo': f"Avviso pubblico per la formazione professionale n. {i}", 'scadenza': '30/06/2026'}
+        for i in range(1, bandi_per_fonte + 1)
+    ]
+    return {
+        '/elenco': (elenco, HTML),
+        '/api/avvisi.json': (json.dumps(avvisi).encode('utf-8'), 'application/json'),
+        '/static/logo.png': (b'\x89PNG', 'image/png'),
+        '/static/font.woff2': (b'', 'font/woff2'),
+        '/static/analytics.js': (b'', 'application/javascript'),
+    }
+
+
+def config_fonte(server, i, js):
+    return {
+        'id': f'js_{i}',
+        'nome': f'Portale JS {i}',
+        'tipo_scraper': 'link',
+        'url_base': server.url,
+        'url_bandi': f'{server.url}/elenco',
+        'href_contiene': '/avviso/',
+        'regex_data': r'(\d{1,2})/(\d{1,2})/(\d{4})',
+        'attendi': "//ul[@id='elenco']/li",
+        'js': js,
+    }
+
+
+def scrape(scraper):
+    with open(os.devnull, 'w') as nullo, contextlib.redirect_stdout(nullo):
+        inizio = time.perf_counter()
+        bandi = scraper.scrape()
+    return bandi, (time.perf_counter() - inizio) * 1000
+
+
+def main():
+    numero_fonti = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    bandi_per_fonte = int(sys.argv[2]) if len(sys.argv) > 2 else 50
+
+    server = ServerPagine(prepara_pagine(bandi_per_fonte))
+    browser = PoolBrowser()
+
+    bandi, ms = scrape(scrapers.crea_scraper(config_fonte(server, 0, False)))
+    print(f"📄 Download statico:            {len(bandi):4d} bandi  {ms:8.1f} ms")
+
+    bandi, ms = scrape(scrapers.crea_scraper(config_fonte(server, 0, False), browser=browser))
+    if browser.disattivato:
+        print("⚠️ Browser headless non disponibile: installare Chrome/Chromium o impostare SENTINEL_CHROME")
+        server.chiudi()
+        http_client.chiudi()
+        return
+    print(f"🌐 Fallback (avvio compreso):   {len(bandi):4d} bandi  {ms:8.1f} ms "
+          f"(avvio browser {browser.statistiche['avvio'] * 1000:.0f} ms)")
+
+    tempi = []
+    for i in range(1, numero_fonti + 1):
+        bandi, ms = scrape(scrapers.crea_scraper(config_fonte(server, i, True), browser=browser))
+        tempi.append(ms)
+        print(f"🌐 Fonte js {i} (browser caldo): {len(bandi):4d} bandi  {ms:8.1f} ms")
+    if tempi:
+        print(f"   media a browser caldo: {sum(tempi) / len(tempi):.1f} ms")
+
+    browser.chiudi()
+
+    bloccati = ('/static/logo.png', '/static/font.woff2', '/static/analytics.js')
+    arrivati = sorted(set(p.split('?')[0] for p in server.percorsi) & set(bloccati))
+    print(f"\n🚫 Risorse bloccate arrivate al server: {', '.join(arrivati) or 'nessuna'}")
+    print(f"📨 Richieste totali al server: {server.richieste}")
+
+    server.chiudi()
+    http_client.chiudi()
+
+
+if __name__ == "__main__":
+    main()
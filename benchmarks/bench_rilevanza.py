@@ -0,0 +1,100 @@
+"""
+Benchmark della rilevanza TF-IDF (NumPy) contro calcola_score per bando
+
+Su N bandi sintetici misura:
+- calcola_score chiamata bando per bando (punteggio attuale);
+- la rilevanza, divisa in conteggio delle keywords (matrice sparsa) e
+  calcolo NumPy (TF-IDF e prodotto matrice-vettore);
+- il ricalcolo dopo un cambio di pesi, che riusa la matrice;
+- il ricalcolo di tutta la tabella bandi in un database temporaneo, contro
+  la stessa operazione fatta con calcola_score e un UPDATE per riga.
+
+Uso: python benchmarks/bench_rilevanza.py [numero_bandi]
+"""
+
+import contextlib
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+import numpy as np
+import migrazioni
+import rilevanza
+from bench_keywords import genera_bandi
+from keywords import calcola_score
+
+
+def misura(nome, funzione, n):
+    inizio = time.perf_counter()
+    risultato = funzione()
+    durata = time.perf_counter() - inizio
+    print(f"  {nome:<44} {durata * 1000:9.1f} ms  {durata * 1e6 / n:7.2f} µs/bando")
+    return risultato, durata
+
+
+def prepara_database(percorso, bandi):
+    conn = sqlite3.connect(percorso)
+    conn.execute('PRAGMA journal_mode=WAL')
+    with open(os.devnull, 'w') as nullo, contextlib.redirect_stdout(nullo):
+        migrazioni.applica(conn)
+    with conn:
+        conn.executemany(
+            "INSERT INTO bandi (titolo, url, ente, testo, score) VALUES (?, ?, 'FILSE', ?, 0)",
+            ((bando['titolo'], f'https://esempio.it/bando/{i}', bando['testo']) for i, bando in enumerate(bandi))
+        )
+    return conn
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    rng = random.Random(42)
+    bandi = [{'titolo': titolo, 'testo': testo, 'ente': 'FILSE'} for titolo, testo in genera_bandi(n, rng)]
+
+    print(f"📊 {n} bandi sintetici in memoria")
+    _, t_score = misura('calcola_score per bando', lambda: [calcola_score(b) for b in bandi], n)
+
+    # Solo le tabelle delle frequenze, vuote: il corpus è la matrice in memoria
+    conn = sqlite3.connect(':memory:')
+    with open(os.devnull, 'w') as nullo, contextlib.redirect_stdout(nullo):
+        migrazioni.applica(conn)
+    motore = rilevanza.MotoreRilevanza(conn)
+
+    m, t_matrice = misura('matrice sparsa delle keywords',
+                          lambda: rilevanza.matrice((rilevanza.testo_bando(b) for b in bandi), motore.profilo), n)
+    motore.imposta_corpus(m)
+    valori, t_numpy = misura('TF-IDF + prodotto matrice-vettore', lambda: motore._calcola(m), n)
+    print(f"  {'totale rilevanza':<44} {(t_matrice + t_numpy) * 1000:9.1f} ms"
+          f"  ({t_score / (t_matrice + t_numpy):.1f}x rispetto a calcola_score)")
+
+    celle = rilevanza.tfidf(m, motore.df, motore.documenti, motore.parole / n)
+    nuovi_pesi = motore.pesi * np.random.default_rng(1).uniform(0.5, 1.5, len(motore.pesi))
+    _, t_pesi = misura('nuovi pesi: solo prodotto matrice-vettore',
+                       lambda: rilevanza.in_centesimi(rilevanza.prodotto(m, celle, nuovi_pesi), motore.scala), n)
+    print(f"  celle non nulle: {len(m.colonne)} ({len(m.colonne) / n:.1f} per bando), "
+          f"rilevanza media {valori.mean():.1f}/100")
+
+    with tempfile.TemporaryDirectory() as cartella:
+        conn = prepara_database(os.path.join(cartella, 'benchmark.db'), bandi)
+        print(f"\n📊 Ricalcolo della tabella bandi ({n} righe, SQLite)")
+
+        def per_riga():
+            righe = conn.execute('SELECT id, titolo, testo, ente FROM bandi').fetchall()
+            with conn:
+                for id_bando, titolo, testo, ente in righe:
+                    conn.execute('UPDATE bandi SET score = ? WHERE id = ?',
+                                 (calcola_score({'titolo': titolo, 'testo': testo, 'ente': ente}), id_bando))
+
+        _, t_righe = misura('calcola_score + UPDATE per riga', per_riga, n)
+        _, t_tabella = misura('MotoreRilevanza.ricalcola (una passata)',
+                              lambda: rilevanza.MotoreRilevanza(conn).ricalcola(), n)
+        print(f"  speedup: {t_righe / t_tabella:.1f}x")
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""
+Server HTTP locali per i benchmark offline: pagine registrate e finto Telegram
+"""
+
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    # Header e corpo partono in due write: senza TCP_NODELAY il delayed ACK
+    # aggiungerebbe ~40 ms a ogni risposta su connessioni keep-alive
+    disable_nagle_algorithm = True
+
+    def log_message(self, *args):
+        pass
+
+    def _rispondi(self, status, corpo, content_type):
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(corpo)))
+        self.end_headers()
+        self.wfile.write(corpo)
+
+
+class ServerLocale:
+    """Avvia un ThreadingHTTPServer su una porta libera in un thread daemon"""
+
+    def __init__(self, handler):
+        self._server = ThreadingHTTPServer(('127.0.0.1', 0), handler)
+        self._server.proprietario = self
+        self.url = f"http://127.0.0.1:{self._server.server_port}"
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+
+    def chiudi(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+
+class ServerPagine(ServerLocale):
+    """Serve pagine registrate: dict percorso -> (bytes, content_type)"""
+
+    def __init__(self, pagine):
+        self.pagine = pagine
+        self.richieste = 0
+        self.percorsi = []
+
+        class Handler(_Handler):
+            def do_GET(self):
+                proprietario = self.server.proprietario
+                proprietario.richieste += 1
+                proprietario.percorsi.append(self.path)
+                pagina = proprietario.pagine.get(self.path.split('?')[0])
+                if pagina is None:
+                    self._rispondi(404, b'not found', 'text/plain')
+                else:
+                    self._rispondi(200, *pagina)
+
+        super().__init__(Handler)
+
+
+class TelegramFinto(ServerLocale):
+    """Risponde come l'API sendMessage di Telegram e conserva i messaggi ricevuti"""
+
+    def __init__(self):
+        self.messaggi = []
+        self._lock = threading.Lock()
+
+        class Handler(_Handler):
+            def do_POST(self):
+                lunghezza = int(self.headers.get('Content-Length', 0))
+                dati = json.loads(self.rfile.read(lunghezza) or b'{}')
+                proprietario = self.server.proprietario
+                with proprietario._lock:
+                    proprietario.messaggi.append(dati.get('text', ''))
+                    message_id = len(proprietario.messaggi)
+                corpo = json.dumps({'ok': True, 'result': {'message_id': message_id}}).encode()
+                self._rispondi(200, corpo, 'application/json')
+
+        super().__init__(Handler)
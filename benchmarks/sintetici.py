@@ -0,0 +1,88 @@
+"""
+Pagine di elenco sintetiche (stesso markup delle fixture) con N bandi
+"""
+
+import os
+import random
+
+CARTELLA_FIXTURE = os.path.join(os.path.dirname(__file__), 'fixtures')
+
+# Fixture registrate per ogni fonte di src/fonti.json
+FIXTURE = {
+    'filse_privati': 'filse_privati.html',
+    'filse_imprese': 'filse_imprese.html',
+    'regione': 'regione.html',
+    'alfa': 'alfa.html',
+}
+
+TEMI = ['formazione professionale', 'turismo', 'ristorazione', 'digitalizzazione', 'innovazione',
+        'startup', 'PMI', 'fondo perduto', 'investimento', 'concessione demaniale', 'sviluppo',
+        'efficienza energetica', 'commercio', 'artigianato', 'agricoltura', 'esiti istruttoria']
+AZIONI = ['Bando per', 'Avviso pubblico per', 'Contributi per', 'Voucher per', 'Manifestazione di interesse per']
+DESTINATARI = ['le imprese liguri', 'i giovani disoccupati', 'le PMI del territorio',
+               'gli operatori turistici', 'le strutture ricettive', 'gli enti di formazione']
+MESI = ['gennaio', 'febbraio', 'marzo', 'aprile', 'maggio', 'giugno',
+        'luglio', 'agosto', 'settembre', 'ottobre', 'novembre', 'dicembre']
+
+
+def leggi_fixture(id_fonte):
+    with open(os.path.join(CARTELLA_FIXTURE, FIXTURE[id_fonte]), 'rb') as f:
+        return f.read()
+
+
+def _titolo(rng, i):
+    return f"{rng.choice(AZIONI)} {rng.choice(TEMI)} e {rng.choice(TEMI)} per {rng.choice(DESTINATARI)} n. {i}"
+
+
+def pagina_filse_privati(n, seed=1):
+    rng = random.Random(seed)
+    voci = ''.join(
+        f'<li><strong>{_titolo(rng, i)}</strong> <a href="/bandi/{i}">Clicca qui per accedere al bando</a></li>\n'
+        for i in range(n)
+    )
+    return (f'<!DOCTYPE html><html><head><meta charset="utf-8"><title>Bandi FILSE</title></head><body>'
+            f'<ul class="menu"><li><a href="/">Home</a></li></ul><ul class="elenco-bandi">\n{voci}</ul>'
+            f'</body></html>').encode('utf-8')
+
+
+def pagina_filse_imprese(n, seed=1):
+    rng = random.Random(seed)
+    righe = []
+    for i in range(n):
+        g, m = rng.randint(1, 28), rng.randint(1, 12)
+        righe.append(f'<tr><td class="titolo">{_titolo(rng, i)} - città di Genova</td></tr>'
+                     f'<tr><td class="date">Presentazione domande</td></tr>'
+                     f'<tr><td class="date">dal 01-01-2025 al {g:02d}-{m:02d}-2026</td></tr>\n')
+    return (f'<html><head><meta http-equiv="Content-Type" content="text/html; charset=ISO-8859-1">'
+            f'<title>FilseWeb - Home</title></head><body><table class="elenco">\n{"".join(righe)}</table>'
+            f'</body></html>').encode('iso-8859-1')
+
+
+def pagina_regione(n, seed=1):
+    rng = random.Random(seed)
+    voci = ''.join(
+        f'<div class="item"><h3><a href="/homepage-bandi-e-avvisi/publiccompetition/{10000 + i}:bando-{i}.html">'
+        f'{_titolo(rng, i)}</a></h3><span class="scadenza">Scadenza: {rng.randint(1, 28)} {rng.choice(MESI)} 2026</span></div>\n'
+        for i in range(n)
+    )
+    return (f'<!DOCTYPE html><html><head><meta charset="utf-8"><title>Bandi e avvisi</title></head><body>'
+            f'<div class="publiccompetitions">\n{voci}</div></body></html>').encode('utf-8')
+
+
+def pagina_alfa(n, seed=1):
+    rng = random.Random(seed)
+    voci = ''.join(
+        f'<li><a href="/index.php/avvisi-attivi-fse-e-altri-fondi/{10000 + i}-avviso-{i}">{_titolo(rng, i)}</a>'
+        f' - scadenza {rng.randint(1, 28):02d}/{rng.randint(1, 12):02d}/2026</li>\n'
+        for i in range(n)
+    )
+    return (f'<!DOCTYPE html><html><head><meta charset="utf-8"><title>Avvisi attivi</title></head><body>'
+            f'<ul class="category-module">\n{voci}</ul></body></html>').encode('utf-8')
+
+
+PAGINE_SINTETICHE = {
+    'filse_privati': pagina_filse_privati,
+    'filse_imprese': pagina_filse_imprese,
+    'regione': pagina_regione,
+    'alfa': pagina_alfa,
+}
@@ -0,0 +1,432 @@
+"""
+Download degli allegati PDF dei bandi
+
+Per ogni bando nuovo o aggiornato con una pagina di dettaglio si cercano i
+link ai PDF e si scaricano a blocchi direttamente su disco. I file sono
+salvati una sola volta per contenuto (data/pdf/<sha256>.pdf) e pdf_archivio
+registra una nuova versione quando l'hash di un allegato cambia.
+Il testo dei PDF (con pypdf, se installato) finisce in bandi.testo_allegati
+per la ricerca full-text.
+
+I bandi con un download fallito restano in allegati_in_sospeso e vengono
+riaccodati nei run successivi (al massimo MAX_RIPRESE volte), riprendendo
+dai file parziali rimasti su disco.
+"""
+
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor, wait
+from datetime import datetime, timedelta
+from urllib.parse import urljoin, urlsplit
+import http_client
+import parsing
+
+CARTELLA_PDF = os.path.join('data', 'pdf')
+MAX_WORKERS = 4
+# Richieste contemporanee verso lo stesso host
+PER_HOST = 2
+BLOCCO = 64 * 1024
+TIMEOUT = 30
+# Tentativi per allegato: dal secondo si riprende dal file parziale (Range)
+TENTATIVI = 3
+MAX_ALLEGATI = 10
+# Run in cui si riprova un bando con allegati non scaricati, prima di abbandonarlo
+MAX_RIPRESE = 5
+# Secondi minimi fra due riprese dello stesso bando (il demone esegue un giro
+# di download dopo ogni fonte)
+ATTESA_RIPRESA = 3600
+# I file parziali non più toccati da tanti giorni sono abbandonati
+GIORNI_PARZIALI = 7
+# Caratteri di testo conservati per ogni PDF
+MAX_CARATTERI = 200000
+
+_PDF = re.compile(r'\.pdf(?:$|[?#])', re.IGNORECASE)
+_CONTENT_RANGE = re.compile(r'bytes\s+(\d+)-')
+
+
+def trova_pdf(contenuto, url_pagina, encoding=None):
+    """URL assoluti (senza duplicati, in ordine) dei PDF linkati da una pagina"""
+    doc = parsing.documento(contenuto, encoding)
+    visti = []
+    for href in doc.xpath('//a/@href'):
+        href = href.strip()
+        if _PDF.search(href):
+            url = urljoin(url_pagina, href).split('#', 1)[0]
+            if url not in visti:
+                visti.append(url)
+    return visti
+
+
+def estrai_testo_pdf(percorso, max_caratteri=MAX_CARATTERI):
+    """Testo di un PDF, None se pypdf non è installato o il file non è leggibile"""
+    try:
+        from pypdf import PdfReader
+    except ImportError:
+        return None
+    try:
+        parti = []
+        lunghezza = 0
+        for pagina in PdfReader(percorso).pages:
+            testo = pagina.extract_text() or ''
+            parti.append(testo)
+            lunghezza += len(testo)
+            if lunghezza >= max_caratteri:
+                break
+        return re.sub(r'\s+', ' ', ' '.join(parti))[:max_caratteri].strip() or None
+    except Exception as e:
+        print(f"⚠️ Testo non estratto da {os.path.basename(percorso)}: {e}")
+        return None
+
+
+def validatore(response):
+    """
+    Valore per If-Range: ETag forte oppure Last-Modified, None se il server
+    non permette di capire se il file è cambiato
+    """
+    etag = response.headers.get('ETag')
+    if etag and not etag.startswith('W/'):
+        return etag
+    return response.headers.get('Last-Modified')
+
+
+def inizio_intervallo(response):
+    """Primo byte di una risposta 206 secondo Content-Range, None se manca"""
+    trovato = _CONTENT_RANGE.match(response.headers.get('Content-Range', ''))
+    return int(trovato.group(1)) if trovato else None
+
+
+def _rimuovi(*percorsi):
+    for percorso in percorsi:
+        if os.path.exists(percorso):
+            os.remove(percorso)
+
+
+class ScaricatorePdf:
+    """
+    Pool limitato di download con un tetto di connessioni per host.
+    accoda() raccoglie i bandi durante il run, esegui() scarica tutto e
+    registra le versioni nel database (dal thread chiamante). Il demone usa
+    avvia() e raccogli() per non fermare la pianificazione durante i download.
+    """
+
+    def __init__(self, db, cartella=CARTELLA_PDF, max_workers=MAX_WORKERS, per_host=PER_HOST):
+        self.db = db
+        self.cartella = cartella
+        self.max_workers = max_workers
+        self._semafori = defaultdict(lambda: threading.BoundedSemaphore(per_host))
+        # Lo stesso PDF linkato da più bandi non va scaricato due volte insieme
+        self._file_in_corso = defaultdict(threading.Lock)
+        self._scaricati = {}
+        self._testi = {}
+        self._lock = threading.Lock()
+        self._lavori = []
+        # (bando, opzioni, future) avviati da avvia() e non ancora registrati
+        self._in_corso = []
+        self._executor = None
+        self.statistiche = {'pagine': 0, 'allegati': 0, 'nuovi_file': 0, 'versioni': 0, 'byte': 0, 'errori': 0}
+        os.makedirs(self.cartella, exist_ok=True)
+
+    def accoda(self, bandi, opzioni=None):
+        """Accoda i bandi di una fonte; opzioni sono i kwargs di richiesta dello scraper"""
+        for bando in bandi:
+            # Le fonti senza pagina di dettaglio hanno URL a frammento
+            if '#' not in bando['url']:
+                self._lavori.append((bando, dict(opzioni or {})))
+
+    def _semaforo(self, url):
+        with self._lock:
+            return self._semafori[urlsplit(url).netloc]
+
+    def _conta(self, voce, valore=1):
+        with self._lock:
+            self.statistiche[voce] += valore
+
+    def scarica_file(self, url, **opzioni):
+        with self._lock:
+            in_corso = self._file_in_corso[url]
+        with in_corso:
+            if url not in self._scaricati:
+                self._scaricati[url] = self._scarica_file(url, **opzioni)
+            return self._scaricati[url]
+
+    def _scarica_file(self, url, **opzioni):
+        """
+        Scarica un file a blocchi calcolando lo SHA-256 durante la scrittura.
+        Il file parziale (<cartella>/<hash url>.part) sopravvive agli errori,
+        anche da un run all'altro, insieme al validatore della risposta
+        (<hash url>.part.validatore): il tentativo successivo chiede solo i
+        byte mancanti con If-Range. Se il file sul server è cambiato la
+        risposta è un 200 e si riparte da zero; senza validatore non si
+        riprende mai, per non unire pezzi di versioni diverse.
+        Ritorna (sha256, byte) oppure None se la risposta non è un PDF.
+        """
+        parziale = os.path.join(self.cartella, hashlib.blake2b(url.encode('utf-8'), digest_size=16).hexdigest() + '.part')
+        file_validatore = parziale + '.validatore'
+        opzioni.setdefault('timeout', TIMEOUT)
+
+        for tentativo in range(1, TENTATIVI + 1):
+            gia_scaricati = os.path.getsize(parziale) if os.path.exists(parziale) else 0
+            condizione = None
+            if gia_scaricati and os.path.exists(file_validatore):
+                with open(file_validatore, encoding='utf-8') as f:
+                    condizione = f.read().strip() or None
+            headers = {'Range': f'bytes={gia_scaricati}-', 'If-Range': condizione} if condizione else {}
+            try:
+                with self._semaforo(url):
+                    with http_client.get(url, headers=headers, stream=True, **opzioni) as response:
+                        if response.status_code == 416:
+                            # Il parziale non corrisponde più al file sul server
+                            _rimuovi(parziale, file_validatore)
+                            continue
+                        if response.status_code not in (200, 206):
+                            print(f"⚠️ Allegato {url} - Status: {response.status_code}")
+                            return None
+                        if 'html' in response.headers.get('Content-Type', ''):
+                            return None
+
+                        sha = hashlib.sha256()
+                        if response.status_code == 206:
+                            if not headers or inizio_intervallo(response) != gia_scaricati:
+                                # Intervallo diverso da quello chiesto: si riparte da zero
+                                _rimuovi(parziale, file_validatore)
+                                continue
+                            with open(parziale, 'rb') as f:
+                                for blocco in iter(lambda: f.read(BLOCCO), b''):
+                                    sha.update(blocco)
+                            modo = 'ab'
+                        else:
+                            # 200: file intero, anche quando If-Range ha scartato il parziale
+                            modo = 'wb'
+                            valore = validatore(response)
+                            if valore:
+                                with open(file_validatore, 'w', encoding='utf-8') as f:
+                                    f.write(valore)
+                            else:
+                                _rimuovi(file_validatore)
+                        with open(parziale, modo) as f:
+                            for blocco in response.iter_content(BLOCCO):
+                                sha.update(blocco)
+                                f.write(blocco)
+                                self._conta('byte', len(blocco))
+                break
+            except Exception as e:
+                if tentativo == TENTATIVI:
+                    raise
+                print(f"⚠️ Allegato {url} interrotto ({e}), riprendo")
+                time.sleep(tentativo)
+        else:
+            return None
+
+        digest = sha.hexdigest()
+        _rimuovi(file_validatore)
+        definitivo = os.path.join(self.cartella, digest + '.pdf')
+        if os.path.exists(definitivo):
+            # Stesso contenuto già in archivio (anche da un altro bando)
+            os.remove(parziale)
+        else:
+            os.replace(parziale, definitivo)
+            self._conta('nuovi_file')
+        return digest, os.path.getsize(definitivo)
+
+    def testo(self, sha256):
+        """Testo di un file in archivio, estratto una volta sola per contenuto"""
+        with self._lock:
+            if sha256 in self._testi:
+                return self._testi[sha256]
+        testo = estrai_testo_pdf(os.path.join(self.cartella, sha256 + '.pdf'))
+        with self._lock:
+            self._testi[sha256] = testo
+        return testo
+
+    def _allegati_bando(self, bando, opzioni):
+        """
+        Scarica la pagina di dettaglio e i suoi PDF.
+        Ritorna ([(url_pdf, sha256, byte, testo)], ultimo errore o None).
+        """
+        opzioni.setdefault('timeout', TIMEOUT)
+        with self._semaforo(bando['url']):
+            response = http_client.get(bando['url'], **opzioni)
+        self._conta('pagine')
+        if response.status_code != 200:
+            return [], None
+
+        risultati = []
+        errore = None
+        for url_pdf in trova_pdf(response.content, response.url, parsing.encoding_risposta(response))[:MAX_ALLEGATI]:
+            try:
+                file = self.scarica_file(url_pdf, **opzioni)
+            except Exception as e:
+                self._conta('errori')
+                print(f"❌ Errore allegato {url_pdf}: {e}")
+                errore = f"{url_pdf}: {e}"
+                continue
+            if file:
+                self._conta('allegati')
+                risultati.append((url_pdf,) + file + (self.testo(file[0]),))
+        return risultati, errore
+
+    def avvia(self):
+        """
+        Avvia in background il download dei bandi accodati e di quelli in
+        sospeso e ritorna subito; i risultati si registrano con raccogli()
+        """
+        lavori, self._lavori = self._lavori, []
+        self.pulisci_parziali()
+        gia_accodati = {bando['chiave'] for bando, _ in lavori}
+        gia_accodati.update(bando['chiave'] for bando, _, _ in self._in_corso)
+        lavori += self._in_sospeso(gia_accodati)
+        if not lavori:
+            return 0
+        if self._executor is None:
+            # File e testi già visti valgono per un giro di download
+            self._scaricati = {}
+            self._testi = {}
+            self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='allegati')
+        self._in_corso += [(bando, opzioni, self._executor.submit(self._allegati_bando, bando, dict(opzioni)))
+                           for bando, opzioni in lavori]
+        return len(lavori)
+
+    def raccogli(self, timeout=0):
+        """
+        Registra le versioni dei bandi già scaricati, dal thread chiamante (la
+        connessione SQLite è sua). Con timeout attende fino a `timeout`
+        secondi, None senza limite. Ritorna quanti bandi sono ancora in corso.
+        """
+        if not self._in_corso:
+            return 0
+        if timeout != 0:
+            wait([future for _, _, future in self._in_corso], timeout=timeout)
+
+        in_corso = []
+        for bando, opzioni, future in self._in_corso:
+            if not future.done():
+                in_corso.append((bando, opzioni, future))
+                continue
+            try:
+                allegati, errore = future.result()
+                self.registra(bando, allegati)
+            except Exception as e:
+                self._conta('errori')
+                print(f"❌ Errore allegati di {bando['titolo'][:50]}...: {e}")
+                errore = str(e)
+            self.segna_esito(bando, opzioni, errore)
+        self._in_corso = in_corso
+        if in_corso:
+            return len(in_corso)
+
+        self._executor.shutdown()
+        self._executor = None
+        s = self.statistiche
+        print(f"📎 Allegati: {s['allegati']} PDF da {s['pagine']} pagine, {s['nuovi_file']} file nuovi, "
+              f"{s['versioni']} versioni registrate, {s['byte'] / 1024:.0f} KB scaricati, {s['errori']} errori")
+        return 0
+
+    def esegui(self):
+        """Scarica gli allegati dei bandi accodati e di quelli in sospeso e registra le versioni"""
+        self.avvia()
+        self.raccogli(timeout=None)
+
+    def abbandona(self):
+        """All'arresto: i bandi non ancora scaricati restano in allegati_in_sospeso"""
+        for bando, opzioni, future in self._in_corso:
+            future.cancel()
+            self.segna_esito(bando, opzioni, 'download interrotto dall\'arresto')
+        self._in_corso = []
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def _in_sospeso(self, gia_accodati):
+        """Bandi con allegati non scaricati nei run precedenti, da riprovare ora"""
+        with self.db.conn:
+            # Bandi spostati in archivio nel frattempo
+            self.db.conn.execute('DELETE FROM allegati_in_sospeso WHERE bando_id NOT IN (SELECT id FROM bandi)')
+        limite = (datetime.now() - timedelta(seconds=ATTESA_RIPRESA)).isoformat()
+        righe = self.db.conn.execute('''
+            SELECT b.chiave, b.url, b.titolo, s.opzioni
+            FROM allegati_in_sospeso s JOIN bandi b ON b.id = s.bando_id
+            WHERE s.data_ultimo_tentativo < ?
+        ''', (limite,)).fetchall()
+        lavori = [
+            ({'chiave': chiave, 'url': url, 'titolo': titolo}, json.loads(opzioni or '{}'))
+            for chiave, url, titolo, opzioni in righe
+            if chiave not in gia_accodati
+        ]
+        if lavori:
+            print(f"📎 Riprendo gli allegati di {len(lavori)} bandi rimasti in sospeso")
+        return lavori
+
+    def segna_esito(self, bando, opzioni, errore):
+        """
+        Toglie il bando da allegati_in_sospeso se tutto è andato bene,
+        altrimenti lo (ri)mette in sospeso fino a MAX_RIPRESE tentativi
+        """
+        bando_id = self._id_bando(bando)
+        if bando_id is None:
+            return
+        with self.db.conn:
+            if errore is None:
+                self.db.conn.execute('DELETE FROM allegati_in_sospeso WHERE bando_id = ?', (bando_id,))
+                return
+            self.db.conn.execute('''
+                INSERT INTO allegati_in_sospeso (bando_id, opzioni, tentativi, data_ultimo_tentativo, ultimo_errore)
+                VALUES (?, ?, 1, ?, ?)
+                ON CONFLICT (bando_id) DO UPDATE SET
+                    opzioni = excluded.opzioni,
+                    tentativi = tentativi + 1,
+                    data_ultimo_tentativo = excluded.data_ultimo_tentativo,
+                    ultimo_errore = excluded.ultimo_errore
+            ''', (bando_id, json.dumps(opzioni), datetime.now().isoformat(), errore))
+            tentativi = self.db.conn.execute(
+                'SELECT tentativi FROM allegati_in_sospeso WHERE bando_id = ?', (bando_id,)
+            ).fetchone()[0]
+            if tentativi >= MAX_RIPRESE:
+                self.db.conn.execute('DELETE FROM allegati_in_sospeso WHERE bando_id = ?', (bando_id,))
+                print(f"🗑️ Allegati di {bando['titolo'][:50]}... abbandonati dopo {tentativi} tentativi: {errore}")
+
+    def pulisci_parziali(self, giorni=GIORNI_PARZIALI):
+        """Cancella i file parziali non più toccati da `giorni` giorni (bandi abbandonati)"""
+        limite = time.time() - giorni * 86400
+        for nome in os.listdir(self.cartella):
+            percorso = os.path.join(self.cartella, nome)
+            if nome.endswith(('.part', '.part.validatore')) and os.path.getmtime(percorso) < limite:
+                os.remove(percorso)
+
+    def _id_bando(self, bando):
+        riga = self.db.conn.execute('SELECT id FROM bandi WHERE chiave = ?', (bando['chiave'],)).fetchone()
+        return riga[0] if riga else None
+
+    def registra(self, bando, allegati):
+        """
+        Aggiunge una versione in pdf_archivio per ogni allegato nuovo o con
+        hash cambiato e aggiorna il testo degli allegati del bando
+        """
+        if not allegati:
+            return
+        bando_id = self._id_bando(bando)
+        if bando_id is None:
+            return
+        ora = datetime.now().isoformat()
+        with self.db.conn:
+            testi = [testo for _, _, _, testo in allegati if testo]
+            if testi:
+                self.db.conn.execute('UPDATE bandi SET testo_allegati = ? WHERE id = ?',
+                                     ('\n\n'.join(testi), bando_id))
+            for url_pdf, sha256, byte, _ in allegati:
+                ultima = self.db.conn.execute('''
+                    SELECT sha256, versione FROM pdf_archivio
+                    WHERE bando_id = ? AND url_pdf = ?
+                    ORDER BY versione DESC LIMIT 1
+                ''', (bando_id, url_pdf)).fetchone()
+                if ultima and ultima[0] == sha256:
+                    continue
+                self.db.conn.execute('''
+                    INSERT INTO pdf_archivio (bando_id, url_pdf, nome_file, data_download, versione, sha256, byte)
+                    VALUES (?, ?, ?, ?, ?, ?, ?)
+                ''', (bando_id, url_pdf, sha256 + '.pdf', ora, ultima[1] + 1 if ultima else 1, sha256, byte))
+                self._conta('versioni')
@@ -0,0 +1,181 @@
+"""
+Conservazione dei bandi scaduti: la tabella bandi resta proporzionale ai bandi aperti
+
+Ogni giorno, a blocchi di BLOCCO righe e con un commit per blocco:
+- le scadenze ancora senza data ISO vengono rilette da data_scadenza;
+- i bandi attivi con la scadenza passata diventano 'scaduto' (e tornano
+  'attivo' se una modifica ha spostato la scadenza in avanti);
+- i bandi scaduti da più di GIORNI_CONSERVAZIONE giorni passano in
+  bandi_archivio, con tutte le colonne in un JSON compresso con zlib, e
+  spariscono da bandi, dall'indice full-text e dall'indice LSH.
+
+Poi l'indice full-text viene compattato e PRAGMA incremental_vacuum
+restituisce al filesystem le pagine liberate. Ogni passo seleziona solo le
+righe ancora da trattare: un'esecuzione interrotta riprende da dove era
+rimasta e una seconda esecuzione nello stesso giorno non cambia nulla.
+
+Le chiavi dei bandi archiviati restano in IndiceBandi (itera_chiavi_archiviate):
+le fonti che elencano ancora un bando archiviato non lo fanno sembrare nuovo.
+Gli id non vengono mai riusati (AUTOINCREMENT), quindi aggiornamenti e
+pdf_archivio continuano a puntare al bando archiviato.
+
+Uso: python src/archivio.py [--db percorso] [--giorni N]
+"""
+
+import argparse
+import json
+import time
+import zlib
+from datetime import datetime
+from migrazioni import riempi_a_blocchi
+
+# Giorni dopo la scadenza per cui un bando resta nella tabella bandi
+GIORNI_CONSERVAZIONE = 180
+# Righe per transazione
+BLOCCO = 500
+# Colonne binarie: chiave e impronta hanno colonne proprie in archivio, la
+# firma MinHash si ricalcola da titolo e testo (simili.firma)
+_COLONNE_BINARIE = ('chiave', 'impronta', 'firma')
+
+
+def _a_blocchi(conn, sql, parametri=(), blocco=BLOCCO):
+    """Ripete un UPDATE limitato a `blocco` righe finché non ne trova più"""
+    totale = 0
+    while True:
+        with conn:
+            modificate = conn.execute(sql, (*parametri, blocco)).rowcount
+        totale += modificate
+        if modificate < blocco:
+            return totale
+
+
+def aggiorna_stati(conn, blocco=BLOCCO):
+    """Segna 'scaduto' i bandi attivi con la scadenza passata. Ritorna (scaduti, riattivati)"""
+    scaduti = _a_blocchi(conn, '''
+        UPDATE bandi SET stato = 'scaduto' WHERE id IN (
+            SELECT id FROM bandi WHERE stato = 'attivo' AND scadenza_iso < date('now', 'localtime') LIMIT ?
+        )
+    ''', blocco=blocco)
+    # Scadenza prorogata dopo che il bando era già stato dato per scaduto
+    riattivati = _a_blocchi(conn, '''
+        UPDATE bandi SET stato = 'attivo' WHERE id IN (
+            SELECT id FROM bandi WHERE stato = 'scaduto' AND scadenza_iso >= date('now', 'localtime') LIMIT ?
+        )
+    ''', blocco=blocco)
+    return scaduti, riattivati
+
+
+def archivia(conn, giorni=GIORNI_CONSERVAZIONE, blocco=BLOCCO):
+    """
+    Sposta in bandi_archivio i bandi scaduti da più di `giorni` giorni.
+    Ritorna (numero di bandi archiviati, loro chiavi).
+    """
+    totale = 0
+    chiavi = []
+    while True:
+        cursor = conn.execute('''
+            SELECT * FROM bandi
+            WHERE stato = 'scaduto' AND scadenza_iso < date('now', 'localtime', ?)
+            ORDER BY scadenza_iso
+            LIMIT ?
+        ''', (f'-{int(giorni)} days', blocco))
+        colonne = [c[0] for c in cursor.description]
+        righe = [dict(zip(colonne, riga)) for riga in cursor]
+        if not righe:
+            return totale, chiavi
+
+        ora = datetime.now().isoformat()
+        ids = [(riga['id'],) for riga in righe]
+        with conn:
+            conn.executemany('''
+                INSERT OR IGNORE INTO bandi_archivio
+                    (id, chiave, impronta, url, titolo, ente, scadenza_iso, data_archiviazione, dati)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ''', [
+                (riga['id'], riga['chiave'], riga['impronta'], riga['url'], riga['titolo'], riga['ente'],
+                 riga['scadenza_iso'], ora, comprimi(riga))
+                for riga in righe
+            ])
+            conn.executemany('DELETE FROM bandi_lsh WHERE bando_id = ?', ids)
+            # I quasi-duplicati di un bando archiviato diventano canonici di se stessi
+            conn.executemany('UPDATE bandi SET canonico_id = NULL WHERE canonico_id = ?', ids)
+            # Il trigger bandi_fts_cancellazione toglie le righe dall'indice full-text
+            conn.executemany('DELETE FROM bandi WHERE id = ?', ids)
+        totale += len(righe)
+        chiavi.extend(riga['chiave'] for riga in righe if riga['chiave'] is not None)
+
+
+def comprimi(riga):
+    dati = {colonna: valore for colonna, valore in riga.items() if colonna not in _COLONNE_BINARIE}
+    return zlib.compress(json.dumps(dati, ensure_ascii=False).encode('utf-8'))
+
+
+def leggi(conn, bando_id):
+    """Il bando archiviato come dizionario con le colonne di bandi (senza firma), o None"""
+    riga = conn.execute(
+        'SELECT chiave, impronta, data_archiviazione, dati FROM bandi_archivio WHERE id = ?', (bando_id,)
+    ).fetchone()
+    if riga is None:
+        return None
+    chiave, impronta, data_archiviazione, dati = riga
+    bando = json.loads(zlib.decompress(dati).decode('utf-8'))
+    bando.update(chiave=chiave, impronta=impronta, data_archiviazione=data_archiviazione)
+    return bando
+
+
+def compatta(conn):
+    """Compatta l'indice full-text e libera le pagine vuote. Ritorna i byte liberati"""
+    with conn:
+        conn.execute("INSERT INTO bandi_fts (bandi_fts) VALUES ('optimize')")
+    pagina = conn.execute('PRAGMA page_size').fetchone()[0]
+    libere = conn.execute('PRAGMA freelist_count').fetchone()[0]
+    # Con auto_vacuum=INCREMENTAL (migrazione 11) tronca il file delle pagine
+    # libere. Libera una pagina per passo: execute() ne farebbe uno solo
+    conn.executescript('PRAGMA incremental_vacuum;')
+    return (libere - conn.execute('PRAGMA freelist_count').fetchone()[0]) * pagina
+
+
+def esegui(db, indice=None, giorni=GIORNI_CONSERVAZIONE, blocco=BLOCCO):
+    """
+    Tutto il ciclo di conservazione; ritorna le statistiche. Con indice
+    (dedup.IndiceBandi già caricato) i bandi archiviati vi vengono segnati.
+    """
+    inizio = time.monotonic()
+    conn = db.conn
+    riempi_a_blocchi(conn, 'bandi', 'scadenza_iso = data_iso(data_scadenza)',
+                     'scadenza_iso IS NULL AND data_scadenza IS NOT NULL AND data_iso(data_scadenza) IS NOT NULL',
+                     blocco=blocco)
+    scaduti, riattivati = aggiorna_stati(conn, blocco)
+    archiviati, chiavi = archivia(conn, giorni, blocco)
+    if indice is not None:
+        indice.archivia(chiavi)
+    liberati = compatta(conn) if archiviati else 0
+    statistiche = {
+        'scaduti': scaduti,
+        'riattivati': riattivati,
+        'archiviati': archiviati,
+        'byte_liberati': liberati,
+        'durata': time.monotonic() - inizio,
+    }
+    if scaduti or riattivati or archiviati:
+        print(f"🗄️ Conservazione: {scaduti} bandi scaduti, {riattivati} riattivati, "
+              f"{archiviati} archiviati, {liberati / 1024:.0f} KB liberati in {statistiche['durata']:.1f}s")
+    return statistiche
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Segna i bandi scaduti e archivia i più vecchi')
+    parser.add_argument('--db', default='data/sentinel.db', help='percorso del database')
+    parser.add_argument('--giorni', type=int, default=GIORNI_CONSERVAZIONE,
+                        help='giorni dopo la scadenza prima di archiviare un bando')
+    argomenti = parser.parse_args()
+
+    from database import Database
+    with Database(argomenti.db) as db:
+        s = esegui(db, giorni=argomenti.giorni)
+        in_archivio = db.conn.execute('SELECT COUNT(*) FROM bandi_archivio').fetchone()[0]
+        print(f"📊 {db.conta_bandi()} bandi in tabella, {in_archivio} in archivio ({s['durata']:.2f}s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,39 @@
+"""
+Ricerca full-text nell'archivio dei bandi
+
+Uso: python src/cerca.py "stabilimento balneare" [--tutti] [--limite N] [--db percorso]
+
+La query segue la sintassi FTS5: parole (tutte obbligatorie), "frase esatta",
+OR, NOT, prefisso*.
+"""
+
+import argparse
+import time
+from database import Database
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Cerca nei bandi salvati (titolo, testo e allegati PDF)')
+    parser.add_argument('query', nargs='+', help='parole o espressione FTS5')
+    parser.add_argument('--tutti', action='store_true', help='includi i bandi non più attivi')
+    parser.add_argument('--limite', type=int, default=20, help='numero massimo di risultati')
+    parser.add_argument('--db', default='data/sentinel.db', help='percorso del database')
+    argomenti = parser.parse_args()
+
+    query = ' '.join(argomenti.query)
+    with Database(argomenti.db) as db:
+        inizio = time.perf_counter()
+        risultati = db.cerca(query, solo_attivi=not argomenti.tutti, limite=argomenti.limite)
+        durata = time.perf_counter() - inizio
+
+    for i, bando in enumerate(risultati, 1):
+        stato = '' if bando['stato'] == 'attivo' else f" [{bando['stato']}]"
+        print(f"{i}. {bando['titolo'][:90]}{stato}")
+        print(f"   🏢 {bando['ente']} | 📅 Scade: {bando['data_scadenza'] or 'N/A'} | ⭐ {bando['score']} | 🎯 {bando['rilevanza'] or 0:.0f}")
+        print(f"   🔎 {bando['estratto']}")
+        print(f"   🔗 {bando['url']}\n")
+    print(f"🔍 {len(risultati)} risultati per '{query}' in {durata * 1000:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -4,125 +4,254 @@ Database SQLite per Liguria Sentinel
 
 import sqlite3
 import os
+from datetime import datetime
+from scadenze import normalizza_data
+import migrazioni
 
 
 class Database:
     
     def __init__(self, db_path='data/sentinel.db'):
         self.db_path = db_path
-        os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        cartella = os.path.dirname(db_path)
+        if cartella:
+            os.makedirs(cartella, exist_ok=True)
+        self.conn = sqlite3.connect(db_path)
+        self._configura()
         self.inizializza()
     
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *args):
+        self.chiudi()
+    
+    def _configura(self):
+        """Imposta WAL e pragma per una connessione unica e longeva"""
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        self.conn.execute('PRAGMA temp_store=MEMORY')
+        self.conn.execute('PRAGMA cache_size=-8000')
+        self.conn.execute('PRAGMA busy_timeout=5000')
+        # data_iso(data_scadenza) normalizza le date testuali direttamente nelle query
+        self.conn.create_function('data_iso', 1, normalizza_data, deterministic=True)
+    
+    def chiudi(self):
+        """Chiude la connessione (il WAL viene riportato nel file principale)"""
+        if self.conn is not None:
+            self.conn.close()
+            self.conn = None
+    
     def inizializza(self):
-        """Crea le tabelle se non esistono"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS bandi (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                titolo TEXT NOT NULL,
-                url TEXT UNIQUE NOT NULL,
-                ente TEXT,
-                tipo TEXT,
-                data_scadenza TEXT,
-                keywords_match TEXT,
-                score INTEGER DEFAULT 0,
-                stato TEXT DEFAULT 'attivo',
-                data_trovato TEXT,
-                data_aggiornamento TEXT
-            )
-        ''')
-        
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS aggiornamenti (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                bando_id INTEGER,
-                tipo_aggiornamento TEXT,
-                descrizione TEXT,
-                data_aggiornamento TEXT,
-                FOREIGN KEY (bando_id) REFERENCES bandi(id)
-            )
-        ''')
-        
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS controlli (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                fonte TEXT,
-                data_controllo TEXT,
-                bandi_trovati INTEGER,
-                bandi_nuovi INTEGER,
-                esito TEXT,
-                note TEXT
-            )
-        ''')
-        
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS pdf_archivio (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                bando_id INTEGER,
-                url_pdf TEXT,
-                nome_file TEXT,
-                data_download TEXT,
-                versione INTEGER DEFAULT 1,
-                FOREIGN KEY (bando_id) REFERENCES bandi(id)
+        """Porta lo schema all'ultima versione (vedi migrazioni.py)"""
+        applicate = migrazioni.applica(self.conn)
+        if applicate:
+            print(f"✅ Database aggiornato alla versione {applicate[-1].versione}")
+    
+    def itera_impronte(self):
+        """Scorre (chiave, impronta) di tutti i bandi con un'unica query"""
+        yield from self.conn.execute('SELECT chiave, impronta FROM bandi WHERE chiave IS NOT NULL')
+    
+    def itera_chiavi_archiviate(self):
+        """Scorre le chiavi dei bandi spostati in bandi_archivio (archivio.py)"""
+        for (chiave,) in self.conn.execute('SELECT chiave FROM bandi_archivio WHERE chiave IS NOT NULL'):
+            yield chiave
+    
+    def _valori(self, bando):
+        # Se il bando è già stato analizzato (keywords.analizza_bando) si usa
+        # direttamente il risultato
+        analisi = bando.get('analisi')
+        if analisi is not None:
+            keywords_match = ', '.join(analisi.keywords) or None
+            score = analisi.score
+        else:
+            keywords_match = bando.get('keywords_match')
+            score = bando.get('score', 0)
+        return (
+            bando.get('titolo'),
+            bando.get('url'),
+            bando.get('ente'),
+            bando.get('tipo', 'bando'),
+            bando.get('data_scadenza'),
+            keywords_match,
+            score,
+            bando.get('data_trovato'),
+            normalizza_data(bando.get('data_scadenza')),
+            bando.get('impronta'),
+            bando.get('chiave'),
+            bando.get('testo'),
+            bando.get('rilevanza')
+        )
+    
+    def salva_bandi(self, bandi):
+        """
+        Salva una lista di bandi in un'unica transazione.
+        I bandi con chiave (o URL) già presente vengono ignorati.
+        Ritorna la lista dei bandi effettivamente inseriti.
+        """
+        nuovi = []
+        with self.conn:
+            for bando in bandi:
+                cursor = self.conn.execute('''
+                    INSERT INTO bandi (titolo, url, ente, tipo, data_scadenza, keywords_match, score, data_trovato, scadenza_iso, impronta, chiave, testo, rilevanza)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                    ON CONFLICT DO NOTHING
+                ''', self._valori(bando))
+                if cursor.rowcount == 1:
+                    bando['id'] = cursor.lastrowid
+                    nuovi.append(bando)
+        return nuovi
+    
+    def aggiorna_bandi(self, bandi):
+        """
+        Aggiorna i bandi il cui contenuto è cambiato e registra ogni modifica
+        nella tabella aggiornamenti, in un'unica transazione.
+        Ritorna la lista di (bando, descrizione della modifica).
+        """
+        aggiornati = []
+        ora = datetime.now().isoformat()
+        with self.conn:
+            for bando in bandi:
+                riga = self.conn.execute(
+                    'SELECT id, titolo, data_scadenza, canonico_id FROM bandi WHERE chiave = ?', (bando['chiave'],)
+                ).fetchone()
+                if riga is None:
+                    continue
+                bando_id, titolo_prima, scadenza_prima, canonico_id = riga
+                bando['id'] = bando_id
+                bando['canonico_id'] = canonico_id
+                
+                modifiche = []
+                if (scadenza_prima or None) != (bando.get('data_scadenza') or None):
+                    modifiche.append(f"scadenza: {scadenza_prima or 'N/A'} → {bando.get('data_scadenza') or 'N/A'}")
+                if titolo_prima != bando['titolo']:
+                    modifiche.append('titolo modificato')
+                descrizione = '; '.join(modifiche) or 'testo modificato'
+                
+                titolo, _, _, _, data_scadenza, keywords_match, score, _, scadenza_iso, impronta, _, testo, rilevanza = self._valori(bando)
+                self.conn.execute('''
+                    UPDATE bandi
+                    SET titolo = ?, data_scadenza = ?, scadenza_iso = ?, keywords_match = ?,
+                        score = ?, impronta = ?, testo = ?, rilevanza = ?, data_aggiornamento = ?
+                    WHERE id = ?
+                ''', (titolo, data_scadenza, scadenza_iso, keywords_match, score, impronta, testo, rilevanza, ora, bando_id))
+                self.conn.execute('''
+                    INSERT INTO aggiornamenti (bando_id, tipo_aggiornamento, descrizione, data_aggiornamento)
+                    VALUES (?, 'contenuto', ?, ?)
+                ''', (bando_id, descrizione, ora))
+                aggiornati.append((bando, descrizione))
+        return aggiornati
+    
+    def imposta_impronte(self, bandi):
+        """Registra l'impronta dei bandi salvati prima che esistessero le impronte"""
+        with self.conn:
+            self.conn.executemany(
+                'UPDATE bandi SET impronta = ? WHERE chiave = ? AND impronta IS NULL',
+                [(bando['impronta'], bando['chiave']) for bando in bandi]
             )
-        ''')
-        
-        conn.commit()
-        conn.close()
-        print("✅ Database completo inizializzato (4 tabelle)")
-    
-    def bando_esiste(self, url):
-        """Controlla se un bando esiste già nel database tramite URL"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        cursor.execute('SELECT id FROM bandi WHERE url = ?', (url,))
-        result = cursor.fetchone()
-        conn.close()
-        return result is not None
-    
-    def salva_bando(self, bando):
-        """Salva un nuovo bando nel database"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        try:
-            cursor.execute('''
-                INSERT INTO bandi (titolo, url, ente, tipo, data_scadenza, keywords_match, score, data_trovato)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-            ''', (
-                bando.get('titolo'),
-                bando.get('url'),
-                bando.get('ente'),
-                bando.get('tipo', 'bando'),
-                bando.get('data_scadenza'),
-                bando.get('keywords_match'),
-                bando.get('score', 0),
-                bando.get('data_trovato')
-            ))
-            conn.commit()
-            return True
-        except sqlite3.IntegrityError:
-            return False
-        finally:
-            conn.close()
     
     def conta_bandi(self):
         """Conta i bandi nel database"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        cursor.execute('SELECT COUNT(*) FROM bandi')
-        result = cursor.fetchone()[0]
-        conn.close()
-        return result
+        return self.conn.execute('SELECT COUNT(*) FROM bandi').fetchone()[0]
     
     def get_tutti_bandi(self):
         """Ritorna tutti i bandi nel database"""
-        conn = sqlite3.connect(self.db_path)
-        conn.row_factory = sqlite3.Row
-        cursor = conn.cursor()
-        cursor.execute('SELECT * FROM bandi ORDER BY data_trovato DESC')
-        rows = cursor.fetchall()
-        conn.close()
-        return [dict(row) for row in rows]
+        return self._dizionari(self.conn.execute('SELECT * FROM bandi ORDER BY data_trovato DESC'))
+    
+    def _dizionari(self, cursor):
+        colonne = [c[0] for c in cursor.description]
+        return [dict(zip(colonne, row)) for row in cursor]
+    
+    def bandi_in_scadenza(self, giorni=7):
+        """Bandi attivi che scadono da oggi ai prossimi `giorni` giorni (range sull'indice stato+scadenza)"""
+        cursor = self.conn.execute('''
+            SELECT * FROM bandi
+            WHERE stato = 'attivo'
+              AND scadenza_iso BETWEEN date('now', 'localtime') AND date('now', 'localtime', ?)
+            ORDER BY scadenza_iso
+        ''', (f'+{int(giorni)} days',))
+        return self._dizionari(cursor)
+    
+    def top_bandi(self, n=10, min_score=0):
+        """I bandi attivi con lo score più alto (scansione dell'indice su score)"""
+        cursor = self.conn.execute('''
+            SELECT * FROM bandi INDEXED BY idx_bandi_score
+            WHERE score >= ? AND stato = 'attivo'
+            ORDER BY score DESC
+            LIMIT ?
+        ''', (min_score, n))
+        return self._dizionari(cursor)
+    
+    def per_ente(self, ente):
+        """Bandi di un ente, ordinati per scadenza"""
+        cursor = self.conn.execute(
+            'SELECT * FROM bandi WHERE ente = ? ORDER BY scadenza_iso',
+            (ente,)
+        )
+        return self._dizionari(cursor)
+    
+    def cerca(self, query, solo_attivi=True, limite=20):
+        """
+        Ricerca full-text su titolo, testo e testo degli allegati PDF.
+        La query usa la sintassi FTS5 ("frase esatta", OR, NOT, prefisso*);
+        se non è valida viene cercata come semplice elenco di parole.
+        Risultati ordinati per pertinenza alla query (bm25, il titolo pesa di più).
+        """
+        sql = '''
+            SELECT b.id, b.titolo, b.ente, b.data_scadenza, b.url, b.score, b.rilevanza, b.stato,
+                   snippet(bandi_fts, -1, '[', ']', '…', 12) AS estratto,
+                   bm25(bandi_fts, 10.0, 2.0, 1.0) AS pertinenza
+            FROM bandi_fts
+            JOIN bandi b ON b.id = bandi_fts.rowid
+            WHERE bandi_fts MATCH ?
+        ''' + (" AND b.stato = 'attivo'" if solo_attivi else '') + '''
+            ORDER BY pertinenza
+            LIMIT ?
+        '''
+        try:
+            return self._dizionari(self.conn.execute(sql, (query, limite)))
+        except sqlite3.OperationalError:
+            parole = ' '.join('"' + parola.replace('"', '""') + '"' for parola in query.split())
+            if not parole:
+                return []
+            return self._dizionari(self.conn.execute(sql, (parole, limite)))
+    
+    def itera_riepilogo(self, ente=None, min_score=None):
+        """
+        Scorre (titolo, ente, data_scadenza) dei bandi attivi e non scaduti,
+        dal più vicino alla scadenza; quelli senza data in fondo. I
+        quasi-duplicati di un bando di un'altra fonte non vengono ripetuti.
+        Le righe arrivano dal cursore una alla volta.
+        """
+        filtro, parametri = self._filtro_riepilogo(ente, min_score)
+        # Due range scan sull'indice (stato, scadenza_iso) invece di un OR
+        yield from self.conn.execute(
+            "SELECT titolo, ente, data_scadenza FROM bandi WHERE stato = 'attivo' "
+            "AND scadenza_iso >= date('now', 'localtime') AND canonico_id IS NULL" + filtro + ' ORDER BY scadenza_iso, id',
+            parametri
+        )
+        yield from self.conn.execute(
+            "SELECT titolo, ente, data_scadenza FROM bandi WHERE stato = 'attivo' "
+            "AND scadenza_iso IS NULL AND canonico_id IS NULL" + filtro + ' ORDER BY id',
+            parametri
+        )
+    
+    def conta_riepilogo(self, ente=None, min_score=None):
+        filtro, parametri = self._filtro_riepilogo(ente, min_score)
+        return self.conn.execute(
+            "SELECT COUNT(*) FROM bandi WHERE stato = 'attivo' "
+            "AND (scadenza_iso IS NULL OR scadenza_iso >= date('now', 'localtime')) "
+            "AND canonico_id IS NULL" + filtro,
+            parametri
+        ).fetchone()[0]
+    
+    def _filtro_riepilogo(self, ente, min_score):
+        filtro = ''
+        parametri = []
+        if ente is not None:
+            filtro += ' AND ente = ?'
+            parametri.append(ente)
+        if min_score is not None:
+            filtro += ' AND score >= ?'
+            parametri.append(min_score)
+        return filtro, parametri
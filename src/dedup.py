@@ -0,0 +1,98 @@
+"""
+Identità dei bandi, deduplicazione in memoria dei bandi già presenti nel
+database e rilevamento delle modifiche tramite impronta del contenuto
+"""
+
+import hashlib
+from keywords import normalizza, tokenizza
+from scadenze import normalizza_data
+
+
+def _digest(*parti):
+    return hashlib.blake2b('\x1f'.join(parti).encode('utf-8'), digest_size=16).digest()
+
+
+def chiave_url(url):
+    """Identità (16 byte) di un bando con una propria pagina di dettaglio"""
+    return _digest('url', url)
+
+
+def chiave_titolo(url_pagina, titolo):
+    """
+    Identità (16 byte) di un bando senza pagina di dettaglio: la pagina che lo
+    elenca più il titolo intero normalizzato (maiuscole, accenti, punteggiatura
+    e spazi non contano).
+    """
+    return _digest('titolo', url_pagina, ' '.join(tokenizza(normalizza(titolo))))
+
+
+def chiave_sql(url, titolo):
+    """Identità di una riga già salvata, usata dalla migrazione che introduce le chiavi"""
+    if '#' in url:
+        return chiave_titolo(url.split('#', 1)[0], titolo)
+    return chiave_url(url)
+
+
+def impronta_bando(bando):
+    """
+    Impronta (16 byte) del contenuto di un bando: titolo, testo e scadenza
+    normalizzati. Cambia solo se cambia qualcosa di visibile al lettore.
+    """
+    scadenza = bando.get('data_scadenza')
+    parti = [
+        normalizza(bando.get('titolo') or ''),
+        normalizza(bando.get('testo') or ''),
+        normalizza_data(scadenza) or normalizza(scadenza or ''),
+    ]
+    return _digest(*parti)
+
+
+class IndiceBandi:
+    """
+    Chiavi dei bandi noti con l'impronta del contenuto, caricate una volta per
+    run. Il controllo di un bando costa un lookup in memoria invece di una query.
+    """
+
+    def __init__(self, db):
+        self._noti = dict(db.itera_impronte())
+        # Bandi scaduti da tempo e archiviati: noti, ma non più confrontati
+        self._archiviati = set(db.itera_chiavi_archiviate())
+
+    def __len__(self):
+        return len(self._noti) + len(self._archiviati)
+
+    def contiene(self, chiave):
+        return chiave in self._noti or chiave in self._archiviati
+
+    def aggiungi(self, chiave, impronta=None):
+        self._noti[chiave] = impronta
+
+    def archivia(self, chiavi):
+        """Bandi appena spostati in archivio (archivio.esegui)"""
+        for chiave in chiavi:
+            self._noti.pop(chiave, None)
+            self._archiviati.add(chiave)
+
+    def classifica(self, bandi):
+        """
+        Divide i bandi in (nuovi, modificati, senza_impronta) confrontando le
+        impronte in memoria; a ogni bando viene assegnata bando['impronta'].
+        senza_impronta sono i bandi noti salvati prima delle impronte: non c'è
+        una versione con cui confrontarli, si registra solo quella attuale.
+        I bandi archiviati non finiscono in nessuna delle tre liste.
+        """
+        nuovi = []
+        modificati = []
+        senza_impronta = []
+        for bando in bandi:
+            bando['impronta'] = impronta_bando(bando)
+            chiave = bando['chiave']
+            if chiave in self._archiviati:
+                continue
+            if chiave not in self._noti:
+                nuovi.append(bando)
+            elif self._noti[chiave] is None:
+                senza_impronta.append(bando)
+            elif self._noti[chiave] != bando['impronta']:
+                modificati.append(bando)
+        return nuovi, modificati, senza_impronta
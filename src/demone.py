@@ -0,0 +1,364 @@
+"""
+Modalità demone: scansione continua con una pianificazione per fonte
+
+Invece di un run al giorno, il processo resta acceso e tiene caldi
+connessione al database, pool HTTP, matcher delle keywords, indici in
+memoria e browser headless. Ogni fonte ha il suo intervallo, adattato al
+ritmo con cui pubblica (novità all'ora, media mobile): le fonti che cambiano
+spesso si controllano ogni INTERVALLO_MIN, quelle ferme si diradano fino a
+INTERVALLO_MAX. Dopo un errore l'intervallo raddoppia a ogni fallimento di
+fila e nelle ore di silenzio non parte nessun controllo.
+
+Al massimo MAX_CONCORRENZA fonti sono in scansione insieme e una fonte non
+viene mai rilanciata finché il suo scrape precedente non è terminato, anche
+se è già stato dato per scaduto.
+
+Uso: python src/demone.py   (SIGINT o SIGTERM per fermarlo)
+"""
+
+import os
+import random
+import signal
+import threading
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from datetime import datetime, timedelta
+import archivio
+import http_client
+import motore
+from allegati import ScaricatorePdf
+from database import Database
+from dedup import IndiceBandi
+from http_cache import HttpCache
+from keywords import get_matcher
+from metriche import Metriche
+from notifiche import CodaNotifiche
+from rendering import PoolBrowser
+from rilevanza import MotoreRilevanza
+from scraper import aggiorna_cache, elabora_esito, invia_riepilogo_giornaliero, invia_riepilogo_quindicinale, scansione_profonda
+from scrapers import crea_scrapers
+from simili import IndiceSimili
+
+MAX_CONCORRENZA = 4
+INTERVALLO_MIN = timedelta(minutes=10)
+INTERVALLO_MAX = timedelta(hours=2)
+# L'intervallo punta a trovare in media NOVITA_PER_CONTROLLO bandi nuovi o
+# aggiornati a ogni controllo, dato il ritmo stimato della fonte
+NOVITA_PER_CONTROLLO = 0.5
+# Peso dell'ultimo controllo nella media mobile del ritmo
+PESO_OSSERVAZIONE = 0.3
+# Giorni di controlli usati per stimare il ritmo di ogni fonte all'avvio
+GIORNI_STORICO = 14
+BACKOFF_MAX = timedelta(hours=6)
+# Variazione casuale degli intervalli, perché le fonti non si allineino
+DISPERSIONE = 0.1
+# SENTINEL_ORE_SILENZIO: "inizio-fine" in ore locali senza controlli (vuoto per disattivarle)
+ORE_SILENZIO = os.environ.get('SENTINEL_ORE_SILENZIO', '21-7')
+ORA_RIEPILOGO = 9
+# Ogni quanto si rimettono in coda le notifiche fallite (una ripresa per volta,
+# fino a notifiche.MAX_RIPRESE)
+RIPROVA_NOTIFICHE = timedelta(hours=1)
+# Attesa massima del ciclo principale: limita anche la latenza di arresto
+PASSO = 1.0
+
+
+def leggi_ore_silenzio(valore=ORE_SILENZIO):
+    """(inizio, fine) da "21-7", None se non configurate"""
+    if not valore:
+        return None
+    inizio, fine = (int(ora) for ora in valore.split('-'))
+    return inizio, fine
+
+
+def in_silenzio(quando, silenzio):
+    if silenzio is None:
+        return False
+    inizio, fine = silenzio
+    if inizio <= fine:
+        return inizio <= quando.hour < fine
+    # Intervallo a cavallo della mezzanotte
+    return quando.hour >= inizio or quando.hour < fine
+
+
+def fine_silenzio(quando, silenzio):
+    """Primo istante dopo `quando` in cui finiscono le ore di silenzio"""
+    fine = quando.replace(hour=silenzio[1], minute=0, second=0, microsecond=0)
+    if fine <= quando:
+        fine += timedelta(days=1)
+    return fine
+
+
+def intervallo_da_tasso(tasso):
+    """Intervallo fra due controlli per una fonte con `tasso` novità all'ora"""
+    if tasso <= 0:
+        return INTERVALLO_MAX
+    return min(INTERVALLO_MAX, max(INTERVALLO_MIN, timedelta(hours=NOVITA_PER_CONTROLLO / tasso)))
+
+
+def tassi_storici(db, giorni=GIORNI_STORICO, ora=None):
+    """Novità all'ora di ogni fonte (per nome) negli ultimi `giorni` di controlli"""
+    ora = ora or datetime.now()
+    tassi = {}
+    for fonte, novita, primo in db.conn.execute('''
+        SELECT fonte, SUM(COALESCE(bandi_nuovi, 0) + COALESCE(bandi_aggiornati, 0)), MIN(data_controllo)
+        FROM controlli
+        WHERE data_controllo >= ?
+        GROUP BY fonte
+    ''', ((ora - timedelta(days=giorni)).isoformat(),)):
+        # Almeno un giorno: con il cron giornaliero c'è un solo controllo al giorno
+        ore = max(24.0, (ora - datetime.fromisoformat(primo)).total_seconds() / 3600)
+        tassi[fonte] = (novita or 0) / ore
+    return tassi
+
+
+class StatoFonte:
+    """Pianificazione e scansione in corso di una fonte"""
+
+    def __init__(self, scraper, tasso=0.0):
+        self.scraper = scraper
+        self.tasso = tasso
+        self.intervallo = intervallo_da_tasso(tasso)
+        self.errori = 0
+        self.prossimo = None
+        self.ultimo_controllo = None
+        self.ultima_profonda = None
+        # Scrape in corso: future, istante di partenza e timeout
+        self.future = None
+        self.partenza = None
+        self.timeout = motore.TIMEOUT_FONTE
+        # Dato per scaduto: il risultato, quando arriva, viene ignorato
+        self.scaduto = False
+
+
+class Pianificatore:
+    """Quando controllare ogni fonte: ritmo stimato, backoff sugli errori e ore di silenzio"""
+
+    def __init__(self, scrapers, tassi=None, silenzio=None, ora=None):
+        ora = ora or datetime.now()
+        tassi = tassi or {}
+        self.silenzio = silenzio
+        self.stati = {}
+        for i, scraper in enumerate(scrapers):
+            stato = StatoFonte(scraper, tassi.get(scraper.nome, 0.0))
+            # Al primo giro le fonti partono scaglionate
+            stato.prossimo = self._fuori_silenzio(ora + timedelta(seconds=5 * i))
+            self.stati[scraper.id] = stato
+
+    def dovute(self, ora):
+        """Fonti da controllare adesso, dalla più in ritardo; mai quelle ancora in corso"""
+        return sorted(
+            (stato for stato in self.stati.values() if stato.future is None and stato.prossimo <= ora),
+            key=lambda stato: stato.prossimo
+        )
+
+    def in_corso(self):
+        return [stato for stato in self.stati.values() if stato.future is not None]
+
+    def registra_controllo(self, stato, novita, ora):
+        """Aggiorna il ritmo della fonte e pianifica il prossimo controllo"""
+        if stato.ultimo_controllo is not None:
+            ore = (ora - stato.ultimo_controllo).total_seconds() / 3600
+            if ore > 0:
+                stato.tasso = PESO_OSSERVAZIONE * novita / ore + (1 - PESO_OSSERVAZIONE) * stato.tasso
+        stato.ultimo_controllo = ora
+        stato.errori = 0
+        stato.intervallo = intervallo_da_tasso(stato.tasso)
+        stato.prossimo = self._pianifica(ora, stato.intervallo)
+
+    def registra_errore(self, stato, ora):
+        """Backoff esponenziale dall'ultimo intervallo normale; ritorna l'attesa"""
+        stato.errori += 1
+        attesa = min(BACKOFF_MAX, stato.intervallo * 2 ** stato.errori)
+        stato.prossimo = self._pianifica(ora, attesa)
+        return attesa
+
+    def _pianifica(self, ora, attesa):
+        return self._fuori_silenzio(ora + attesa * random.uniform(1 - DISPERSIONE, 1 + DISPERSIONE))
+
+    def _fuori_silenzio(self, quando):
+        if in_silenzio(quando, self.silenzio):
+            # Alla fine del silenzio le fonti ripartono sparse nei primi minuti
+            return fine_silenzio(quando, self.silenzio) + timedelta(minutes=random.uniform(0, 5))
+        return quando
+
+
+class Demone:
+
+    def __init__(self, max_concorrenza=MAX_CONCORRENZA, silenzio=None):
+        self.db = Database()
+        self.cache = HttpCache(self.db)
+        self.indice = IndiceBandi(self.db)
+        self.simili = IndiceSimili(self.db)
+        self.rilevanza = MotoreRilevanza(self.db.conn)
+        if self.rilevanza.profilo_cambiato:
+            print("🎯 Profilo di keywords cambiato: ricalcolo la rilevanza di tutti i bandi")
+            self.rilevanza.ricalcola()
+        self.coda = CodaNotifiche(self.db)
+        self.scaricatore = ScaricatorePdf(self.db)
+        self.browser = PoolBrowser()
+        # L'automa delle keywords si costruisce una volta per tutto il processo
+        get_matcher()
+
+        scrapers = crea_scrapers(cache=self.cache, indice=self.indice, browser=self.browser)
+        self.pianificatore = Pianificatore(scrapers, tassi_storici(self.db), silenzio)
+        self.max_concorrenza = max_concorrenza
+        # I worker occupati da scrape scaduti contano nel limite: niente code nascoste
+        self.executor = ThreadPoolExecutor(max_workers=max_concorrenza, thread_name_prefix='scraper')
+        self._ferma = threading.Event()
+        self.totali = {'trovati': 0, 'nuovi': 0, 'aggiornati': 0}
+        ora = datetime.now()
+        self._ultimo_riepilogo = ora.date() if ora.hour >= ORA_RIEPILOGO else None
+        # Le notifiche in sospeso all'avvio le ha già accodate CodaNotifiche
+        self._ultimo_recupero = ora
+
+    def ferma(self, *args):
+        if not self._ferma.is_set():
+            print("🛑 Arresto richiesto, attendo le scansioni in corso...")
+        self._ferma.set()
+
+    def esegui(self):
+        print(f"🤖 Demone avviato: {len(self.pianificatore.stati)} fonti, al massimo {self.max_concorrenza} insieme")
+        while not self._ferma.is_set():
+            self._avvia_dovute(datetime.now())
+            self._attendi(PASSO)
+            self._raccogli()
+            self.scaricatore.raccogli()
+            self._compiti_giornalieri(datetime.now())
+            self._recupera_notifiche(datetime.now())
+        self._chiudi()
+
+    def _avvia_dovute(self, ora):
+        liberi = self.max_concorrenza - len(self.pianificatore.in_corso())
+        for stato in self.pianificatore.dovute(ora)[:max(0, liberi)]:
+            self._avvia(stato, ora)
+
+    def _avvia(self, stato, ora):
+        # La prima scansione del giorno di scansione profonda scorre tutte le pagine
+        profonda = scansione_profonda() and stato.ultima_profonda != ora.date()
+        if profonda:
+            stato.ultima_profonda = ora.date()
+            print(f"📚 {stato.scraper.nome}: scansione profonda")
+        stato.scraper.profonda = profonda
+        stato.timeout = motore.TIMEOUT_FONTE_PROFONDA if profonda else motore.TIMEOUT_FONTE
+        stato.partenza = time.monotonic()
+        stato.future = self.executor.submit(self._scrape, stato.scraper)
+
+    @staticmethod
+    def _scrape(scraper):
+        inizio = time.monotonic()
+        bandi = scraper.scrape()
+        return bandi, time.monotonic() - inizio
+
+    def _attendi(self, secondi):
+        futures = [stato.future for stato in self.pianificatore.in_corso()]
+        if futures:
+            wait(futures, timeout=secondi, return_when=FIRST_COMPLETED)
+        else:
+            self._ferma.wait(secondi)
+
+    def _raccogli(self):
+        """Elabora gli scrape terminati e segna come scaduti quelli oltre il timeout"""
+        for stato in self.pianificatore.in_corso():
+            scraper = stato.scraper
+            durata = time.monotonic() - stato.partenza
+            if stato.future.done():
+                future, stato.future = stato.future, None
+                if stato.scaduto:
+                    stato.scaduto = False
+                    continue
+                try:
+                    bandi, durata = future.result()
+                    esito = motore.crea_esito(scraper, bandi, motore.esito_completato(scraper, bandi), durata)
+                except Exception as e:
+                    esito = motore.crea_esito(scraper, [], 'errore', durata, str(e))
+                self._elabora(stato, esito)
+            elif not stato.scaduto and durata > stato.timeout:
+                # La fonte resta "in corso" finché il thread non termina davvero
+                stato.scaduto = True
+                self._elabora(stato, motore.crea_esito(scraper, [], 'timeout', durata))
+
+    def _elabora(self, stato, esito):
+        """Salvataggio, notifiche, allegati e metriche di una fonte, poi il prossimo controllo"""
+        fonte = esito['fonte']
+        fallito = motore.esito_fallito(esito)
+        metriche = Metriche()
+        metriche.registra_scansione(esito)
+        nuovi = aggiornati = 0
+        try:
+            nuovi, aggiornati = elabora_esito(esito, self.db, self.indice, self.simili, self.rilevanza, self.coda,
+                                              self.scaricatore, metriche)
+        except Exception as e:
+            fallito = True
+            print(f"❌ Errore scraper {fonte}: {e}")
+            traceback.print_exc()
+        aggiorna_cache(self.cache, esito, fallito)
+
+        # Allegati in background: li registra il ciclo principale con raccogli()
+        self.scaricatore.avvia()
+        for nome, fetch, mediana in metriche.rallentamenti(self.db):
+            print(f"🐢 {nome}: fetch {fetch:.1f}s contro una mediana di {mediana:.1f}s negli ultimi controlli")
+        metriche.salva(self.db)
+        # I messaggi falliti finora finiscono subito nel database, non solo all'arresto
+        self.coda.salva()
+
+        self.totali['trovati'] += len(esito['bandi'])
+        self.totali['nuovi'] += nuovi
+        self.totali['aggiornati'] += aggiornati
+
+        ora = datetime.now()
+        if fallito:
+            attesa = self.pianificatore.registra_errore(stato, ora)
+            print(f"⏳ {fonte}: {esito['esito']} ({stato.errori}° di fila), "
+                  f"riprovo fra {attesa.total_seconds() / 60:.0f} minuti")
+        else:
+            self.pianificatore.registra_controllo(stato, nuovi + aggiornati, ora)
+            print(f"🗓️ {fonte}: {nuovi} nuovi, {aggiornati} aggiornati - prossimo controllo "
+                  f"{stato.prossimo:%d/%m %H:%M} (ritmo {stato.tasso:.2f} novità/ora)")
+
+    def _compiti_giornalieri(self, ora):
+        """
+        Conservazione dei bandi scaduti, riepilogo giornaliero (con i totali
+        dall'ultimo) e quindicinale, una volta al giorno
+        """
+        if ora.hour < ORA_RIEPILOGO or self._ultimo_riepilogo == ora.date():
+            return
+        self._ultimo_riepilogo = ora.date()
+        archivio.esegui(self.db, self.indice)
+        invia_riepilogo_giornaliero(self.totali['trovati'], self.totali['nuovi'], self.db.conta_bandi(), self.coda)
+        self.totali = dict.fromkeys(self.totali, 0)
+        if ora.day in [1, 16]:
+            print("📋 Invio riepilogo quindicinale...")
+            invia_riepilogo_quindicinale(self.db, self.coda)
+
+    def _recupera_notifiche(self, ora):
+        """Ogni RIPROVA_NOTIFICHE rimette in coda le notifiche fallite nel frattempo"""
+        if ora - self._ultimo_recupero < RIPROVA_NOTIFICHE:
+            return
+        self._ultimo_recupero = ora
+        self.coda.recupera()
+
+    def _chiudi(self):
+        attivi = [stato.future for stato in self.pianificatore.in_corso() if not stato.scaduto]
+        if attivi:
+            wait(attivi, timeout=motore.TIMEOUT_FONTE)
+            self._raccogli()
+        self.executor.shutdown(wait=False, cancel_futures=True)
+        if self.scaricatore.raccogli(timeout=motore.TIMEOUT_FONTE):
+            self.scaricatore.abbandona()
+        self.browser.chiudi()
+        self.coda.chiudi()
+        self.db.chiudi()
+        http_client.chiudi()
+        print("👋 Demone fermato")
+
+
+def main():
+    demone = Demone(silenzio=leggi_ore_silenzio())
+    signal.signal(signal.SIGINT, demone.ferma)
+    signal.signal(signal.SIGTERM, demone.ferma)
+    demone.esegui()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""
+Cache HTTP su disco: GET condizionali e confronto hash del contenuto
+"""
+
+import hashlib
+import threading
+from datetime import datetime
+import http_client
+
+
+class HttpCache:
+
+    def __init__(self, db):
+        self.db = db
+        self.hit = 0
+        self.miss = 0
+        self._lock = threading.Lock()
+        self._in_sospeso = {}
+
+        righe = self.db.conn.execute('SELECT url, etag, last_modified, sha256 FROM http_cache').fetchall()
+        self._voci = {
+            url: {'etag': etag, 'last_modified': last_modified, 'sha256': sha256}
+            for url, etag, last_modified, sha256 in righe
+        }
+
+    def get(self, url, **kwargs):
+        """
+        GET condizionale (If-None-Match / If-Modified-Since).
+        Ritorna (response, invariato): invariato è True se il server risponde 304
+        o se il corpo ha lo stesso hash dell'ultima versione confermata.
+        """
+        voce = self._voci.get(url)
+        headers = dict(kwargs.pop('headers', None) or {})
+        if voce:
+            if voce['etag']:
+                headers['If-None-Match'] = voce['etag']
+            if voce['last_modified']:
+                headers['If-Modified-Since'] = voce['last_modified']
+
+        response = http_client.get(url, headers=headers, **kwargs)
+
+        if response.status_code == 304:
+            self._conta(True)
+            return response, True
+        if response.status_code != 200:
+            return response, False
+
+        sha256 = hashlib.sha256(response.content).hexdigest()
+        if voce and voce['sha256'] == sha256:
+            self._conta(True)
+            return response, True
+
+        self._conta(False)
+        with self._lock:
+            self._in_sospeso[url] = {
+                'etag': response.headers.get('ETag'),
+                'last_modified': response.headers.get('Last-Modified'),
+                'sha256': sha256,
+            }
+        return response, False
+
+    def _conta(self, hit):
+        with self._lock:
+            if hit:
+                self.hit += 1
+            else:
+                self.miss += 1
+
+    def conferma(self, url):
+        """
+        Rende definitiva la nuova versione di una pagina.
+        Va chiamata solo dopo aver salvato i bandi della fonte, così un errore
+        a valle non fa saltare la pagina al prossimo giro.
+        """
+        with self._lock:
+            voce = self._in_sospeso.pop(url, None)
+        if voce is None:
+            return
+
+        with self.db.conn:
+            self.db.conn.execute('''
+                INSERT OR REPLACE INTO http_cache (url, etag, last_modified, sha256, data_controllo)
+                VALUES (?, ?, ?, ?, ?)
+            ''', (url, voce['etag'], voce['last_modified'], voce['sha256'], datetime.now().isoformat()))
+        self._voci[url] = voce
+
+    def dimentica(self, url):
+        """Toglie una pagina dalla cache: al prossimo giro sarà scaricata e analizzata comunque"""
+        with self._lock:
+            self._in_sospeso.pop(url, None)
+        with self.db.conn:
+            self.db.conn.execute('DELETE FROM http_cache WHERE url = ?', (url,))
+        self._voci.pop(url, None)
+
+    def statistiche(self):
+        return {'hit': self.hit, 'miss': self.miss}
@@ -0,0 +1,94 @@
+"""
+Client HTTP condiviso: connessioni persistenti, retry e header comuni
+"""
+
+import threading
+import requests
+import urllib3
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+# Le fonti con "verify": false in fonti.json producono un warning a ogni richiesta
+urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
+
+HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36',
+    'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8',
+    'Accept-Language': 'it-IT,it;q=0.9',
+}
+
+TIMEOUT = 15
+# Certificati sempre verificati (Telegram compreso: l'URL contiene il token).
+# I portali regionali con catene incomplete la disattivano per fonte, con
+# "verify": false in fonti.json
+VERIFY = True
+
+# Retry su errori di connessione e 5xx, con backoff esponenziale
+RETRY_TOTALI = 2
+RETRY_BACKOFF = 0.5
+RETRY_STATUS = (500, 502, 503, 504)
+
+# Host distinti tenuti in cache e connessioni keep-alive per host
+POOL_HOST = 10
+POOL_PER_HOST = 8
+
+_sessione = None
+_lock = threading.Lock()
+
+
+def crea_sessione(retry=RETRY_TOTALI, backoff=RETRY_BACKOFF, verify=VERIFY, headers=None):
+    """Crea una Session con pool di connessioni per host e retry con backoff"""
+    sessione = requests.Session()
+    sessione.headers.update(headers or HEADERS)
+    sessione.verify = verify
+
+    politica = Retry(
+        total=retry,
+        backoff_factor=backoff,
+        status_forcelist=RETRY_STATUS,
+        respect_retry_after_header=True,
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(pool_connections=POOL_HOST, pool_maxsize=POOL_PER_HOST, max_retries=politica)
+    sessione.mount('https://', adapter)
+    sessione.mount('http://', adapter)
+    return sessione
+
+
+def get_sessione():
+    """Ritorna la Session condivisa, creandola al primo utilizzo"""
+    global _sessione
+    if _sessione is None:
+        with _lock:
+            if _sessione is None:
+                _sessione = crea_sessione()
+    return _sessione
+
+
+def configura(**kwargs):
+    """Ricrea la Session condivisa con parametri diversi (retry, backoff, verify, headers)"""
+    global _sessione
+    with _lock:
+        if _sessione is not None:
+            _sessione.close()
+        _sessione = crea_sessione(**kwargs)
+    return _sessione
+
+
+def get(url, **kwargs):
+    kwargs.setdefault('timeout', TIMEOUT)
+    return get_sessione().get(url, **kwargs)
+
+
+def post(url, **kwargs):
+    kwargs.setdefault('timeout', TIMEOUT)
+    return get_sessione().post(url, **kwargs)
+
+
+def chiudi():
+    """Chiude tutte le connessioni del pool"""
+    global _sessione
+    with _lock:
+        if _sessione is not None:
+            _sessione.close()
+            _sessione = None
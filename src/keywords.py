@@ -2,6 +2,12 @@
 Sistema di keywords e scoring per filtrare i bandi
 """
 
+import re
+import unicodedata
+from collections import namedtuple
+from datetime import date
+from scadenze import normalizza_data
+
 # Keywords positive con peso
 KEYWORDS_POSITIVE = {
     'formazione': 20,
@@ -49,84 +55,211 @@ KEYWORDS_NEGATIVE = [
 ]
 
 
-def filtra_keywords(titolo, testo=''):
+_TOKEN = re.compile(r'\w+')
+
+
+def normalizza(testo):
+    """Minuscolo, senza accenti e con spazi compressi"""
+    if not testo.isascii():
+        testo = unicodedata.normalize('NFKD', testo)
+        testo = ''.join(c for c in testo if not unicodedata.combining(c))
+    return ' '.join(testo.lower().split())
+
+
+def tokenizza(testo):
+    """Divide un testo già normalizzato in parole"""
+    return _TOKEN.findall(testo)
+
+
+class MatcherKeywords:
     """
-    Filtra i bandi con keywords negative
-    Ritorna True se il bando è OK, False se deve essere scartato
+    Automa di Aho-Corasick sulle parole.
+    Trova in una sola passata sul testo tutte le keywords positive e negative
+    (anche sovrapposte), rispettando i confini di parola. Il costo per bando
+    dipende dalla lunghezza del testo, non dal numero di keywords.
     """
-    contenuto = (titolo + ' ' + testo).lower()
-    
-    for keyword in KEYWORDS_NEGATIVE:
-        if keyword.lower() in contenuto:
-            return False
-    
-    return True
+
+    def __init__(self, positive, negative):
+        self._goto = [{}]
+        self._fail = [0]
+        self._output = [[]]
+        self._parole = set()  # parole che compaiono in almeno una keyword
+        self.keywords = []  # (keyword, peso, negativa)
+
+        for keyword, peso in positive.items():
+            self._aggiungi(keyword, peso, False)
+        for keyword in negative:
+            self._aggiungi(keyword, 0, True)
+        self._costruisci_fail()
+
+    def _aggiungi(self, keyword, peso, negativa):
+        parole = tokenizza(normalizza(keyword))
+        if not parole:
+            return
+        self._parole.update(parole)
+        nodo = 0
+        for parola in parole:
+            prossimo = self._goto[nodo].get(parola)
+            if prossimo is None:
+                prossimo = len(self._goto)
+                self._goto.append({})
+                self._fail.append(0)
+                self._output.append([])
+                self._goto[nodo][parola] = prossimo
+            nodo = prossimo
+        self._output[nodo].append(len(self.keywords))
+        self.keywords.append((keyword, peso, negativa))
+
+    def _costruisci_fail(self):
+        coda = list(self._goto[0].values())
+        for nodo in coda:
+            for parola, figlio in self._goto[nodo].items():
+                coda.append(figlio)
+                fail = self._fail[nodo]
+                while fail and parola not in self._goto[fail]:
+                    fail = self._fail[fail]
+                fail = self._goto[fail].get(parola, 0)
+                self._fail[figlio] = fail
+                self._output[figlio] = self._output[figlio] + self._output[self._fail[figlio]]
+
+    def cerca(self, parole):
+        """Ritorna gli indici (ordinati) delle keywords presenti nella sequenza di parole"""
+        goto, fail, output, note = self._goto, self._fail, self._output, self._parole
+        trovate = set()
+        nodo = 0
+        for parola in parole:
+            if parola not in note:
+                # Nessuna keyword contiene questa parola: si riparte dalla radice
+                nodo = 0
+                continue
+            while nodo and parola not in goto[nodo]:
+                nodo = fail[nodo]
+            nodo = goto[nodo].get(parola, 0)
+            if output[nodo]:
+                trovate.update(output[nodo])
+        return sorted(trovate)
+
+    def analizza(self, testo):
+        """
+        Ritorna (negative, positive, peso) in una sola passata:
+        keywords negative trovate, keywords positive trovate e somma dei loro pesi
+        """
+        return self.analizza_parole(tokenizza(normalizza(testo)))
+
+    def analizza_parole(self, parole):
+        """Come analizza(), su un testo già normalizzato e diviso in parole"""
+        negative = []
+        positive = []
+        peso_totale = 0
+        for indice in self.cerca(parole):
+            keyword, peso, negativa = self.keywords[indice]
+            if negativa:
+                negative.append(keyword)
+            else:
+                positive.append(keyword)
+                peso_totale += peso
+        return negative, positive, peso_totale
+
+
+_matcher = None
+
+
+def get_matcher():
+    """Ritorna il matcher costruito (una sola volta) dalle tabelle di keywords"""
+    global _matcher
+    if _matcher is None:
+        _matcher = MatcherKeywords(KEYWORDS_POSITIVE, KEYWORDS_NEGATIVE)
+    return _matcher
+
+
+def ricostruisci_matcher():
+    """Da chiamare dopo aver modificato KEYWORDS_POSITIVE o KEYWORDS_NEGATIVE"""
+    global _matcher
+    _matcher = None
+    return get_matcher()
+
+
+Analisi = namedtuple('Analisi', ['escluso', 'negative', 'keywords', 'score', 'dettaglio'])
+
+ENTI_PRIORITARI = ['filse', 'alfa', 'regione liguria']
+
+# Giorni alla scadenza in cui c'è il tempo di preparare la domanda
+GIORNI_MINIMI = 7
+GIORNI_MASSIMI = 90
 
 
-def estrai_keywords_match(titolo, testo=''):
+def punti_scadenza(data_scadenza, oggi=None):
     """
-    Estrae le keywords positive trovate nel bando
-    Ritorna una lista di keywords
+    Punti per il tempo rimasto (max 15): pieni fra GIORNI_MINIMI e
+    GIORNI_MASSIMI giorni, meno se la scadenza è troppo vicina, lontana o
+    sconosciuta, zero se è già passata
     """
-    contenuto = (titolo + ' ' + testo).lower()
-    keywords_trovate = []
-    
-    for keyword in KEYWORDS_POSITIVE.keys():
-        if keyword.lower() in contenuto:
-            keywords_trovate.append(keyword)
-    
-    return keywords_trovate
+    iso = normalizza_data(data_scadenza)
+    try:
+        scadenza = date.fromisoformat(iso) if iso else None
+    except ValueError:
+        # Giorno inesistente nel mese (es. 31/02)
+        scadenza = None
+    if scadenza is None:
+        return 5
+    giorni = (scadenza - (oggi or date.today())).days
+    if giorni < 0:
+        return 0
+    if giorni < GIORNI_MINIMI:
+        return 5
+    if giorni <= GIORNI_MASSIMI:
+        return 15
+    return 10
 
 
-def calcola_score(bando):
+def analizza_bando(bando):
     """
-    Calcola uno score 0-100 in base a:
-    1. Keywords match (max 50 punti)
-    2. Ente prioritario (max 20 punti)
-    3. Scadenza ragionevole (max 15 punti)
-    4. Budget significativo (max 15 punti)
+    Analizza un bando in una sola passata sul testo normalizzato.
+    Ritorna un'Analisi con:
+    - escluso: True se contiene keywords negative
+    - negative / keywords: keywords negative e positive trovate
+    - score: punteggio 0-100
+    - dettaglio: punti per componente (keywords, ente, scadenza, budget)
     """
-    score = 0
-    
-    titolo = bando.get('titolo', '').lower()
-    testo = bando.get('testo', '').lower()
-    ente = bando.get('ente', '').lower()
-    contenuto = titolo + ' ' + testo
-    
+    contenuto = normalizza((bando.get('titolo') or '') + ' ' + (bando.get('testo') or ''))
+    ente = normalizza(bando.get('ente') or '')
+    negative, positive, peso = get_matcher().analizza_parole(tokenizza(contenuto))
+
+    dettaglio = {}
+
     # 1. Keywords match (max 50 punti)
-    for keyword, peso in KEYWORDS_POSITIVE.items():
-        if keyword.lower() in contenuto:
-            score += peso
-    
-    # Cap a 50 punti
-    if score > 50:
-        score = 50
-    
+    dettaglio['keywords'] = min(peso, 50)
+
     # 2. Ente prioritario (+20 punti)
-    enti_prioritari = ['filse', 'alfa', 'regione liguria']
-    for ente_prioritario in enti_prioritari:
-        if ente_prioritario in ente:
-            score += 20
-            break
-    
+    dettaglio['ente'] = 20 if any(e in ente for e in ENTI_PRIORITARI) else 0
+
     # 3. Scadenza ragionevole (+15 punti)
-    # TODO: implementare parsing data scadenza
-    # Per ora diamo punti di default
-    score += 10
-    
+    dettaglio['scadenza'] = punti_scadenza(bando.get('data_scadenza'))
+
     # 4. Budget significativo (+15 punti)
     # Cerca importi nel testo
+    dettaglio['budget'] = 0
     if '€' in contenuto or 'euro' in contenuto:
         # Cerca pattern tipo "1.000.000" o "1000000"
         if '1.000.000' in contenuto or '1000000' in contenuto or 'milione' in contenuto:
-            score += 15
+            dettaglio['budget'] = 15
         elif '500.000' in contenuto or '500000' in contenuto:
-            score += 10
+            dettaglio['budget'] = 10
         else:
-            score += 5
-    
+            dettaglio['budget'] = 5
+
     # Assicura che lo score sia tra 0 e 100
-    if score > 100:
-        score = 100
-    
-    return score
+    score = min(sum(dettaglio.values()), 100)
+
+    return Analisi(bool(negative), negative, positive, score, dettaglio)
+
+
+def calcola_score(bando):
+    """
+    Calcola uno score 0-100 in base a:
+    1. Keywords match (max 50 punti)
+    2. Ente prioritario (max 20 punti)
+    3. Scadenza ragionevole (max 15 punti)
+    4. Budget significativo (max 15 punti)
+    """
+    return analizza_bando(bando).score
@@ -0,0 +1,128 @@
+"""
+Metriche di un run: tempi per fase e per fonte, byte scaricati, status HTTP
+e conteggi dei bandi. Vengono scritte nella tabella controlli con un'unica
+transazione a fine run e, se richiesto, esportate in JSON.
+"""
+
+import json
+import os
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+FASI = ('fetch', 'parsing', 'filtro', 'database', 'notifiche')
+
+# SENTINEL_METRICHE: percorso del file JSON con le metriche dell'ultimo run
+FILE_METRICHE = os.environ.get('SENTINEL_METRICHE')
+
+# Una fonte è "in rallentamento" se il fetch supera di SOGLIA volte la
+# mediana degli ultimi RUN_STORICO controlli
+SOGLIA_RALLENTAMENTO = 2.0
+RUN_STORICO = 10
+
+
+class Metriche:
+
+    def __init__(self):
+        self.inizio = datetime.now()
+        self.fonti = {}
+
+    def fonte(self, nome):
+        """Contatori della fonte, creati al primo uso"""
+        if nome not in self.fonti:
+            self.fonti[nome] = {
+                'esito': None,
+                'durata': 0.0,
+                'tempi': dict.fromkeys(FASI, 0.0),
+                'status': None,
+                'byte': 0,
+                'trovati': 0,
+                'nuovi': 0,
+                'aggiornati': 0,
+                'errore': None,
+            }
+        return self.fonti[nome]
+
+    @contextmanager
+    def misura(self, nome, fase):
+        """Somma al tempo della fase il tempo passato nel blocco with"""
+        inizio = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.fonte(nome)['tempi'][fase] += time.perf_counter() - inizio
+
+    def registra_scansione(self, esito):
+        """Riporta i dati di un esito di motore.scansiona_fonti"""
+        voce = self.fonte(esito['fonte'])
+        voce['esito'] = esito['esito']
+        voce['durata'] = esito['durata']
+        voce['trovati'] = len(esito['bandi'])
+        voce['errore'] = esito['errore']
+        statistiche = getattr(esito['scraper'], 'statistiche', None)
+        if statistiche and esito['esito'] != 'timeout':
+            voce['tempi']['fetch'] = statistiche['fetch']
+            voce['tempi']['parsing'] = statistiche['parsing']
+            voce['status'] = statistiche['status']
+            voce['byte'] = statistiche['byte']
+
+    def conta(self, nome, **valori):
+        voce = self.fonte(nome)
+        for chiave, valore in valori.items():
+            voce[chiave] += valore
+
+    def salva(self, db):
+        """Una riga di controlli per fonte, tutte in un'unica transazione"""
+        data = self.inizio.isoformat()
+        righe = [
+            (nome, data, v['trovati'], v['nuovi'], v['aggiornati'], v['esito'], v['errore'],
+             v['durata'], v['tempi']['fetch'], v['tempi']['parsing'], v['tempi']['filtro'],
+             v['tempi']['database'], v['tempi']['notifiche'], v['byte'], v['status'])
+            for nome, v in self.fonti.items()
+        ]
+        with db.conn:
+            db.conn.executemany('''
+                INSERT INTO controlli (fonte, data_controllo, bandi_trovati, bandi_nuovi, bandi_aggiornati,
+                                       esito, note, durata, tempo_fetch, tempo_parsing, tempo_filtro,
+                                       tempo_database, tempo_notifiche, byte, status_http)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ''', righe)
+
+    def rallentamenti(self, db, soglia=SOGLIA_RALLENTAMENTO, run=RUN_STORICO):
+        """
+        Fonti il cui fetch di oggi supera di `soglia` volte la mediana dei
+        `run` controlli precedenti. Va chiamata prima di salva().
+        Ritorna [(fonte, fetch di oggi, mediana)].
+        """
+        lente = []
+        for nome, v in self.fonti.items():
+            if v['esito'] not in ('ok', 'vuoto', 'invariato'):
+                continue
+            storico = sorted(riga[0] for riga in db.conn.execute('''
+                SELECT tempo_fetch FROM controlli
+                WHERE fonte = ? AND tempo_fetch IS NOT NULL AND esito IN ('ok', 'vuoto', 'invariato')
+                ORDER BY data_controllo DESC LIMIT ?
+            ''', (nome, run)))
+            if len(storico) < 3:
+                continue
+            mediana = storico[len(storico) // 2]
+            if mediana > 0 and v['tempi']['fetch'] > soglia * mediana:
+                lente.append((nome, v['tempi']['fetch'], mediana))
+        return lente
+
+    def come_dizionario(self):
+        return {
+            'inizio': self.inizio.isoformat(),
+            'durata': (datetime.now() - self.inizio).total_seconds(),
+            'fonti': self.fonti,
+        }
+
+    def esporta_json(self, percorso=FILE_METRICHE):
+        if not percorso:
+            return
+        cartella = os.path.dirname(percorso)
+        if cartella:
+            os.makedirs(cartella, exist_ok=True)
+        with open(percorso, 'w', encoding='utf-8') as f:
+            json.dump(self.come_dizionario(), f, ensure_ascii=False, indent=2)
+        print(f"📈 Metriche esportate in {percorso}")
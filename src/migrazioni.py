@@ -0,0 +1,354 @@
+"""
+Migrazioni dello schema SQLite, versionate con PRAGMA user_version
+
+Ogni migrazione porta lo schema alla sua versione ed è idempotente: se un
+run si interrompe a metà (es. durante un riempimento a blocchi) viene
+semplicemente rieseguita al run successivo.
+"""
+
+from collections import namedtuple
+
+Migrazione = namedtuple('Migrazione', ['versione', 'descrizione', 'funzione'])
+
+MIGRAZIONI = []
+
+# Righe aggiornate per transazione nei riempimenti di colonne nuove
+BLOCCO = 1000
+
+
+def migrazione(versione, descrizione):
+    """Decoratore che registra una migrazione"""
+    def decoratore(funzione):
+        MIGRAZIONI.append(Migrazione(versione, descrizione, funzione))
+        MIGRAZIONI.sort(key=lambda m: m.versione)
+        return funzione
+    return decoratore
+
+
+def colonne(conn, tabella):
+    return [riga[1] for riga in conn.execute(f'PRAGMA table_info({tabella})')]
+
+
+def aggiungi_colonna(conn, tabella, colonna, tipo):
+    """ALTER TABLE ADD COLUMN solo se la colonna non esiste già"""
+    if colonna not in colonne(conn, tabella):
+        conn.execute(f'ALTER TABLE {tabella} ADD COLUMN {colonna} {tipo}')
+
+
+def riempi_a_blocchi(conn, tabella, assegnazione, condizione='1', blocco=BLOCCO, conflitto=''):
+    """
+    Esegue UPDATE tabella SET assegnazione WHERE condizione a blocchi di id,
+    con un commit per blocco: la tabella non viene mai caricata in memoria e
+    il lock di scrittura dura poco. La condizione deve escludere le righe già
+    riempite, così un riempimento interrotto riprende da dove era rimasto.
+    conflitto='OR IGNORE' salta le righe che violerebbero un vincolo UNIQUE.
+    """
+    massimo = conn.execute(f'SELECT MAX(id) FROM {tabella}').fetchone()[0] or 0
+    inizio = 0
+    while inizio < massimo:
+        with conn:
+            conn.execute(
+                f'UPDATE {conflitto} {tabella} SET {assegnazione} WHERE id > ? AND id <= ? AND ({condizione})',
+                (inizio, inizio + blocco)
+            )
+        inizio += blocco
+
+
+def versione_corrente(conn):
+    return conn.execute('PRAGMA user_version').fetchone()[0]
+
+
+def applica(conn):
+    """
+    Applica le migrazioni con versione maggiore di user_version.
+    Se lo schema è già aggiornato costa una sola lettura di pragma.
+    Ritorna la lista delle migrazioni applicate.
+    """
+    versione = versione_corrente(conn)
+    pendenti = [m for m in MIGRAZIONI if m.versione > versione]
+    for m in pendenti:
+        m.funzione(conn)
+        with conn:
+            conn.execute(f'PRAGMA user_version = {int(m.versione)}')
+        print(f"🔧 Migrazione {m.versione}: {m.descrizione}")
+    return pendenti
+
+
+@migrazione(1, 'tabelle iniziali')
+def _tabelle_iniziali(conn):
+    with conn:
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS bandi (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                titolo TEXT NOT NULL,
+                url TEXT UNIQUE NOT NULL,
+                ente TEXT,
+                tipo TEXT,
+                data_scadenza TEXT,
+                keywords_match TEXT,
+                score INTEGER DEFAULT 0,
+                stato TEXT DEFAULT 'attivo',
+                data_trovato TEXT,
+                data_aggiornamento TEXT
+            )
+        ''')
+
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS aggiornamenti (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                bando_id INTEGER,
+                tipo_aggiornamento TEXT,
+                descrizione TEXT,
+                data_aggiornamento TEXT,
+                FOREIGN KEY (bando_id) REFERENCES bandi(id)
+            )
+        ''')
+
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS controlli (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                fonte TEXT,
+                data_controllo TEXT,
+                bandi_trovati INTEGER,
+                bandi_nuovi INTEGER,
+                esito TEXT,
+                note TEXT
+            )
+        ''')
+
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS pdf_archivio (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                bando_id INTEGER,
+                url_pdf TEXT,
+                nome_file TEXT,
+                data_download TEXT,
+                versione INTEGER DEFAULT 1,
+                FOREIGN KEY (bando_id) REFERENCES bandi(id)
+            )
+        ''')
+
+
+@migrazione(2, 'scadenza normalizzata (scadenza_iso) e indici su stato, score, ente')
+def _scadenza_iso(conn):
+    with conn:
+        aggiungi_colonna(conn, 'bandi', 'scadenza_iso', 'TEXT')
+    riempi_a_blocchi(conn, 'bandi', 'scadenza_iso = data_iso(data_scadenza)',
+                     'scadenza_iso IS NULL AND data_scadenza IS NOT NULL')
+    with conn:
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_bandi_stato_scadenza ON bandi(stato, scadenza_iso)')
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_bandi_score ON bandi(score)')
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_bandi_ente ON bandi(ente, scadenza_iso)')
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_bandi_data_trovato ON bandi(data_trovato)')
+
+
+@migrazione(3, 'cache HTTP e notifiche in sospeso')
+def _cache_e_notifiche(conn):
+    with conn:
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS http_cache (
+                url TEXT PRIMARY KEY,
+                etag TEXT,
+                last_modified TEXT,
+                sha256 TEXT,
+                data_controllo TEXT
+            )
+        ''')
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS notifiche_in_sospeso (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                testo TEXT NOT NULL,
+                tentativi INTEGER DEFAULT 0,
+                data_creazione TEXT,
+                ultimo_errore TEXT
+            )
+        ''')
+
+
+@migrazione(4, 'impronta del contenuto per rilevare i bandi aggiornati')
+def _impronta(conn):
+    # Le righe esistenti restano senza impronta: la ricevono al primo
+    # passaggio dello scraper, senza notifica
+    with conn:
+        aggiungi_colonna(conn, 'bandi', 'impronta', 'BLOB')
+
+
+@migrazione(5, 'chiave binaria (16 byte) come identità dei bandi')
+def _chiave(conn):
+    from dedup import chiave_sql
+    conn.create_function('chiave_bando', 2, chiave_sql, deterministic=True)
+    with conn:
+        aggiungi_colonna(conn, 'bandi', 'chiave', 'BLOB')
+    riempi_a_blocchi(conn, 'bandi', 'chiave = chiave_bando(url, titolo)', 'chiave IS NULL',
+                     conflitto='OR IGNORE')
+    with conn:
+        # Righe che con la vecchia identità (slug dei primi 50 caratteri del
+        # titolo) risultavano diverse ma sono lo stesso bando: resta la prima,
+        # le altre rimangono nello storico senza chiave
+        conn.execute('''
+            UPDATE bandi SET chiave = NULL
+            WHERE chiave IS NOT NULL
+              AND id NOT IN (SELECT MIN(id) FROM bandi WHERE chiave IS NOT NULL GROUP BY chiave)
+        ''')
+        conn.execute('CREATE UNIQUE INDEX IF NOT EXISTS idx_bandi_chiave ON bandi(chiave)')
+
+
+@migrazione(6, 'hash e dimensione degli allegati PDF')
+def _allegati(conn):
+    with conn:
+        aggiungi_colonna(conn, 'pdf_archivio', 'sha256', 'TEXT')
+        aggiungi_colonna(conn, 'pdf_archivio', 'byte', 'INTEGER')
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_pdf_bando ON pdf_archivio(bando_id, url_pdf, versione)')
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_pdf_sha256 ON pdf_archivio(sha256)')
+
+
+@migrazione(7, 'testo dei bandi e degli allegati con indice full-text (FTS5)')
+def _ricerca(conn):
+    with conn:
+        aggiungi_colonna(conn, 'bandi', 'testo', 'TEXT')
+        aggiungi_colonna(conn, 'bandi', 'testo_allegati', 'TEXT')
+        # Tabella a contenuto esterno: il testo sta solo in bandi, l'indice
+        # viene tenuto allineato dai trigger
+        conn.execute('''
+            CREATE VIRTUAL TABLE IF NOT EXISTS bandi_fts USING fts5(
+                titolo, testo, testo_allegati,
+                content='bandi', content_rowid='id',
+                tokenize='unicode61 remove_diacritics 2'
+            )
+        ''')
+        conn.execute('''
+            CREATE TRIGGER IF NOT EXISTS bandi_fts_inserimento AFTER INSERT ON bandi BEGIN
+                INSERT INTO bandi_fts (rowid, titolo, testo, testo_allegati)
+                VALUES (new.id, new.titolo, new.testo, new.testo_allegati);
+            END
+        ''')
+        conn.execute('''
+            CREATE TRIGGER IF NOT EXISTS bandi_fts_cancellazione AFTER DELETE ON bandi BEGIN
+                INSERT INTO bandi_fts (bandi_fts, rowid, titolo, testo, testo_allegati)
+                VALUES ('delete', old.id, old.titolo, old.testo, old.testo_allegati);
+            END
+        ''')
+        conn.execute('''
+            CREATE TRIGGER IF NOT EXISTS bandi_fts_modifica AFTER UPDATE OF titolo, testo, testo_allegati ON bandi BEGIN
+                INSERT INTO bandi_fts (bandi_fts, rowid, titolo, testo, testo_allegati)
+                VALUES ('delete', old.id, old.titolo, old.testo, old.testo_allegati);
+                INSERT INTO bandi_fts (rowid, titolo, testo, testo_allegati)
+                VALUES (new.id, new.titolo, new.testo, new.testo_allegati);
+            END
+        ''')
+        conn.execute("INSERT INTO bandi_fts (bandi_fts) VALUES ('rebuild')")
+
+
+@migrazione(8, 'tempi per fase, byte e status HTTP nei controlli')
+def _metriche(conn):
+    with conn:
+        for colonna, tipo in [('bandi_aggiornati', 'INTEGER'), ('durata', 'REAL'),
+                              ('tempo_fetch', 'REAL'), ('tempo_parsing', 'REAL'),
+                              ('tempo_filtro', 'REAL'), ('tempo_database', 'REAL'),
+                              ('tempo_notifiche', 'REAL'), ('byte', 'INTEGER'),
+                              ('status_http', 'INTEGER')]:
+            aggiungi_colonna(conn, 'controlli', colonna, tipo)
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_controlli_fonte ON controlli(fonte, data_controllo)')
+
+
+@migrazione(9, 'firme MinHash e indice LSH per i quasi-duplicati fra fonti')
+def _simili(conn):
+    import simili
+    with conn:
+        aggiungi_colonna(conn, 'bandi', 'firma', 'BLOB')
+        aggiungi_colonna(conn, 'bandi', 'canonico_id', 'INTEGER REFERENCES bandi(id)')
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS bandi_lsh (
+                secchio INTEGER NOT NULL,
+                bando_id INTEGER NOT NULL,
+                PRIMARY KEY (secchio, bando_id)
+            ) WITHOUT ROWID
+        ''')
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_bandi_lsh_bando ON bandi_lsh(bando_id)')
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_bandi_canonico ON bandi(canonico_id)')
+    # Firme dell'archivio esistente, a blocchi (senza collegare i duplicati storici)
+    ultimo = 0
+    while True:
+        righe = conn.execute(
+            'SELECT id, titolo, testo FROM bandi WHERE id > ? AND firma IS NULL ORDER BY id LIMIT ?',
+            (ultimo, BLOCCO)
+        ).fetchall()
+        if not righe:
+            break
+        with conn:
+            for id_bando, titolo, testo in righe:
+                firma = simili.firma({'titolo': titolo, 'testo': testo})
+                if firma is None:
+                    continue
+                conn.execute('UPDATE bandi SET firma = ? WHERE id = ?', (firma, id_bando))
+                conn.executemany('INSERT OR IGNORE INTO bandi_lsh (secchio, bando_id) VALUES (?, ?)',
+                                 [(secchio, id_bando) for secchio in simili.secchi(firma)])
+        ultimo = righe[-1][0]
+
+
+@migrazione(10, 'rilevanza TF-IDF rispetto al profilo di keywords')
+def _rilevanza(conn):
+    with conn:
+        aggiungi_colonna(conn, 'bandi', 'rilevanza', 'REAL')
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS rilevanza_termini (
+                termine TEXT PRIMARY KEY,
+                peso REAL NOT NULL,
+                documenti INTEGER NOT NULL
+            )
+        ''')
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS rilevanza_corpus (
+                id INTEGER PRIMARY KEY CHECK (id = 1),
+                documenti INTEGER NOT NULL,
+                parole INTEGER NOT NULL
+            )
+        ''')
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_bandi_rilevanza ON bandi(rilevanza)')
+    # La passata su tutto l'archivio esistente la fa la migrazione 13, dopo la colonna scala
+
+
+@migrazione(11, 'archivio compresso dei bandi scaduti e auto_vacuum incrementale')
+def _archivio(conn):
+    with conn:
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS bandi_archivio (
+                id INTEGER PRIMARY KEY,
+                chiave BLOB,
+                impronta BLOB,
+                url TEXT,
+                titolo TEXT,
+                ente TEXT,
+                scadenza_iso TEXT,
+                data_archiviazione TEXT,
+                dati BLOB NOT NULL
+            )
+        ''')
+    # auto_vacuum cambia solo con un VACUUM completo, una volta sola: dopo
+    # basta PRAGMA incremental_vacuum (vedi archivio.py)
+    if conn.execute('PRAGMA auto_vacuum').fetchone()[0] != 2:
+        conn.execute('PRAGMA auto_vacuum = INCREMENTAL')
+        conn.execute('VACUUM')
+
+
+@migrazione(12, 'allegati da riprendere nei run successivi')
+def _allegati_in_sospeso(conn):
+    with conn:
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS allegati_in_sospeso (
+                bando_id INTEGER PRIMARY KEY,
+                opzioni TEXT,
+                tentativi INTEGER NOT NULL DEFAULT 0,
+                data_ultimo_tentativo TEXT,
+                ultimo_errore TEXT
+            )
+        ''')
+
+
+@migrazione(13, 'scala della rilevanza calibrata sul corpus')
+def _scala_rilevanza(conn):
+    import rilevanza
+    with conn:
+        aggiungi_colonna(conn, 'rilevanza_corpus', 'scala', 'REAL')
+    # Le rilevanze salvate con la scala fissa saturavano: una passata le ricalcola tutte
+    rilevanza.MotoreRilevanza(conn).ricalcola()
@@ -0,0 +1,123 @@
+"""
+Motore di scansione concorrente delle fonti
+"""
+
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+# Tempo massimo per una singola fonte (secondi, dall'avvio della sua scansione)
+TIMEOUT_FONTE = 45
+# Tempo massimo per l'intera fase di scansione
+BUDGET_TOTALE = 120
+MAX_WORKERS = 8
+# Limiti per la scansione profonda (tutte le pagine degli elenchi)
+TIMEOUT_FONTE_PROFONDA = 300
+BUDGET_TOTALE_PROFONDA = 900
+
+
+def crea_esito(scraper, bandi, esito, durata, errore=None):
+    """Esito della scansione di una fonte, nel formato di scansiona_fonti"""
+    return {
+        'scraper': scraper,
+        'fonte': scraper.nome,
+        'bandi': bandi,
+        'esito': esito,
+        'durata': durata,
+        'errore': errore or getattr(scraper, 'statistiche', {}).get('errore'),
+    }
+
+
+def esito_completato(scraper, bandi):
+    """Esito di uno scrape terminato: invariato, ok o vuoto"""
+    if getattr(scraper, 'invariato', False):
+        return 'invariato'
+    return 'ok' if bandi else 'vuoto'
+
+
+def esito_fallito(esito):
+    """
+    Vero se la fonte non è stata letta davvero: errore, timeout, eccezione
+    intercettata dallo scraper o status HTTP diverso da 200/304
+    """
+    status = getattr(esito['scraper'], 'statistiche', {}).get('status')
+    return (esito['esito'] in ('errore', 'timeout') or bool(esito['errore'])
+            or (status is not None and status not in (200, 304)))
+
+
+def _esegui(scraper, indice, partenze):
+    partenze[indice] = time.monotonic()
+    bandi = scraper.scrape()
+    return bandi, time.monotonic() - partenze[indice]
+
+
+def scansiona_fonti(scrapers, timeout_fonte=TIMEOUT_FONTE, budget_totale=BUDGET_TOTALE,
+                    max_workers=MAX_WORKERS):
+    """
+    Esegue in parallelo lo scrape di tutte le fonti.
+    Ritorna una lista di esiti (uno per scraper, nello stesso ordine) con
+    chiavi: scraper, fonte, bandi, esito (ok/vuoto/invariato/errore/timeout), durata, errore.
+    Le fonti che superano il proprio timeout o il budget totale vengono
+    abbandonate: i loro risultati tardivi sono ignorati.
+    """
+    esiti = [None] * len(scrapers)
+    if not scrapers:
+        return esiti
+
+    inizio = time.monotonic()
+    fine_budget = inizio + budget_totale
+    partenze = {}
+    executor = ThreadPoolExecutor(max_workers=min(max_workers, len(scrapers)),
+                                  thread_name_prefix='scraper')
+    futures = {
+        executor.submit(_esegui, scraper, i, partenze): i
+        for i, scraper in enumerate(scrapers)
+    }
+
+    def registra(i, bandi, esito, durata, errore=None):
+        esiti[i] = crea_esito(scrapers[i], bandi, esito, durata, errore)
+
+    in_attesa = set(futures)
+    try:
+        while in_attesa:
+            scadenze = [partenze[futures[f]] + timeout_fonte for f in in_attesa if futures[f] in partenze]
+            prossima = min(scadenze + [fine_budget])
+            fatti, in_attesa = wait(in_attesa, timeout=max(0, prossima - time.monotonic()),
+                                    return_when=FIRST_COMPLETED)
+
+            for future in fatti:
+                i = futures[future]
+                try:
+                    bandi, durata = future.result()
+                    registra(i, bandi, esito_completato(scrapers[i], bandi), durata)
+                except Exception as e:
+                    registra(i, [], 'errore', time.monotonic() - partenze.get(i, inizio), str(e))
+
+            ora = time.monotonic()
+            scaduti = {
+                f for f in in_attesa
+                if ora >= fine_budget or (futures[f] in partenze and ora >= partenze[futures[f]] + timeout_fonte)
+            }
+            for future in scaduti:
+                future.cancel()
+                i = futures[future]
+                registra(i, [], 'timeout', ora - partenze.get(i, ora))
+            in_attesa -= scaduti
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    return esiti
+
+
+def stampa_report(esiti):
+    """Stampa tempi ed esito per fonte, dalla più lenta alla più veloce"""
+    icone = {'ok': '✅', 'vuoto': '⚪', 'invariato': '♻️', 'errore': '❌', 'timeout': '⏱️'}
+    print("\n⏱️ Tempi di scansione per fonte:")
+    for esito in sorted(esiti, key=lambda e: e['durata'], reverse=True):
+        riga = f"  {icone.get(esito['esito'], '•')} {esito['fonte']}: {esito['durata']:.1f}s - {esito['esito']} ({len(esito['bandi'])} bandi)"
+        statistiche = getattr(esito['scraper'], 'statistiche', None)
+        if statistiche and esito['esito'] != 'timeout':
+            pagine = f", {statistiche['pagine']} pagine" if statistiche.get('pagine', 0) > 1 else ''
+            riga += f" [fetch {statistiche['fetch']:.1f}s, parsing {statistiche['parsing']:.2f}s, HTTP {statistiche['status']}{pagine}]"
+        if esito['errore']:
+            riga += f" - {esito['errore']}"
+        print(riga)
@@ -0,0 +1,310 @@
+"""
+Notifiche Telegram: invio diretto e coda con digest e rate limiting
+"""
+
+import os
+import queue
+import threading
+import time
+from collections import deque
+from datetime import datetime
+import http_client
+
+LIMITE_MESSAGGIO = 4096
+SEPARATORE_DIGEST = "\n\n➖➖➖➖➖\n\n"
+
+# Telegram consente circa 1 messaggio al secondo per chat (20/minuto nei gruppi)
+MESSAGGI_AL_SECONDO = 1.0
+RAFFICA = 3
+MAX_TENTATIVI = 5
+# Run in cui si riprova una notifica non inviata prima di scartarla
+MAX_RIPRESE = 10
+
+
+def invia_telegram(testo):
+    """
+    Invia un messaggio. Ritorna (esito, retry_after) con esito fra
+    'ok', 'riprova' (HTTP 429), 'errore', 'non_configurato'.
+    """
+    token = os.environ.get('TELEGRAM_TOKEN')
+    chat_id = os.environ.get('TELEGRAM_CHAT_ID')
+
+    if not token or not chat_id:
+        return 'non_configurato', None
+
+    # TELEGRAM_API_URL permette di puntare a un server locale (benchmark offline)
+    api_url = os.environ.get('TELEGRAM_API_URL', 'https://api.telegram.org')
+    url = f"{api_url}/bot{token}/sendMessage"
+    data = {
+        'chat_id': chat_id,
+        'text': testo,
+        'disable_web_page_preview': True
+    }
+
+    try:
+        response = http_client.post(url, json=data, timeout=10)
+    except Exception as e:
+        print(f"❌ Errore Telegram: {e}")
+        return 'errore', None
+
+    if response.status_code == 200:
+        return 'ok', None
+    if response.status_code == 429:
+        try:
+            retry_after = response.json().get('parameters', {}).get('retry_after')
+        except ValueError:
+            retry_after = None
+        return 'riprova', retry_after or int(response.headers.get('Retry-After', 1))
+    print(f"⚠️ Errore invio notifica: {response.status_code}")
+    return 'errore', None
+
+
+def invia_notifica_telegram(testo):
+    """Invio diretto e sincrono di un singolo messaggio"""
+    esito, _ = invia_telegram(testo)
+    if esito == 'ok':
+        print(f"✅ Notifica inviata")
+    elif esito == 'non_configurato':
+        print("⚠️ Token o Chat ID Telegram non configurati")
+
+
+def dividi_messaggio(testo, limite=LIMITE_MESSAGGIO):
+    """Divide un testo troppo lungo in pezzi di al massimo `limite` caratteri, per righe"""
+    if len(testo) <= limite:
+        return [testo]
+    pezzi = []
+    righe = []
+    lunghezza = 0
+    for riga in testo.split('\n'):
+        while len(riga) > limite:
+            pezzi.append(riga[:limite])
+            riga = riga[limite:]
+        if lunghezza + len(riga) + 1 > limite and righe:
+            pezzi.append('\n'.join(righe))
+            righe = []
+            lunghezza = 0
+        righe.append(riga)
+        lunghezza += len(riga) + 1
+    if righe:
+        pezzi.append('\n'.join(righe))
+    return pezzi
+
+
+class TokenBucket:
+    """Rate limiter: `rate` gettoni al secondo, fino a `capacita` accumulabili"""
+
+    def __init__(self, rate=MESSAGGI_AL_SECONDO, capacita=RAFFICA):
+        self.rate = rate
+        self.capacita = capacita
+        self._gettoni = capacita
+        self._ultimo = time.monotonic()
+        self._lock = threading.Lock()
+
+    def attendi(self):
+        """Blocca finché non è disponibile un gettone, poi lo consuma"""
+        while True:
+            with self._lock:
+                ora = time.monotonic()
+                self._gettoni = min(self.capacita, self._gettoni + (ora - self._ultimo) * self.rate)
+                self._ultimo = ora
+                if self._gettoni >= 1:
+                    self._gettoni -= 1
+                    return
+                attesa = (1 - self._gettoni) / self.rate
+            time.sleep(attesa)
+
+    def sospendi(self, secondi):
+        """Svuota il bucket per `secondi` (dopo un 429 con retry_after)"""
+        with self._lock:
+            self._gettoni = -secondi * self.rate
+            self._ultimo = time.monotonic()
+
+
+_FINE = object()
+
+
+class CodaNotifiche:
+    """
+    Coda di invio in background: i messaggi vengono accodati durante la
+    scansione e un worker li spedisce rispettando il rate limit, unendo i
+    messaggi in attesa in digest fino a 4096 caratteri.
+    I messaggi non inviati vengono salvati nel database e rispediti al
+    run successivo (nel demone, a ogni recupera()), per al massimo
+    MAX_RIPRESE tentativi.
+    """
+
+    def __init__(self, db, invia=invia_telegram, rate=MESSAGGI_AL_SECONDO, capacita=RAFFICA):
+        self.db = db
+        self.invia = invia
+        self.bucket = TokenBucket(rate, capacita)
+        self.inviati = 0
+        self.messaggi_inviati = 0
+        self._coda = queue.Queue()
+        self._falliti = []
+        self._recuperati_inviati = []
+        # Protegge le due liste qui sopra: il worker le riempie, salva() le svuota
+        self._lock = threading.Lock()
+        self.in_sospeso = 0
+        # Id di notifiche_in_sospeso già in coda, il cui esito non è ancora salvato
+        self._in_volo = set()
+        self._interrompi = False
+
+        # Prima i messaggi rimasti in sospeso dal run precedente
+        self.recupera()
+
+        self._worker = threading.Thread(target=self._lavora, name='notifiche', daemon=True)
+        self._worker.start()
+
+    def recupera(self):
+        """
+        Rimette in coda i messaggi di notifiche_in_sospeso: all'avvio quelli
+        del run precedente, nel demone periodicamente quelli falliti da allora.
+        """
+        self.salva()
+        in_sospeso = [
+            riga for riga in self.db.conn.execute(
+                'SELECT id, testo, tentativi FROM notifiche_in_sospeso ORDER BY id'
+            )
+            if riga[0] not in self._in_volo
+        ]
+        for id_sospeso, testo, tentativi in in_sospeso:
+            self._in_volo.add(id_sospeso)
+            self._coda.put({'testo': testo, 'id': id_sospeso, 'tentativi': tentativi})
+        if in_sospeso:
+            print(f"📨 {len(in_sospeso)} notifiche in sospeso da riprovare")
+        return len(in_sospeso)
+
+    def aggiungi(self, testo):
+        """Accoda un messaggio (non blocca)"""
+        for pezzo in dividi_messaggio(testo):
+            self._coda.put({'testo': pezzo, 'id': None, 'tentativi': 0})
+
+    def _componi_digest(self, primo, rimandati):
+        """Unisce al primo messaggio quelli già in coda, finché stanno nel limite"""
+        voci = [primo]
+        lunghezza = len(primo['testo'])
+        fine = False
+        while True:
+            if rimandati:
+                voce = rimandati.popleft()
+            else:
+                try:
+                    voce = self._coda.get_nowait()
+                except queue.Empty:
+                    break
+            if voce is _FINE:
+                fine = True
+                continue
+            if lunghezza + len(SEPARATORE_DIGEST) + len(voce['testo']) > LIMITE_MESSAGGIO:
+                rimandati.appendleft(voce)
+                break
+            voci.append(voce)
+            lunghezza += len(SEPARATORE_DIGEST) + len(voce['testo'])
+        return voci, fine
+
+    def _lavora(self):
+        rimandati = deque()
+        fine = False
+        while not (fine and not rimandati):
+            voce = rimandati.popleft() if rimandati else self._coda.get()
+            if voce is _FINE:
+                fine = True
+                continue
+
+            if self._interrompi:
+                with self._lock:
+                    self._falliti.append((voce, 'run terminato'))
+                continue
+
+            # In attesa del gettone si accumulano altri messaggi da unire
+            self.bucket.attendi()
+            voci, fine_trovata = self._componi_digest(voce, rimandati)
+            fine = fine or fine_trovata
+            self._spedisci(voci)
+
+    def _spedisci(self, voci):
+        testo = SEPARATORE_DIGEST.join(v['testo'] for v in voci)
+        tentativi = 0
+        while True:
+            esito, retry_after = self.invia(testo)
+            if esito == 'riprova' and tentativi < MAX_TENTATIVI and not self._interrompi:
+                tentativi += 1
+                print(f"⏳ Telegram: rate limit, riprovo fra {retry_after}s")
+                self.bucket.sospendi(retry_after)
+                self.bucket.attendi()
+                continue
+            break
+
+        if esito == 'ok':
+            self.inviati += 1
+            self.messaggi_inviati += len(voci)
+            with self._lock:
+                self._recuperati_inviati.extend(v['id'] for v in voci if v['id'] is not None)
+        elif esito == 'non_configurato':
+            print("⚠️ Token o Chat ID Telegram non configurati")
+        else:
+            with self._lock:
+                self._falliti.extend((v, esito) for v in voci)
+
+    def chiudi(self, timeout=120):
+        """
+        Attende lo svuotamento della coda (al massimo `timeout` secondi), poi
+        salva nel database i messaggi non inviati.
+        """
+        self._coda.put(_FINE)
+        self._worker.join(timeout)
+        if self._worker.is_alive():
+            self._interrompi = True
+            self._worker.join(15)
+            # Quanto resta in coda non è stato nemmeno tentato
+            while True:
+                try:
+                    voce = self._coda.get_nowait()
+                except queue.Empty:
+                    break
+                if voce is not _FINE:
+                    with self._lock:
+                        self._falliti.append((voce, 'run terminato'))
+
+        self.salva()
+        print(f"📨 Notifiche: {self.messaggi_inviati} messaggi in {self.inviati} invii, {self.in_sospeso} in sospeso")
+
+    def salva(self):
+        """
+        Registra nel database i messaggi falliti e quelli recuperati e
+        inviati finora. Il demone la chiama dopo ogni fonte, così un arresto
+        improvviso non perde i messaggi falliti; chiudi() la chiama alla fine.
+        """
+        with self._lock:
+            falliti, self._falliti = self._falliti, []
+            recuperati_inviati, self._recuperati_inviati = self._recuperati_inviati, []
+        if not falliti and not recuperati_inviati:
+            return
+        self._in_volo.difference_update(recuperati_inviati)
+        self._in_volo.difference_update(voce['id'] for voce, _ in falliti)
+
+        ora = datetime.now().isoformat()
+        scartati = 0
+        with self.db.conn:
+            self.db.conn.executemany(
+                'DELETE FROM notifiche_in_sospeso WHERE id = ?',
+                [(id_sospeso,) for id_sospeso in recuperati_inviati]
+            )
+            for voce, errore in falliti:
+                if voce['id'] is None:
+                    self.db.conn.execute(
+                        'INSERT INTO notifiche_in_sospeso (testo, tentativi, data_creazione, ultimo_errore) VALUES (?, 1, ?, ?)',
+                        (voce['testo'], ora, errore)
+                    )
+                elif voce['tentativi'] + 1 >= MAX_RIPRESE:
+                    # Non è un problema passeggero: il messaggio non viene più riprovato
+                    self.db.conn.execute('DELETE FROM notifiche_in_sospeso WHERE id = ?', (voce['id'],))
+                    scartati += 1
+                    print(f"🗑️ Notifica scartata dopo {voce['tentativi'] + 1} tentativi ({errore}): "
+                          f"{voce['testo'][:60]}...")
+                else:
+                    self.db.conn.execute(
+                        'UPDATE notifiche_in_sospeso SET tentativi = tentativi + 1, ultimo_errore = ? WHERE id = ?',
+                        (errore, voce['id'])
+                    )
+        self.in_sospeso += len(falliti) - scartati
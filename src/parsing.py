@@ -0,0 +1,55 @@
+"""
+Parsing HTML con lxml: decodifica direttamente dai bytes ed estrae solo i nodi utili
+"""
+
+import re
+import lxml.html
+from lxml import etree
+
+_CHARSET = re.compile(r'charset=["\']?([\w.:-]+)', re.IGNORECASE)
+
+
+def encoding_risposta(response):
+    """Encoding dichiarato nell'header Content-Type, None se assente"""
+    match = _CHARSET.search(response.headers.get('Content-Type', ''))
+    return match.group(1) if match else None
+
+
+def documento(contenuto, encoding=None):
+    """
+    Costruisce l'albero lxml direttamente dai bytes della risposta.
+    Senza encoding esplicito lxml usa il <meta charset> della pagina.
+    """
+    parser = lxml.html.HTMLParser(encoding=encoding, remove_comments=True)
+    doc = lxml.html.document_fromstring(contenuto, parser=parser)
+    # Script e style non contengono testo visibile: si tolgono una volta sola
+    etree.strip_elements(doc, 'script', 'style', with_tail=False)
+    return doc
+
+
+def testo(elemento):
+    """Testo dell'elemento con i frammenti ripuliti e concatenati (come get_text(strip=True))"""
+    return ''.join(frammento.strip() for frammento in elemento.itertext())
+
+
+def righe(elemento):
+    """Righe di testo non vuote dell'elemento (come get_text(separator='\\n'))"""
+    risultato = []
+    for frammento in elemento.itertext():
+        for riga in frammento.split('\n'):
+            riga = riga.strip()
+            if riga:
+                risultato.append(riga)
+    return risultato
+
+
+def link(doc, contiene, pattern=None):
+    """
+    Link <a> il cui href contiene la stringa indicata (filtro XPath, in C)
+    e, se dato, soddisfa il pattern regex.
+    """
+    candidati = doc.xpath('//a[contains(@href, $s)]', s=contiene)
+    if pattern is None:
+        return candidati
+    regex = re.compile(pattern)
+    return [a for a in candidati if regex.search(a.get('href', ''))]
@@ -0,0 +1,174 @@
+"""
+Rendering con browser headless per le fonti che costruiscono l'elenco in JavaScript
+
+Un solo Chrome headless (selenium) resta acceso per tutto il run e parte solo
+al primo uso: le fonti statiche non lo avviano mai. Le pagine passano tutte
+dalla stessa scheda, una alla volta, così cache, connessioni e JIT del
+browser restano caldi fra una fonte e l'altra. Immagini, font, video e
+tracker sono bloccati prima del caricamento.
+
+selenium è opzionale: se manca, o se il browser non parte, il rendering è
+disattivato per il run e gli scraper restano sul download statico.
+"""
+
+import os
+import threading
+import time
+
+# SENTINEL_CHROME: percorso del binario di Chrome/Chromium, se non è quello di sistema
+BINARIO_CHROME = os.environ.get('SENTINEL_CHROME')
+# Tempo massimo di caricamento di una pagina (secondi)
+TIMEOUT = 30
+# Attesa massima dell'elemento indicato dalla fonte con "attendi" (XPath)
+ATTESA = 10
+
+RISORSE_BLOCCATE = [
+    '*.png', '*.jpg', '*.jpeg', '*.gif', '*.webp', '*.svg', '*.ico',
+    '*.woff', '*.woff2', '*.ttf', '*.otf', '*.eot',
+    '*.mp4', '*.webm', '*.mp3',
+    '*google-analytics.com*', '*googletagmanager.com*', '*doubleclick.net*',
+    '*facebook.net*', '*hotjar.com*', '*analytics.js*', '*gtag/js*', '*matomo.js*', '*piwik.js*',
+]
+
+
+class PaginaRenderizzata:
+    """Il DOM dopo gli script, con gli attributi della response di requests usati dagli scraper"""
+
+    status_code = 200
+    headers = {'Content-Type': 'text/html; charset=utf-8'}
+    # page_source è sempre testo: l'encoding della fonte non va applicato
+    renderizzata = True
+
+    def __init__(self, url, html):
+        self.url = url
+        self.content = html.encode('utf-8')
+
+
+class PoolBrowser:
+    """
+    Browser headless condiviso fra gli scraper del run. renderizza() è
+    thread-safe: i thread del motore si mettono in fila sulla scheda.
+    """
+
+    def __init__(self, binario=BINARIO_CHROME, timeout=TIMEOUT, bloccate=RISORSE_BLOCCATE):
+        self.binario = binario
+        self.timeout = timeout
+        self.bloccate = bloccate
+        self.driver = None
+        self.disattivato = False
+        self._scheda = None
+        self._lock = threading.Lock()
+        self.statistiche = {'pagine': 0, 'schede': 0, 'avvio': 0.0, 'tempo': 0.0, 'errori': 0}
+
+    def _avvia(self):
+        try:
+            from selenium import webdriver
+        except ImportError:
+            print("⚠️ selenium non installato: rendering JavaScript disattivato")
+            self.disattivato = True
+            return
+
+        opzioni = webdriver.ChromeOptions()
+        for argomento in ('--headless=new', '--no-sandbox', '--disable-gpu', '--disable-dev-shm-usage',
+                          '--disable-extensions', '--mute-audio', '--blink-settings=imagesEnabled=false'):
+            opzioni.add_argument(argomento)
+        opzioni.add_experimental_option('prefs', {'profile.managed_default_content_settings.images': 2})
+        if self.binario:
+            opzioni.binary_location = self.binario
+
+        inizio = time.monotonic()
+        try:
+            self.driver = webdriver.Chrome(options=opzioni)
+            self.driver.set_page_load_timeout(self.timeout)
+        except Exception as e:
+            print(f"⚠️ Browser headless non avviato ({e}): rendering JavaScript disattivato")
+            self.driver = None
+            self.disattivato = True
+            return
+        self.statistiche['avvio'] = time.monotonic() - inizio
+        self._scheda = self.driver.current_window_handle
+        self._prepara_scheda()
+        print(f"🌐 Browser headless avviato in {self.statistiche['avvio']:.1f}s")
+
+    def _prepara_scheda(self):
+        """Blocca le risorse inutili nella scheda corrente (comandi DevTools)"""
+        self.statistiche['schede'] += 1
+        try:
+            self.driver.execute_cdp_cmd('Network.enable', {})
+            self.driver.execute_cdp_cmd('Network.setBlockedURLs', {'urls': self.bloccate})
+        except Exception as e:
+            # Solo le immagini restano bloccate (dalle preferenze del profilo)
+            print(f"⚠️ Blocco risorse non disponibile: {e}")
+
+    def _sostituisci_scheda(self):
+        """Dopo un errore la scheda può essere bloccata: se ne apre una nuova, o si riavvia il browser"""
+        try:
+            self.driver.switch_to.new_window('tab')
+            nuova = self.driver.current_window_handle
+            self.driver.switch_to.window(self._scheda)
+            self.driver.close()
+            self.driver.switch_to.window(nuova)
+            self._scheda = nuova
+            self._prepara_scheda()
+        except Exception:
+            # Browser non più raggiungibile: ripartirà alla prossima pagina
+            self._chiudi_driver()
+
+    def renderizza(self, url, attendi=None, attesa=ATTESA):
+        """
+        Carica la pagina nel browser e ritorna il DOM dopo gli script
+        (PaginaRenderizzata), oppure None se il rendering non è disponibile.
+        Con attendi (XPath) aspetta fino a `attesa` secondi che l'elemento
+        compaia: gli elenchi caricati via XHR arrivano dopo l'evento load.
+        """
+        with self._lock:
+            if self.driver is None and not self.disattivato:
+                self._avvia()
+            if self.disattivato:
+                return None
+
+            inizio = time.monotonic()
+            try:
+                self.driver.get(url)
+                if attendi:
+                    self._attendi(attendi, attesa)
+                pagina = PaginaRenderizzata(self.driver.current_url, self.driver.page_source)
+            except Exception:
+                self.statistiche['errori'] += 1
+                self._sostituisci_scheda()
+                raise
+            finally:
+                self.statistiche['tempo'] += time.monotonic() - inizio
+            self.statistiche['pagine'] += 1
+            return pagina
+
+    def _attendi(self, xpath, attesa):
+        from selenium.common.exceptions import TimeoutException
+        from selenium.webdriver.common.by import By
+        from selenium.webdriver.support.ui import WebDriverWait
+        try:
+            WebDriverWait(self.driver, attesa).until(lambda driver: driver.find_elements(By.XPATH, xpath))
+        except TimeoutException:
+            # Si prende il DOM com'è: un elenco davvero vuoto non è un errore
+            print(f"⚠️ {xpath} non comparso in {attesa}s su {self.driver.current_url}")
+
+    def _chiudi_driver(self):
+        driver, self.driver = self.driver, None
+        self._scheda = None
+        if driver is not None:
+            try:
+                driver.quit()
+            except Exception:
+                pass
+
+    def chiudi(self):
+        """
+        Chiude il browser. Non prende il lock: una fonte abbandonata dal
+        motore per timeout non deve trattenere il processo.
+        """
+        if self.driver is None:
+            return
+        self._chiudi_driver()
+        s = self.statistiche
+        print(f"🌐 Rendering: {s['pagine']} pagine in {s['tempo']:.1f}s (avvio {s['avvio']:.1f}s), "
+              f"{s['schede']} schede, {s['errori']} errori")
@@ -0,0 +1,237 @@
+"""
+Rilevanza dei bandi rispetto al profilo di keywords (TF-IDF con NumPy)
+
+Ogni bando è una riga di una matrice sparsa di conteggi, una colonna per
+keyword: le parole del testo normalizzato si cercano, a gruppi di una o più
+parole, in un dizionario frase -> colonna. La matrice sono tre array NumPy
+(riga, colonna, conteggio delle celle non nulle) e il prodotto con i pesi
+del profilo è un np.bincount.
+
+Ogni cella diventa un peso TF-IDF con saturazione del conteggio e
+normalizzazione per lunghezza (come in BM25). La rilevanza grezza è il
+prodotto con i pesi del profilo, riportato in 0-100 con una scala calibrata
+sul corpus: la mediana dei bandi con almeno una keyword vale 50/100. I pesi
+non entrano nella matrice: cambiare KEYWORDS_POSITIVE richiede solo un
+nuovo prodotto.
+
+Frequenze documentali e scala sono salvate in rilevanza_termini e
+rilevanza_corpus: i bandi nuovi di ogni run aggiornano le frequenze,
+ricalcola() ricostruisce tutto, scala compresa, da tutta la tabella bandi.
+
+Uso: python src/rilevanza.py [--db percorso]   (ricalcola tutta la tabella)
+"""
+
+import argparse
+import time
+from array import array
+from collections import namedtuple
+import numpy as np
+from keywords import KEYWORDS_POSITIVE, normalizza, tokenizza
+
+# Saturazione del conteggio e peso della normalizzazione per lunghezza (BM25)
+K1 = 1.2
+B = 0.75
+# Rilevanza grezza che vale 50/100 finché il corpus non ha una scala propria
+# (la mediana sui bandi sintetici di benchmarks/bench_keywords.py)
+SCALA = 110.0
+
+# Celle non nulle della matrice dei conteggi, una riga per testo
+Matrice = namedtuple('Matrice', ['righe', 'colonne', 'conteggi', 'lunghezze'])
+
+
+def testo_bando(bando):
+    return (bando.get('titolo') or '') + ' ' + (bando.get('testo') or '')
+
+
+class Profilo:
+    """
+    Keywords positive come frasi di parole normalizzate, una colonna per
+    frase. Keywords che si normalizzano nella stessa frase diventano un solo
+    termine con la somma dei pesi.
+    """
+
+    def __init__(self, positive):
+        frasi = {}
+        for keyword, peso in positive.items():
+            frase = ' '.join(tokenizza(normalizza(keyword)))
+            if frase:
+                frasi[frase] = frasi.get(frase, 0) + peso
+        self.termini = list(frasi)
+        self.pesi = np.array(list(frasi.values()), dtype=np.float64)
+        self.colonne = {frase: colonna for colonna, frase in enumerate(self.termini)}
+        self.lunghezza_max = max((frase.count(' ') + 1 for frase in frasi), default=0)
+        # Solo da queste parole può cominciare una keyword
+        self.iniziali = {frase.split(' ', 1)[0] for frase in frasi}
+
+    def conta(self, testo):
+        """Colonne delle keywords del testo (una per occorrenza) e numero di parole"""
+        parole = tokenizza(normalizza(testo))
+        trovate = []
+        for i, parola in enumerate(parole):
+            if parola not in self.iniziali:
+                continue
+            for n in range(1, min(self.lunghezza_max, len(parole) - i) + 1):
+                colonna = self.colonne.get(' '.join(parole[i:i + n]))
+                if colonna is not None:
+                    trovate.append(colonna)
+        return trovate, len(parole)
+
+
+def matrice(testi, profilo):
+    """Matrice delle occorrenze delle keywords, una riga per testo"""
+    righe = array('q')
+    colonne = array('q')
+    lunghezze = array('q')
+    for riga, testo in enumerate(testi):
+        trovate, parole = profilo.conta(testo)
+        righe.extend([riga] * len(trovate))
+        colonne.extend(trovate)
+        lunghezze.append(parole)
+    # Una cella per (riga, colonna), con il numero di occorrenze
+    termini = max(len(profilo.termini), 1)
+    celle, conteggi = np.unique(np.array(righe, dtype=np.int64) * termini + np.array(colonne, dtype=np.int64),
+                                return_counts=True)
+    return Matrice(celle // termini, celle % termini, conteggi.astype(np.float64),
+                   np.array(lunghezze, dtype=np.float64))
+
+
+def prodotto(m, valori, vettore):
+    """Prodotto matrice-vettore: per ogni riga, somma di valori * vettore[colonna]"""
+    return np.bincount(m.righe, weights=valori * vettore[m.colonne], minlength=len(m.lunghezze))
+
+
+def tfidf(m, df, documenti, lunghezza_media):
+    """Valori TF-IDF delle celle della matrice (stesso ordine di m.conteggi)"""
+    idf = np.log(1 + (documenti - df + 0.5) / (df + 0.5))
+    norma = K1 * (1 - B + B * m.lunghezze / max(lunghezza_media, 1.0))
+    return m.conteggi * (K1 + 1) / (m.conteggi + norma[m.righe]) * idf[m.colonne]
+
+
+def calibra(grezze):
+    """Scala del corpus: mediana delle rilevanze grezze non nulle, None se non ce ne sono"""
+    positive = grezze[grezze > 0]
+    return float(np.median(positive)) if len(positive) else None
+
+
+def in_centesimi(grezza, scala=SCALA):
+    """0-100, crescente senza saturare: la scala vale 50, il doppio 75, il triplo 87.5"""
+    return np.round(100 * (1 - 0.5 ** (grezza / scala)), 1)
+
+
+class MotoreRilevanza:
+    """
+    Profilo di keywords pesate con le statistiche del corpus. Lavora sulla
+    connessione SQLite (anche da una migrazione, prima che esista Database).
+    """
+
+    def __init__(self, conn, positive=None):
+        self.conn = conn
+        self.profilo = Profilo(KEYWORDS_POSITIVE if positive is None else positive)
+        self.termini = self.profilo.termini
+        self.pesi = self.profilo.pesi
+
+        salvati = {
+            termine: (peso, documenti)
+            for termine, peso, documenti in conn.execute('SELECT termine, peso, documenti FROM rilevanza_termini')
+        }
+        self.df = np.array([salvati.get(termine, (None, 0))[1] for termine in self.termini], dtype=np.float64)
+        riga = conn.execute('SELECT documenti, parole, scala FROM rilevanza_corpus WHERE id = 1').fetchone()
+        self.documenti, self.parole, scala = riga or (0, 0, None)
+        self.scala = scala or SCALA
+        # Pesi o keywords diversi da quelli dell'ultimo ricalcolo: le rilevanze salvate sono vecchie
+        self.profilo_cambiato = {termine: peso for termine, (peso, _) in salvati.items()} != dict(
+            zip(self.termini, self.pesi.tolist()))
+
+    def imposta_corpus(self, m):
+        """Statistiche del corpus ricavate da una matrice che lo contiene tutto"""
+        self.df = np.bincount(m.colonne, minlength=len(self.termini)).astype(np.float64)
+        self.documenti = len(m.lunghezze)
+        self.parole = int(m.lunghezze.sum())
+
+    def grezze(self, m):
+        lunghezza_media = self.parole / self.documenti if self.documenti else 1.0
+        return prodotto(m, tfidf(m, self.df, self.documenti, lunghezza_media), self.pesi)
+
+    def _calcola(self, m):
+        return in_centesimi(self.grezze(m), self.scala)
+
+    def assegna(self, bandi, nuovi=False):
+        """
+        Calcola bando['rilevanza'] per un blocco di bandi. Con nuovi=True i
+        bandi entrano prima nelle frequenze del corpus (vanno poi salvati).
+        """
+        if not bandi:
+            return
+        m = matrice((testo_bando(bando) for bando in bandi), self.profilo)
+        if nuovi:
+            self._aggiungi_al_corpus(m)
+        for bando, valore in zip(bandi, self._calcola(m).tolist()):
+            bando['rilevanza'] = valore
+
+    def _aggiungi_al_corpus(self, m):
+        df_blocco = np.bincount(m.colonne, minlength=len(self.termini))
+        self.df += df_blocco
+        self.documenti += len(m.lunghezze)
+        self.parole += int(m.lunghezze.sum())
+        with self.conn:
+            self.conn.executemany('''
+                INSERT INTO rilevanza_termini (termine, peso, documenti) VALUES (?, ?, ?)
+                ON CONFLICT(termine) DO UPDATE SET documenti = documenti + excluded.documenti
+            ''', [
+                (self.termini[i], float(self.pesi[i]), int(df_blocco[i]))
+                for i in np.flatnonzero(df_blocco)
+            ])
+            self.conn.execute('''
+                INSERT INTO rilevanza_corpus (id, documenti, parole) VALUES (1, ?, ?)
+                ON CONFLICT(id) DO UPDATE SET documenti = excluded.documenti, parole = excluded.parole
+            ''', (self.documenti, self.parole))
+
+    def ricalcola(self):
+        """
+        Ricostruisce frequenze, scala e rilevanza di tutti i bandi in una
+        passata: una matrice per l'intera tabella, un solo prodotto, un solo
+        UPDATE a lotti. Ritorna il numero di bandi.
+        """
+        ids = array('q')
+
+        def testi():
+            for id_bando, titolo, testo in self.conn.execute('SELECT id, titolo, testo FROM bandi'):
+                ids.append(id_bando)
+                yield (titolo or '') + ' ' + (testo or '')
+
+        m = matrice(testi(), self.profilo)
+        self.imposta_corpus(m)
+        grezze = self.grezze(m)
+        self.scala = calibra(grezze) or SCALA
+        valori = in_centesimi(grezze, self.scala)
+
+        with self.conn:
+            self.conn.execute('DELETE FROM rilevanza_termini')
+            self.conn.executemany(
+                'INSERT INTO rilevanza_termini (termine, peso, documenti) VALUES (?, ?, ?)',
+                zip(self.termini, self.pesi.tolist(), self.df.astype(int).tolist())
+            )
+            self.conn.execute(
+                'INSERT OR REPLACE INTO rilevanza_corpus (id, documenti, parole, scala) VALUES (1, ?, ?, ?)',
+                (self.documenti, self.parole, self.scala)
+            )
+            self.conn.executemany('UPDATE bandi SET rilevanza = ? WHERE id = ?', zip(valori.tolist(), ids))
+        self.profilo_cambiato = False
+        return self.documenti
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Ricalcola la rilevanza di tutti i bandi salvati')
+    parser.add_argument('--db', default='data/sentinel.db', help='percorso del database')
+    argomenti = parser.parse_args()
+
+    from database import Database
+    with Database(argomenti.db) as db:
+        inizio = time.perf_counter()
+        totale = MotoreRilevanza(db.conn).ricalcola()
+        durata = time.perf_counter() - inizio
+    print(f"🎯 Rilevanza ricalcolata per {totale} bandi in {durata:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
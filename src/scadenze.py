@@ -0,0 +1,36 @@
+"""
+Normalizzazione delle date di scadenza dei bandi
+"""
+
+import re
+
+MESI = {
+    'gennaio': 1, 'febbraio': 2, 'marzo': 3, 'aprile': 4, 'maggio': 5, 'giugno': 6,
+    'luglio': 7, 'agosto': 8, 'settembre': 9, 'ottobre': 10, 'novembre': 11, 'dicembre': 12,
+}
+
+# 30-06-2025, 15/03/2025, 15.03.2025
+_NUMERICA = re.compile(r'(\d{1,2})[-/\.](\d{1,2})[-/\.](\d{4})')
+# 15 marzo 2025
+_ESTESA = re.compile(r'(\d{1,2})\s+(' + '|'.join(MESI) + r')\s+(\d{4})', re.IGNORECASE)
+
+
+def normalizza_data(testo):
+    """
+    Converte una data di scadenza nei formati usati dalle fonti
+    ("30-06-2025", "15 marzo 2025", "15/03/2025") in ISO "2025-06-30".
+    Ritorna None se la data non è riconosciuta.
+    """
+    if not testo:
+        return None
+    match = _NUMERICA.search(testo)
+    if match:
+        giorno, mese, anno = int(match.group(1)), int(match.group(2)), int(match.group(3))
+    else:
+        match = _ESTESA.search(testo)
+        if not match:
+            return None
+        giorno, mese, anno = int(match.group(1)), MESI[match.group(2).lower()], int(match.group(3))
+    if not (1 <= mese <= 12 and 1 <= giorno <= 31):
+        return None
+    return f"{anno:04d}-{mese:02d}-{giorno:02d}"
@@ -3,40 +3,40 @@ Liguria Sentinel Bot - Main Orchestrator
 """
 
 import os
-import requests
+import archivio
+import http_client
 from datetime import datetime
 from database import Database
-from scrapers import ScraperFILSEPrivati, ScraperFILSEImprese, ScraperRegione, ScraperALFA
-from keywords import filtra_keywords, calcola_score, estrai_keywords_match
+from http_cache import HttpCache
+from allegati import ScaricatorePdf
+from dedup import IndiceBandi
+from simili import IndiceSimili
+from rilevanza import MotoreRilevanza
+from rendering import PoolBrowser
+from scrapers import crea_scrapers
+from keywords import analizza_bando
+import motore
+from motore import scansiona_fonti, stampa_report
+from metriche import Metriche
+from notifiche import CodaNotifiche, invia_notifica_telegram
 
+# Una volta alla settimana (domenica) si scorrono tutte le pagine degli
+# elenchi per recuperare eventuali bandi persi; SENTINEL_PROFONDA=1 la forza
+GIORNO_SCANSIONE_PROFONDA = 6
 
-def invia_notifica_telegram(testo):
-    token = os.environ.get('TELEGRAM_TOKEN')
-    chat_id = os.environ.get('TELEGRAM_CHAT_ID')
-    
-    if not token or not chat_id:
-        print("⚠️ Token o Chat ID Telegram non configurati")
-        return
-    
-    url = f"https://api.telegram.org/bot{token}/sendMessage"
-    data = {
-        'chat_id': chat_id,
-        'text': testo,
-        'disable_web_page_preview': True
-    }
-    
-    try:
-        response = requests.post(url, json=data, timeout=10)
-        if response.status_code == 200:
-            print(f"✅ Notifica inviata")
-        else:
-            print(f"⚠️ Errore invio notifica: {response.status_code}")
-    except Exception as e:
-        print(f"❌ Errore Telegram: {e}")
-
-
-def notifica_nuovo_bando(bando):
-    keywords = bando.get('keywords_match', '') or 'N/A'
+
+def scansione_profonda():
+    return os.environ.get('SENTINEL_PROFONDA') == '1' or datetime.now().weekday() == GIORNO_SCANSIONE_PROFONDA
+
+
+def notifica_nuovo_bando(bando, coda=None):
+    analisi = bando.get('analisi')
+    if analisi is not None:
+        keywords = ', '.join(analisi.keywords) or 'N/A'
+        score = analisi.score
+    else:
+        keywords = bando.get('keywords_match', '') or 'N/A'
+        score = bando.get('score', 0)
     scadenza = bando.get('data_scadenza', '') or 'N/A'
     
     messaggio = f"""🆕 NUOVO BANDO
@@ -46,45 +46,79 @@ def notifica_nuovo_bando(bando):
 🏢 Ente: {bando['ente']}
 📅 Scadenza: {scadenza}
 🏷️ Keywords: {keywords}
+⭐ Score: {score}/100
+🎯 Rilevanza: {bando.get('rilevanza') or 0:.0f}/100
 
 🔗 {bando['url']}"""
     
-    invia_notifica_telegram(messaggio)
+    invia = coda.aggiungi if coda else invia_notifica_telegram
+    invia(messaggio)
+
+
+def notifica_bando_aggiornato(bando, descrizione, coda=None):
+    analisi = bando.get('analisi')
+    score = analisi.score if analisi is not None else bando.get('score', 0)
+    scadenza = bando.get('data_scadenza', '') or 'N/A'
+    
+    messaggio = f"""🔄 BANDO AGGIORNATO
 
+{bando['titolo']}
+
+🏢 Ente: {bando['ente']}
+📅 Scadenza: {scadenza}
+✏️ Modifiche: {descrizione}
+⭐ Score: {score}/100
+🎯 Rilevanza: {bando.get('rilevanza') or 0:.0f}/100
 
-def invia_riepilogo_quindicinale(db):
-    bandi = db.get_tutti_bandi()
+🔗 {bando['url']}"""
     
-    if not bandi:
+    invia = coda.aggiungi if coda else invia_notifica_telegram
+    invia(messaggio)
+
+
+def genera_riepilogo(db, ente=None, min_score=None, limite=4000):
+    """
+    Genera il riepilogo un messaggio alla volta (al massimo `limite` caratteri),
+    leggendo i bandi dal cursore senza caricarli tutti in memoria.
+    """
+    totale = db.conta_riepilogo(ente, min_score)
+    if not totale:
         return
     
     ora = datetime.now().strftime("%d/%m/%Y")
-    messaggio = f"📋 RIEPILOGO QUINDICINALE - {ora}\n"
-    messaggio += f"Tutti i {len(bandi)} bandi nel database:\n\n"
-    
-    for i, bando in enumerate(bandi, 1):
-        scadenza = bando.get('data_scadenza', 'N/A') or 'N/A'
-        messaggio += f"{i}. {bando['titolo'][:80]}\n"
-        messaggio += f"   🏢 {bando['ente']} | 📅 Scade: {scadenza}\n\n"
+    intestazione = f"📋 RIEPILOGO QUINDICINALE - {ora}\n{totale} bandi attivi"
+    if ente:
+        intestazione += f" di {ente}"
+    if min_score is not None:
+        intestazione += f" con score ≥ {min_score}"
+    intestazione += ":\n\n"
     
-    if len(messaggio) <= 4096:
-        invia_notifica_telegram(messaggio)
-    else:
-        righe = messaggio.split('\n')
-        chunk = ""
-        for riga in righe:
-            if len(chunk) + len(riga) + 1 > 4000:
-                invia_notifica_telegram(chunk)
-                chunk = riga + '\n'
-            else:
-                chunk += riga + '\n'
-        if chunk:
-            invia_notifica_telegram(chunk)
+    parti = [intestazione]
+    lunghezza = len(intestazione)
+    for i, (titolo, ente_bando, scadenza) in enumerate(db.itera_riepilogo(ente, min_score), 1):
+        voce = f"{i}. {titolo[:80]}\n   🏢 {ente_bando} | 📅 Scade: {scadenza or 'N/A'}\n\n"
+        if lunghezza + len(voce) > limite:
+            yield ''.join(parti)
+            parti = []
+            lunghezza = 0
+        parti.append(voce)
+        lunghezza += len(voce)
+    if parti:
+        yield ''.join(parti)
+
+
+def invia_riepilogo_quindicinale(db, coda=None, ente=None, min_score=None):
+    invia = coda.aggiungi if coda else invia_notifica_telegram
+    messaggi = 0
+    for messaggio in genera_riepilogo(db, ente, min_score):
+        invia(messaggio)
+        messaggi += 1
     
-    print(f"✅ Riepilogo quindicinale inviato ({len(bandi)} bandi)")
+    if messaggi:
+        print(f"✅ Riepilogo quindicinale inviato ({messaggi} messaggi)")
 
 
-def invia_riepilogo_giornaliero(totale_trovati, totale_nuovi, totale_db):
+def invia_riepilogo_giornaliero(totale_trovati, totale_nuovi, totale_db, coda=None):
     ora = datetime.now().strftime("%d/%m/%Y %H:%M")
     
     if totale_nuovi == 0:
@@ -100,7 +134,85 @@ def invia_riepilogo_giornaliero(totale_trovati, totale_nuovi, totale_db):
 🆕 Nuovi bandi trovati: {totale_nuovi}
 📊 Database: {totale_db} bandi totali"""
     
-    invia_notifica_telegram(messaggio)
+    invia = coda.aggiungi if coda else invia_notifica_telegram
+    invia(messaggio)
+
+
+def elabora_esito(esito, db, indice, simili, rilevanza, coda, scaricatore, metriche):
+    """
+    Filtra, salva e notifica i bandi di una fonte già scansionata.
+    Ritorna (nuovi, aggiornati).
+    """
+    fonte = esito['fonte']
+    bandi = esito['bandi']
+    
+    with metriche.misura(fonte, 'filtro'):
+        # Un solo confronto in memoria fra impronte per tutta la fonte
+        da_valutare, modificati, senza_impronta = indice.classifica(bandi)
+        if len(bandi) > len(da_valutare):
+            print(f"⏭️ Già presenti: {len(bandi) - len(da_valutare)} bandi di {fonte}")
+        
+        candidati = []
+        for bando in da_valutare:
+            analisi = analizza_bando(bando)
+            if analisi.escluso:
+                print(f"❌ Filtrato: {bando['titolo'][:50]}...")
+                continue
+            
+            bando['analisi'] = analisi
+            candidati.append(bando)
+        
+        for bando in modificati:
+            bando['analisi'] = analizza_bando(bando)
+        
+        # Rilevanza TF-IDF di tutta la fonte in un solo prodotto matrice-vettore
+        rilevanza.assegna(candidati, nuovi=True)
+        rilevanza.assegna(modificati)
+    
+    with metriche.misura(fonte, 'database'):
+        if senza_impronta:
+            db.imposta_impronte(senza_impronta)
+        nuovi = db.salva_bandi(candidati)
+        # Lo stesso bando già pubblicato da un'altra fonte non va notificato di nuovo
+        duplicati = simili.collega(nuovi)
+        aggiornati = db.aggiorna_bandi(modificati)
+        simili.aggiorna([bando for bando, _ in aggiornati])
+        for bando in senza_impronta + nuovi + [bando for bando, _ in aggiornati]:
+            indice.aggiungi(bando['chiave'], bando['impronta'])
+    
+    with metriche.misura(fonte, 'notifiche'):
+        for bando in nuovi:
+            if bando['id'] in duplicati:
+                _, titolo, ente, _, valore = duplicati[bando['id']]
+                print(f"🔗 Duplicato ({valore:.0%}) di \"{titolo[:50]}...\" ({ente}): {bando['titolo'][:50]}...")
+                continue
+            print(f"💾 Salvato: {bando['titolo'][:50]}...")
+            notifica_nuovo_bando(bando, coda)
+        
+        for bando, descrizione in aggiornati:
+            print(f"🔄 Aggiornato: {bando['titolo'][:50]}... ({descrizione})")
+            # I quasi-duplicati si notificano solo attraverso il bando canonico
+            if bando['canonico_id'] is None and not bando['analisi'].escluso:
+                notifica_bando_aggiornato(bando, descrizione, coda)
+    
+    metriche.conta(fonte, nuovi=len(nuovi), aggiornati=len(aggiornati))
+    scaricatore.accoda(nuovi + [bando for bando, _ in aggiornati],
+                       esito['scraper'].opzioni_richiesta())
+    return len(nuovi), len(aggiornati)
+
+
+def aggiorna_cache(cache, esito, fallito):
+    """
+    Conferma la nuova versione della pagina solo se la fonte è stata letta e
+    salvata davvero. Dopo un errore la pagina viene dimenticata: al prossimo
+    giro sarà scaricata e analizzata di nuovo invece di risultare invariata.
+    Lo stesso per le fonti passate al rendering JavaScript durante lo scrape.
+    """
+    url = esito['scraper'].url_bandi
+    if fallito or getattr(esito['scraper'], 'cache_da_scartare', False):
+        cache.dimentica(url)
+    else:
+        cache.conferma(url)
 
 
 def main():
@@ -109,60 +221,86 @@ def main():
     print("=" * 60)
     
     db = Database()
+    cache = HttpCache(db)
+    indice = IndiceBandi(db)
+    simili = IndiceSimili(db)
+    rilevanza = MotoreRilevanza(db.conn)
+    if rilevanza.profilo_cambiato:
+        print("🎯 Profilo di keywords cambiato: ricalcolo la rilevanza di tutti i bandi")
+        rilevanza.ricalcola()
+    # Le notifiche partono in background, senza bloccare la scansione
+    coda = CodaNotifiche(db)
+    scaricatore = ScaricatorePdf(db)
+    metriche = Metriche()
+    # Chrome headless, avviato solo se una fonte ne ha bisogno
+    browser = PoolBrowser()
     
-    scrapers = [
-        ScraperFILSEPrivati(),
-        ScraperFILSEImprese(),
-        ScraperRegione(),
-        ScraperALFA(),
-    ]
+    profonda = scansione_profonda()
+    if profonda:
+        print("📚 Scansione profonda: tutte le pagine degli elenchi")
+    scrapers = crea_scrapers(cache=cache, indice=indice, profonda=profonda, browser=browser)
     
     totale_trovati = 0
     totale_nuovi = 0
+    totale_aggiornati = 0
     
-    for scraper in scrapers:
+    # Fetch in parallelo, salvataggio e notifiche in sequenza
+    if profonda:
+        esiti = scansiona_fonti(scrapers, motore.TIMEOUT_FONTE_PROFONDA, motore.BUDGET_TOTALE_PROFONDA)
+    else:
+        esiti = scansiona_fonti(scrapers)
+    browser.chiudi()
+    
+    for esito in esiti:
+        metriche.registra_scansione(esito)
+        fallito = motore.esito_fallito(esito)
         try:
-            bandi = scraper.scrape()
-            totale_trovati += len(bandi)
-            
-            for bando in bandi:
-                if db.bando_esiste(bando['url']):
-                    print(f"⏭️ Già presente: {bando['titolo'][:50]}...")
-                    continue
-                
-                if not filtra_keywords(bando['titolo'], bando.get('testo', '')):
-                    print(f"❌ Filtrato: {bando['titolo'][:50]}...")
-                    continue
-                
-                keywords = estrai_keywords_match(bando['titolo'], bando.get('testo', ''))
-                bando['keywords_match'] = ', '.join(keywords) if keywords else None
-                bando['score'] = 0
-                
-                db.salva_bando(bando)
-                totale_nuovi += 1
-                
-                print(f"💾 Salvato: {bando['titolo'][:50]}...")
-                notifica_nuovo_bando(bando)
+            nuovi, aggiornati = elabora_esito(esito, db, indice, simili, rilevanza, coda, scaricatore, metriche)
+            totale_trovati += len(esito['bandi'])
+            totale_nuovi += nuovi
+            totale_aggiornati += aggiornati
         
         except Exception as e:
-            print(f"❌ Errore scraper {scraper.nome}: {e}")
+            fallito = True
+            print(f"❌ Errore scraper {esito['fonte']}: {e}")
             import traceback
             traceback.print_exc()
+        aggiorna_cache(cache, esito, fallito)
+    
+    # Allegati PDF dei bandi nuovi e aggiornati, in un pool limitato
+    scaricatore.esegui()
+    
+    stampa_report(esiti)
+    statistiche_cache = cache.statistiche()
+    print(f"♻️ Cache HTTP: {statistiche_cache['hit']} pagine invariate, {statistiche_cache['miss']} scaricate")
+    
+    for fonte, fetch, mediana in metriche.rallentamenti(db):
+        print(f"🐢 {fonte}: fetch {fetch:.1f}s contro una mediana di {mediana:.1f}s negli ultimi controlli")
+    metriche.salva(db)
+    metriche.esporta_json()
+    
+    # Bandi scaduti segnati e, dopo GIORNI_CONSERVAZIONE, spostati in archivio
+    archivio.esegui(db, indice)
     
     totale_db = db.conta_bandi()
     print("\n" + "=" * 60)
     print(f"✅ Scansione completata!")
     print(f"🔍 Bandi trovati: {totale_trovati}")
     print(f"🆕 Nuovi bandi: {totale_nuovi}")
+    print(f"🔄 Bandi aggiornati: {totale_aggiornati}")
     print(f"📊 Totale database: {totale_db}")
     print("=" * 60)
     
-    invia_riepilogo_giornaliero(totale_trovati, totale_nuovi, totale_db)
+    invia_riepilogo_giornaliero(totale_trovati, totale_nuovi, totale_db, coda)
     
     giorno = datetime.now().day
     if giorno in [1, 16]:
         print("📋 Invio riepilogo quindicinale...")
-        invia_riepilogo_quindicinale(db)
+        invia_riepilogo_quindicinale(db, coda)
+    
+    coda.chiudi()
+    db.chiudi()
+    http_client.chiudi()
 
 
 if __name__ == "__main__":
@@ -1,215 +1,388 @@
 """
 Scrapers per diverse fonti di bandi
+
+Le fonti sono descritte in fonti.json: ogni voce indica il tipo di scraper
+(una classe registrata in REGISTRO) e i parametri di estrazione.
+Le fonti con elenco paginato indicano url_pagina (modello con {pagina} o
+{offset}), per_pagina, max_pagine e max_pagine_profonda.
+Le fonti che costruiscono l'elenco in JavaScript indicano "js": true (e
+facoltativamente "attendi", un XPath da aspettare): le loro pagine passano
+dal browser headless condiviso (rendering.PoolBrowser). Anche una fonte
+statica che restituisce zero bandi viene riprovata nel browser, salvo
+"fallback_js": false.
 """
 
-import requests
-import urllib3
-from bs4 import BeautifulSoup
 from datetime import datetime
+import json
+import os
 import re
+import time
+import http_client
+import parsing
+from dedup import chiave_url, chiave_titolo
+from keywords import analizza_bando
 
-urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
+# SENTINEL_FONTI permette di usare un file di fonti diverso
+FILE_FONTI = os.environ.get('SENTINEL_FONTI') or os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fonti.json')
 
+# tipo_scraper -> classe
+REGISTRO = {}
 
-class ScraperFILSEPrivati:
 
-    def __init__(self):
-        self.nome = "FILSE Privati"
-        self.url_base = "https://bandifilse.regione.liguria.it"
-        self.url_bandi = "https://bandifilse.regione.liguria.it/"
+def registra(tipo_scraper):
+    """Decoratore che registra una classe di scraper per un tipo di fonte"""
+    def decoratore(classe):
+        REGISTRO[tipo_scraper] = classe
+        return classe
+    return decoratore
+
+
+def scarica(url, cache=None, **kwargs):
+    """
+    Scarica una pagina, passando dalla cache HTTP se disponibile.
+    Ritorna (response, invariato).
+    """
+    if cache is None:
+        return http_client.get(url, **kwargs), False
+    return cache.get(url, **kwargs)
 
-    def scrape(self):
-        bandi = []
-        url_visti = set()
-        try:
-            print(f"🔍 Scansione {self.nome}...")
-            headers = {'User-Agent': 'Mozilla/5.0'}
-            response = requests.get(self.url_bandi, headers=headers, timeout=15, verify=False)
-            if response.status_code != 200:
-                print(f"⚠️ {self.nome} - Status: {response.status_code}")
-                return []
-            soup = BeautifulSoup(response.text, 'html.parser')
-            for elem in soup.find_all('li'):
-                testo = elem.get_text(strip=True)
-                if len(testo) < 10 or len(testo) > 500:
-                    continue
-                titolo = re.sub(r'Clicca qui per.*', '', testo).strip()
-                titolo = re.sub(r'\s+', ' ', titolo).strip()
-                if len(titolo) < 10:
-                    continue
-                url_univoco = self.url_bandi + "#" + re.sub(r'[^a-z0-9]', '-', titolo[:50].lower())
-                if url_univoco in url_visti:
-                    continue
-                url_visti.add(url_univoco)
-                bandi.append({
-                    'titolo': titolo,
-                    'url': url_univoco,
-                    'ente': self.nome,
-                    'testo': testo,
-                    'tipo': 'bando',
-                    'data_trovato': datetime.now().isoformat()
-                })
-                print(f"  ✓ {titolo[:70]}...")
-            print(f"✅ {self.nome}: {len(bandi)} bandi estratti")
-        except Exception as e:
-            print(f"❌ Errore {self.nome}: {e}")
-        return bandi
 
+class BaseScraper:
+    """
+    Logica comune a tutte le fonti: download (con cache), controllo dello
+    status, tempi, gestione errori e costruzione dei bandi.
+    Le sottoclassi implementano solo estrai().
+    """
 
-class ScraperFILSEImprese:
+    def __init__(self, config, cache=None, indice=None, profonda=False, browser=None):
+        self.config = config
+        self.cache = cache
+        # Browser condiviso per le fonti JavaScript (rendering.PoolBrowser)
+        self.browser = browser
+        self.js = config.get('js', False)
+        # Chiavi già note (dedup.IndiceBandi): fermano la paginazione
+        self.indice = indice
+        # Scansione profonda: tutte le pagine fino a max_pagine_profonda
+        self.profonda = profonda
+        self.invariato = False
+        # La pagina statica in cache va scartata (la scarta scraper.aggiorna_cache
+        # nel thread principale: la connessione SQLite non è dei worker)
+        self.cache_da_scartare = False
+        self.id = config['id']
+        self.nome = config['nome']
+        self.ente = config.get('ente', self.nome)
+        self.url_base = config['url_base']
+        self.url_bandi = config['url_bandi']
+        self.encoding = config.get('encoding')
+        self.tipo = config.get('tipo', 'bando')
+        self.timeout = config.get('timeout', http_client.TIMEOUT)
+        self.statistiche = {}
 
-    def __init__(self):
-        self.nome = "FILSE Imprese"
-        self.url_base = "https://filseonline.regione.liguria.it"
-        self.url_bandi = "https://filseonline.regione.liguria.it/FilseWeb/Home.do"
+    def _verify(self):
+        verify = self.config.get('verify')
+        if verify == 'certifi':
+            import certifi
+            return certifi.where()
+        return verify
+
+    def opzioni_richiesta(self):
+        """kwargs per http_client.get (timeout e verifica del certificato della fonte)"""
+        opzioni = {'timeout': self.timeout}
+        verify = self._verify()
+        if verify is not None:
+            opzioni['verify'] = verify
+        return opzioni
+
+    def _scarica(self, url, cache=None):
+        """
+        Ritorna (response, invariato). Le fonti js passano dal browser e mai
+        dalla cache: la pagina statica di un elenco JavaScript non cambia
+        quando cambiano i bandi.
+        """
+        if self.js:
+            pagina = self._renderizza(url)
+            if pagina is not None:
+                return pagina, False
+        inizio = time.monotonic()
+        response, invariato = scarica(url, cache, **self.opzioni_richiesta())
+        self._conta_fetch(inizio, response)
+        return response, invariato
+
+    def _renderizza(self, url):
+        """Pagina renderizzata dal browser condiviso, None se il rendering non è disponibile"""
+        if self.browser is None:
+            return None
+        inizio = time.monotonic()
+        pagina = self.browser.renderizza(url, self.config.get('attendi'))
+        if pagina is not None:
+            self._conta_fetch(inizio, pagina)
+        return pagina
+
+    def _conta_fetch(self, inizio, response):
+        self.statistiche['fetch'] += time.monotonic() - inizio
+        self.statistiche['byte'] += len(response.content)
+        self.statistiche['pagine'] += 1
+
+    def _estrai(self, response):
+        inizio = time.monotonic()
+        if getattr(response, 'renderizzata', False):
+            encoding = parsing.encoding_risposta(response)
+        else:
+            encoding = self.encoding or parsing.encoding_risposta(response)
+        bandi = self.estrai(response.content, encoding)
+        self.statistiche['parsing'] += time.monotonic() - inizio
+        return bandi
+
+    def _fallback_js(self):
+        """
+        La pagina statica non contiene bandi: si riprova nel browser. Se il
+        rendering ne trova, per il resto del run la fonte è trattata come js
+        e la cache della pagina statica va scartata, altrimenti al prossimo
+        giro risulterebbe invariata e il rendering non ripartirebbe.
+        """
+        if self.js or self.browser is None or not self.config.get('fallback_js', True):
+            return []
+        try:
+            pagina = self._renderizza(self.url_bandi)
+        except Exception as e:
+            # Un elenco vuoto per un rendering fallito non è un elenco vuoto vero
+            self.statistiche['errore'] = f"rendering non riuscito: {e}"
+            print(f"⚠️ {self.nome}: rendering non riuscito ({e})")
+            return []
+        if pagina is None:
+            return []
+        bandi = self._estrai(pagina)
+        if bandi:
+            self.js = True
+            self.cache_da_scartare = True
+            print(f"🌐 {self.nome}: {len(bandi)} bandi solo dopo il rendering JavaScript (valutare \"js\": true)")
+        return bandi
 
     def scrape(self):
         bandi = []
+        self.cache_da_scartare = False
+        self.statistiche = {'fetch': 0.0, 'parsing': 0.0, 'status': None, 'byte': 0, 'pagine': 0, 'errore': None}
         try:
             print(f"🔍 Scansione {self.nome}...")
-            headers = {'User-Agent': 'Mozilla/5.0'}
-            response = requests.get(self.url_bandi, headers=headers, timeout=15, verify=False)
-            response.encoding = 'ISO-8859-1'
-            if response.status_code != 200:
+            response, self.invariato = self._scarica(self.url_bandi, self.cache)
+            self.statistiche['status'] = response.status_code
+
+            if self.invariato:
+                print(f"♻️ {self.nome}: pagina invariata, analisi saltata")
+                if not self.profonda:
+                    return []
+            elif response.status_code != 200:
                 print(f"⚠️ {self.nome} - Status: {response.status_code}")
                 return []
-            soup = BeautifulSoup(response.text, 'html.parser')
-            righe = [r.strip() for r in soup.get_text(separator='\n').split('\n') if r.strip()]
-            i = 0
-            while i < len(righe):
-                riga = righe[i]
-                if len(riga) > 30 and i + 1 < len(righe):
-                    testo_vicino = (righe[i+1] if i+1 < len(righe) else '') + ' ' + (righe[i+2] if i+2 < len(righe) else '')
-                    match_date = re.search(r'dal\s+(\d{2}-\d{2}-\d{4})\s*al\s+(\d{2}-\d{2}-\d{4})', testo_vicino, re.IGNORECASE)
-                    if match_date:
-                        data_fine = match_date.group(2)
-                        url_univoco = self.url_bandi + "#" + re.sub(r'[^a-z0-9]', '-', riga[:50].lower())
-                        bandi.append({
-                            'titolo': riga,
-                            'url': url_univoco,
-                            'ente': self.nome,
-                            'testo': f"Domande dal {match_date.group(1)} al {data_fine}. {riga}",
-                            'tipo': 'bando',
-                            'data_scadenza': data_fine,
-                            'data_trovato': datetime.now().isoformat()
-                        })
-                        print(f"  ✓ {riga[:60]}... (scade {data_fine})")
-                        i += 3
-                        continue
-                i += 1
+            else:
+                bandi = self._estrai(response) or self._fallback_js()
+
+            if self.config.get('url_pagina'):
+                bandi += self.pagine_successive(bandi)
+                if bandi:
+                    self.invariato = False
             print(f"✅ {self.nome}: {len(bandi)} bandi estratti")
         except Exception as e:
+            self.statistiche['errore'] = str(e)
             print(f"❌ Errore {self.nome}: {e}")
         return bandi
 
+    def url_pagina(self, pagina):
+        """URL della pagina n dell'elenco (la 1 è url_bandi); il modello usa {pagina} o {offset}"""
+        offset = (pagina - 1) * self.config.get('per_pagina', 10)
+        return self.config['url_pagina'].format(pagina=pagina, offset=offset)
 
-class ScraperRegione:
+    def _tutti_noti(self, bandi):
+        """
+        Vero se la pagina non ha niente da salvare: bandi già noti, oppure
+        esclusi dalle keywords negative (esiti, graduatorie...), che non
+        entrano mai nell'indice e altrimenti non farebbero mai fermare la
+        paginazione.
+        """
+        # Senza indice non si sa cosa è nuovo: ci si ferma alla prima pagina
+        return self.indice is None or all(
+            self.indice.contiene(bando['chiave']) or analizza_bando(bando).escluso for bando in bandi
+        )
 
-    def __init__(self):
-        self.nome = "Regione Liguria"
-        self.url_base = "https://www.regione.liguria.it"
-        self.url_bandi = "https://www.regione.liguria.it/homepage-bandi-e-avvisi/publiccompetitions/"
+    def pagine_successive(self, bandi_prima_pagina):
+        """
+        Scorre le pagine dell'elenco dalla più recente: nel run normale si
+        ferma alla prima pagina che contiene solo bandi già noti (quasi sempre
+        la prima o la seconda), nella scansione profonda prosegue fino
+        all'ultima pagina o a max_pagine_profonda.
+        """
+        if self.profonda:
+            max_pagine = self.config.get('max_pagine_profonda', 50)
+        else:
+            max_pagine = self.config.get('max_pagine', 5)
+            if self._tutti_noti(bandi_prima_pagina):
+                return []
 
-    def scrape(self):
-        bandi = []
-        try:
-            print(f"🔍 Scansione {self.nome}...")
-            headers = {'User-Agent': 'Mozilla/5.0'}
-            response = requests.get(self.url_bandi, headers=headers, timeout=15, verify=False)
+        trovati = []
+        viste = set(bando['chiave'] for bando in bandi_prima_pagina)
+        for pagina in range(2, max_pagine + 1):
+            try:
+                response, _ = self._scarica(self.url_pagina(pagina))
+            except Exception as e:
+                # I bandi delle pagine già lette restano validi
+                print(f"⚠️ {self.nome}: pagina {pagina} non raggiungibile ({e})")
+                break
             if response.status_code != 200:
-                print(f"⚠️ {self.nome} - Status: {response.status_code}")
-                return []
-            soup = BeautifulSoup(response.text, 'html.parser')
-            link_bandi = soup.find_all('a', href=re.compile(r'/publiccompetition/\d+:'))
-            print(f"📄 Trovati {len(link_bandi)} link in {self.nome}")
-            for link in link_bandi:
-                try:
-                    titolo = link.get_text(strip=True)
-                    href = link.get('href', '')
-                    if not titolo or len(titolo) < 10:
-                        continue
-                    url = self.url_base + href if not href.startswith('http') else href
-                    testo = link.parent.get_text(strip=True) if link.parent else titolo
-                    match_data = re.search(r'(\d{1,2})\s+(gennaio|febbraio|marzo|aprile|maggio|giugno|luglio|agosto|settembre|ottobre|novembre|dicembre)\s+(\d{4})', testo, re.IGNORECASE)
-                    bandi.append({
-                        'titolo': titolo,
-                        'url': url,
-                        'ente': self.nome,
-                        'testo': testo,
-                        'tipo': 'bando',
-                        'data_scadenza': match_data.group(0) if match_data else None,
-                        'data_trovato': datetime.now().isoformat()
-                    })
-                    print(f"  ✓ {titolo[:70]}...")
-                except Exception:
-                    continue
-            print(f"✅ {self.nome}: {len(bandi)} bandi estratti")
-        except Exception as e:
-            print(f"❌ Errore {self.nome}: {e}")
-        return bandi
+                break
+            bandi = [bando for bando in self._estrai(response) if bando['chiave'] not in viste]
+            # Pagina vuota, oppure oltre la fine (molti portali ripetono l'ultima pagina)
+            if not bandi:
+                break
+            viste.update(bando['chiave'] for bando in bandi)
+            trovati += bandi
+            if not self.profonda and self._tutti_noti(bandi):
+                break
+        if trovati:
+            print(f"📑 {self.nome}: {len(trovati)} bandi da {self.statistiche['pagine'] - 1} pagine successive")
+        return trovati
 
+    def estrai(self, contenuto, encoding=None):
+        """Estrae i bandi dai bytes della pagina"""
+        raise NotImplementedError
 
-class ScraperALFA:
+    def url_assoluto(self, href):
+        return self.url_base + href if not href.startswith('http') else href
 
-    def __init__(self):
-        self.nome = "ALFA Liguria"
-        self.url_base = "https://www.alfaliguria.it"
-        self.url_bandi = "https://www.alfaliguria.it/index.php/avvisi-attivi-fse-e-altri-fondi"
+    def chiave_frammento(self, titolo):
+        """Identità di un bando senza pagina di dettaglio (vedi dedup.chiave_titolo)"""
+        return chiave_titolo(self.url_bandi, titolo)
 
-    def scrape(self):
-        bandi = []
-        try:
-            print(f"🔍 Scansione {self.nome}...")
-            import certifi
-            import ssl
-            import socket
+    def url_frammento(self, chiave):
+        """URL univoco per le fonti senza pagina di dettaglio"""
+        return self.url_bandi + "#" + chiave[:8].hex()
 
-            # Test connessione diretta
-            headers = {
-                'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36',
-                'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8',
-                'Accept-Language': 'it-IT,it;q=0.9',
-            }
+    def crea_bando(self, titolo, url, testo, data_scadenza=None, chiave=None):
+        return {
+            'titolo': titolo,
+            'url': url,
+            'chiave': chiave or chiave_url(url),
+            'ente': self.ente,
+            'testo': testo,
+            'tipo': self.tipo,
+            'data_scadenza': data_scadenza,
+            'data_trovato': datetime.now().isoformat()
+        }
 
-            session = requests.Session()
-            session.verify = certifi.where()
 
-            response = session.get(self.url_bandi, headers=headers, timeout=20)
+@registra('elenco')
+class ScraperElenco(BaseScraper):
+    """
+    Un bando per elemento di un elenco (es. <li>), senza pagina di dettaglio.
+    Config: selettore (XPath), rimuovi (regex tolta dal titolo), lunghezza_min, lunghezza_max
+    """
 
-            if response.status_code != 200:
-                print(f"⚠️ {self.nome} - Status: {response.status_code}")
-                return []
+    def estrai(self, contenuto, encoding=None):
+        bandi = []
+        chiavi_viste = set()
+        rimuovi = re.compile(self.config['rimuovi']) if self.config.get('rimuovi') else None
+        lunghezza_min = self.config.get('lunghezza_min', 10)
+        lunghezza_max = self.config.get('lunghezza_max', 500)
+        doc = parsing.documento(contenuto, encoding)
+        for elem in doc.xpath(self.config.get('selettore', '//li')):
+            testo = parsing.testo(elem)
+            if len(testo) < lunghezza_min or len(testo) > lunghezza_max:
+                continue
+            titolo = rimuovi.sub('', testo).strip() if rimuovi else testo
+            titolo = re.sub(r'\s+', ' ', titolo).strip()
+            if len(titolo) < lunghezza_min:
+                continue
+            chiave = self.chiave_frammento(titolo)
+            if chiave in chiavi_viste:
+                continue
+            chiavi_viste.add(chiave)
+            bandi.append(self.crea_bando(titolo, self.url_frammento(chiave), testo, chiave=chiave))
+            print(f"  ✓ {titolo[:70]}...")
+        return bandi
 
-            soup = BeautifulSoup(response.text, 'html.parser')
-            link_bandi = soup.find_all('a', href=re.compile(r'/index\.php/avvisi-attivi-fse-e-altri-fondi/\d+'))
-            print(f"📄 Trovati {len(link_bandi)} link in {self.nome}")
-
-            for link in link_bandi:
-                try:
-                    titolo = link.get_text(strip=True)
-                    href = link.get('href', '')
-                    if not titolo or len(titolo) < 10:
-                        continue
-                    if titolo.lower() in ['avvisi attivi fse e altri fondi', 'vai alla pagina dedicata']:
-                        continue
-                    url = self.url_base + href if not href.startswith('http') else href
-                    testo = link.parent.get_text(strip=True) if link.parent else titolo
-                    match_data = re.search(r'(\d{1,2})[/\.](\d{1,2})[/\.](\d{4})', testo)
-                    bandi.append({
-                        'titolo': titolo,
-                        'url': url,
-                        'ente': self.nome,
-                        'testo': testo,
-                        'tipo': 'avviso FSE',
-                        'data_scadenza': match_data.group(0) if match_data else None,
-                        'data_trovato': datetime.now().isoformat()
-                    })
-                    print(f"  ✓ {titolo[:70]}...")
-                except Exception:
+
+@registra('righe_date')
+class ScraperRigheDate(BaseScraper):
+    """
+    Pagina di solo testo: un titolo seguito, nelle due righe successive, dal
+    periodo di apertura.
+    Config: regex_periodo (due gruppi: inizio e fine), lunghezza_min
+    """
+
+    def estrai(self, contenuto, encoding=None):
+        bandi = []
+        regex_periodo = re.compile(self.config['regex_periodo'], re.IGNORECASE)
+        lunghezza_min = self.config.get('lunghezza_min', 30)
+        doc = parsing.documento(contenuto, encoding)
+        righe = parsing.righe(doc)
+        i = 0
+        while i < len(righe):
+            riga = righe[i]
+            if len(riga) > lunghezza_min and i + 1 < len(righe):
+                testo_vicino = (righe[i+1] if i+1 < len(righe) else '') + ' ' + (righe[i+2] if i+2 < len(righe) else '')
+                match_date = regex_periodo.search(testo_vicino)
+                if match_date:
+                    data_fine = match_date.group(2)
+                    testo = f"Domande dal {match_date.group(1)} al {data_fine}. {riga}"
+                    chiave = self.chiave_frammento(riga)
+                    bandi.append(self.crea_bando(riga, self.url_frammento(chiave), testo, data_fine, chiave))
+                    print(f"  ✓ {riga[:60]}... (scade {data_fine})")
+                    i += 3
                     continue
+            i += 1
+        return bandi
 
-            print(f"✅ {self.nome}: {len(bandi)} avvisi estratti")
 
-        except Exception as e:
-            print(f"❌ Errore {self.nome}: {e}")
+@registra('link')
+class ScraperLink(BaseScraper):
+    """
+    Un bando per link verso la sua pagina di dettaglio.
+    Config: href_contiene (filtro XPath), href_pattern (regex), regex_data,
+    titoli_esclusi, lunghezza_min
+    """
+
+    def estrai(self, contenuto, encoding=None):
+        bandi = []
+        regex_data = re.compile(self.config['regex_data'], re.IGNORECASE) if self.config.get('regex_data') else None
+        esclusi = set(t.lower() for t in self.config.get('titoli_esclusi', []))
+        lunghezza_min = self.config.get('lunghezza_min', 10)
+        doc = parsing.documento(contenuto, encoding)
+        link_bandi = parsing.link(doc, self.config['href_contiene'], self.config.get('href_pattern'))
+        print(f"📄 Trovati {len(link_bandi)} link in {self.nome}")
+        for link in link_bandi:
+            try:
+                titolo = parsing.testo(link)
+                href = link.get('href', '')
+                if not titolo or len(titolo) < lunghezza_min:
+                    continue
+                if titolo.lower() in esclusi:
+                    continue
+                padre = link.getparent()
+                testo = parsing.testo(padre) if padre is not None else titolo
+                match_data = regex_data.search(testo) if regex_data else None
+                bandi.append(self.crea_bando(titolo, self.url_assoluto(href), testo,
+                                             match_data.group(0) if match_data else None))
+                print(f"  ✓ {titolo[:70]}...")
+            except Exception:
+                continue
         return bandi
+
+
+def carica_fonti(percorso=FILE_FONTI):
+    """Legge le definizioni delle fonti (saltando quelle con "attiva": false)"""
+    with open(percorso, encoding='utf-8') as f:
+        fonti = json.load(f)
+    return [fonte for fonte in fonti if fonte.get('attiva', True)]
+
+
+def crea_scraper(config, cache=None, indice=None, profonda=False, browser=None):
+    tipo_scraper = config['tipo_scraper']
+    if tipo_scraper not in REGISTRO:
+        raise ValueError(f"Tipo di scraper sconosciuto per {config.get('id')}: {tipo_scraper}")
+    return REGISTRO[tipo_scraper](config, cache, indice, profonda, browser)
+
+
+def crea_scrapers(fonti=None, cache=None, indice=None, profonda=False, browser=None):
+    """Istanzia uno scraper per ogni fonte configurata"""
+    if fonti is None:
+        fonti = carica_fonti()
+    return [crea_scraper(config, cache, indice, profonda, browser) for config in fonti]
@@ -0,0 +1,171 @@
+"""
+Quasi-duplicati fra fonti diverse: firme MinHash e indice LSH in SQLite
+
+Lo stesso bando compare spesso su più portali (FILSE, Regione) con titoli
+leggermente diversi. Ogni bando riceve una firma MinHash delle sue parole;
+la firma è divisa in bande e ogni banda finisce in un "secchio" della tabella
+bandi_lsh. Due bandi simili condividono con alta probabilità almeno un
+secchio, quindi i candidati si trovano con una query sull'indice invece di
+confrontare il bando con tutto l'archivio.
+"""
+
+import operator
+import re
+from array import array
+from datetime import datetime
+from hashlib import blake2b
+from keywords import normalizza, tokenizza
+from scadenze import normalizza_data
+
+PERMUTAZIONI = 64
+BANDE = 16
+RIGHE = PERMUTAZIONI // BANDE
+# Similarità di Jaccard stimata oltre la quale due bandi sono lo stesso bando
+SOGLIA = 0.6
+
+# Ogni digest blake2b da 64 byte dà 16 funzioni di hash a 32 bit indipendenti;
+# i sali sono fissi perché le firme salvate restino confrontabili fra run
+_SALI = [b'sentinel-minh-%02d' % i for i in range(PERMUTAZIONI // 16)]
+
+PAROLE_VUOTE = frozenset(
+    'alla alle agli allo dalla dalle dagli dallo della delle degli dello nella nelle negli nello '
+    'sulla sulle sugli sullo con per tra fra che una uno del dei nel nei sul sui dal dai '
+    'gli les the and '
+    # Diciture di contorno, scritte in modo diverso da ogni portale
+    'scadenza domande pubblicato clicca qui accedere'.split()
+)
+
+# Le date si confrontano a parte (scadenza_iso): nel testo sono solo rumore
+_DATE = re.compile(
+    r'\b\d{1,2}[-/.]\d{1,2}[-/.]\d{2,4}\b'
+    r'|\b\d{1,2}\s+(?:gennaio|febbraio|marzo|aprile|maggio|giugno|luglio|agosto|settembre|ottobre|novembre|dicembre)\s+\d{4}\b'
+)
+
+
+def frammenti(bando):
+    """
+    Parole significative di titolo e testo, date escluse. Niente coppie di
+    parole: i titoli sono brevi e basta un articolo diverso per cambiarle tutte.
+    """
+    testo = _DATE.sub(' ', normalizza((bando.get('titolo') or '') + ' ' + (bando.get('testo') or '')))
+    return set(
+        parola for parola in tokenizza(testo)
+        if (len(parola) > 2 or parola.isdigit()) and parola not in PAROLE_VUOTE
+    )
+
+
+def _hash_frammento(frammento):
+    """PERMUTAZIONI hash a 32 bit di un frammento"""
+    dati = frammento.encode('utf-8')
+    valori = array('I')
+    for sale in _SALI:
+        valori.frombytes(blake2b(dati, digest_size=64, salt=sale).digest())
+    return valori
+
+
+def firma(bando):
+    """Firma MinHash (PERMUTAZIONI interi a 32 bit, serializzata in bytes); None senza testo"""
+    insieme = frammenti(bando)
+    if not insieme:
+        return None
+    # Per ogni funzione di hash il valore minimo sui frammenti
+    return array('I', map(min, zip(*map(_hash_frammento, insieme)))).tobytes()
+
+
+def similarita(firma_a, firma_b):
+    """Stima della similarità di Jaccard: quota di minimi uguali"""
+    a = array('I', firma_a)
+    return sum(map(operator.eq, a, array('I', firma_b))) / len(a)
+
+
+def secchi(firma_bytes):
+    """Un secchio LSH (intero a 64 bit con segno) per ogni banda della firma"""
+    larghezza = RIGHE * 4
+    return [
+        int.from_bytes(blake2b(bytes([banda]) + firma_bytes[banda * larghezza:(banda + 1) * larghezza],
+                               digest_size=8).digest(), 'big', signed=True)
+        for banda in range(BANDE)
+    ]
+
+
+class IndiceSimili:
+    """Collega i bandi nuovi a un bando canonico già in archivio, se ne esiste uno simile"""
+
+    def __init__(self, db, soglia=SOGLIA):
+        self.db = db
+        self.soglia = soglia
+
+    def candidati(self, firma_bytes, ente):
+        """Bandi di altri enti che condividono almeno un secchio con la firma"""
+        chiavi = secchi(firma_bytes)
+        segnaposti = ', '.join('?' * len(chiavi))
+        return self.db.conn.execute(f'''
+            SELECT b.id, b.canonico_id, b.scadenza_iso, b.firma
+            FROM bandi b
+            WHERE b.id IN (SELECT bando_id FROM bandi_lsh WHERE secchio IN ({segnaposti}))
+              AND b.ente IS NOT ?
+        ''', chiavi + [ente]).fetchall()
+
+    def canonico(self, bando, firma_bytes, scadenza_iso):
+        """Il bando più simile sopra soglia (id canonico, titolo, ente, url, similarità) o None"""
+        migliore = None
+        valore_migliore = self.soglia
+        for id_bando, canonico_id, scadenza, firma_altro in self.candidati(firma_bytes, bando.get('ente')):
+            if firma_altro is None:
+                continue
+            # Stesso testo ma scadenze diverse: edizioni diverse dello stesso bando
+            if scadenza_iso and scadenza and scadenza_iso != scadenza:
+                continue
+            valore = similarita(firma_bytes, firma_altro)
+            if valore >= valore_migliore:
+                migliore = canonico_id or id_bando
+                valore_migliore = valore
+        if migliore is None:
+            return None
+        titolo, ente, url = self.db.conn.execute(
+            'SELECT titolo, ente, url FROM bandi WHERE id = ?', (migliore,)
+        ).fetchone()
+        return migliore, titolo, ente, url, valore_migliore
+
+    def collega(self, bandi):
+        """
+        Calcola firma e secchi dei bandi appena salvati (serve bando['id']) e
+        li collega al canonico se sono quasi-duplicati di un bando di un'altra
+        fonte. Ritorna {id bando: (id canonico, titolo, ente, url, similarità)}.
+        """
+        duplicati = {}
+        with self.db.conn:
+            for bando in bandi:
+                firma_bytes = firma(bando)
+                if firma_bytes is None:
+                    continue
+                trovato = self.canonico(bando, firma_bytes, normalizza_data(bando.get('data_scadenza')))
+                self.db.conn.execute(
+                    'UPDATE bandi SET firma = ?, canonico_id = ? WHERE id = ?',
+                    (firma_bytes, trovato[0] if trovato else None, bando['id'])
+                )
+                self.db.conn.executemany(
+                    'INSERT OR IGNORE INTO bandi_lsh (secchio, bando_id) VALUES (?, ?)',
+                    [(secchio, bando['id']) for secchio in secchi(firma_bytes)]
+                )
+                if trovato:
+                    duplicati[bando['id']] = trovato
+                    self.db.conn.execute('''
+                        INSERT INTO aggiornamenti (bando_id, tipo_aggiornamento, descrizione, data_aggiornamento)
+                        VALUES (?, 'duplicato', ?, ?)
+                    ''', (trovato[0], f"Pubblicato anche da {bando.get('ente')}: {bando['url']}",
+                          datetime.now().isoformat()))
+        return duplicati
+
+    def aggiorna(self, bandi):
+        """Ricalcola firma e secchi dei bandi il cui contenuto è cambiato (serve bando['id'])"""
+        with self.db.conn:
+            for bando in bandi:
+                firma_bytes = firma(bando)
+                self.db.conn.execute('DELETE FROM bandi_lsh WHERE bando_id = ?', (bando['id'],))
+                self.db.conn.execute('UPDATE bandi SET firma = ? WHERE id = ?', (firma_bytes, bando['id']))
+                if firma_bytes is not None:
+                    self.db.conn.executemany(
+                        'INSERT OR IGNORE INTO bandi_lsh (secchio, bando_id) VALUES (?, ?)',
+                        [(secchio, bando['id']) for secchio in secchi(firma_bytes)]
+                    )
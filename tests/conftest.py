@@ -0,0 +1,65 @@
+import os
+import sys
+import pytest
+
+RADICE = os.path.join(os.path.dirname(__file__), '..')
+sys.path[:0] = [os.path.join(RADICE, 'src'), os.path.join(RADICE, 'benchmarks')]
+
+from database import Database  # noqa: E402
+from dedup import chiave_url, impronta_bando  # noqa: E402
+
+
+class CodaFinta:
+    """Coda notifiche che si limita a raccogliere i messaggi"""
+
+    def __init__(self):
+        self.messaggi = []
+
+    def aggiungi(self, testo):
+        self.messaggi.append(testo)
+
+
+class ScaricatoreFinto:
+    """Scaricatore PDF che non scarica nulla"""
+
+    def accoda(self, bandi, opzioni=None):
+        pass
+
+
+def crea_bando(url, **campi):
+    bando = {'titolo': 'Bando per la formazione professionale', 'url': url,
+             'ente': 'Regione Liguria', 'score': 50, 'data_trovato': '2026-01-01'}
+    bando.update(campi)
+    bando['chiave'] = chiave_url(url)
+    bando['impronta'] = impronta_bando(bando)
+    return bando
+
+
+@pytest.fixture
+def db(tmp_path):
+    with Database(str(tmp_path / 'sentinel.db')) as db:
+        yield db
+
+
+@pytest.fixture
+def nuovo_bando():
+    return crea_bando
+
+
+@pytest.fixture
+def salva_bando(db):
+    def salva(url, **campi):
+        bando = crea_bando(url, **campi)
+        db.salva_bandi([bando])
+        return bando
+    return salva
+
+
+@pytest.fixture
+def coda_finta():
+    return CodaFinta()
+
+
+@pytest.fixture
+def scaricatore_finto():
+    return ScaricatoreFinto()
@@ -0,0 +1,169 @@
+"""
+Download degli allegati: ripresa con If-Range e bandi riprovati nei run successivi
+"""
+
+import hashlib
+import os
+import threading
+import allegati
+from allegati import ScaricatorePdf
+from server_locali import ServerLocale, _Handler
+
+VECCHIO = b'%PDF-1.4 versione vecchia ' + b'a' * 5000
+NUOVO = b'%PDF-1.4 versione nuova ' + b'b' * 5000
+
+
+class ServerPdf(ServerLocale):
+    """
+    Un PDF con ETag che rispetta Range e If-Range; interrotto=True tronca le
+    risposte, con trattieni impostato il PDF parte solo dopo trattieni.set()
+    """
+
+    def __init__(self, contenuto, etag):
+        self.contenuto = contenuto
+        self.etag = etag
+        self.interrotto = False
+        self.trattieni = None
+        self.richieste = []
+
+        class Handler(_Handler):
+            def do_GET(self):
+                proprietario = self.server.proprietario
+                proprietario.richieste.append((self.path, dict(self.headers)))
+                if self.path == '/bando':
+                    self._rispondi(200, b'<html><body><a href="/allegato.pdf">Bando</a></body></html>', 'text/html')
+                    return
+                if proprietario.trattieni is not None:
+                    proprietario.trattieni.wait(10)
+                corpo = proprietario.contenuto
+                intervallo = self.headers.get('Range')
+                condizione = self.headers.get('If-Range')
+                inizio = 0
+                if intervallo and (condizione is None or condizione == proprietario.etag):
+                    inizio = int(intervallo.split('=')[1].rstrip('-'))
+                self.send_response(206 if inizio else 200)
+                self.send_header('Content-Type', 'application/pdf')
+                self.send_header('ETag', proprietario.etag)
+                self.send_header('Content-Length', str(len(corpo) - inizio))
+                if inizio:
+                    self.send_header('Content-Range', f'bytes {inizio}-{len(corpo) - 1}/{len(corpo)}')
+                self.end_headers()
+                if proprietario.interrotto:
+                    # Metà del corpo e poi la connessione si chiude
+                    self.wfile.write(corpo[inizio:inizio + 100])
+                    self.close_connection = True
+                else:
+                    self.wfile.write(corpo[inizio:])
+
+        super().__init__(Handler)
+
+
+def prepara_parziale(scaricatore, url, contenuto, etag):
+    parziale = os.path.join(scaricatore.cartella,
+                            hashlib.blake2b(url.encode('utf-8'), digest_size=16).hexdigest() + '.part')
+    with open(parziale, 'wb') as f:
+        f.write(contenuto[:1000])
+    with open(parziale + '.validatore', 'w') as f:
+        f.write(etag)
+    return parziale
+
+
+def test_ripresa_con_validatore_invariato(db, tmp_path):
+    server = ServerPdf(NUOVO, '"v2"')
+    scaricatore = ScaricatorePdf(db, cartella=str(tmp_path / 'pdf'))
+    url = f'{server.url}/allegato.pdf'
+    prepara_parziale(scaricatore, url, NUOVO, '"v2"')
+    try:
+        sha, byte = scaricatore.scarica_file(url)
+    finally:
+        server.chiudi()
+    assert sha == hashlib.sha256(NUOVO).hexdigest() and byte == len(NUOVO)
+    assert server.richieste[0][1]['Range'] == 'bytes=1000-'
+    assert scaricatore.statistiche['byte'] == len(NUOVO) - 1000
+
+
+def test_file_cambiato_riparte_da_zero(db, tmp_path):
+    server = ServerPdf(NUOVO, '"v2"')
+    scaricatore = ScaricatorePdf(db, cartella=str(tmp_path / 'pdf'))
+    url = f'{server.url}/allegato.pdf'
+    parziale = prepara_parziale(scaricatore, url, VECCHIO, '"v1"')
+    try:
+        sha, _ = scaricatore.scarica_file(url)
+    finally:
+        server.chiudi()
+    # Il server ignora il Range perché l'ETag è cambiato: niente file misto
+    assert server.richieste[0][1]['If-Range'] == '"v1"'
+    assert sha == hashlib.sha256(NUOVO).hexdigest()
+    assert not os.path.exists(parziale) and not os.path.exists(parziale + '.validatore')
+
+
+def test_bando_fallito_ripreso_al_run_successivo(db, salva_bando, tmp_path, monkeypatch):
+    monkeypatch.setattr(allegati.time, 'sleep', lambda secondi: None)
+    server = ServerPdf(NUOVO, '"v2"')
+    bando = salva_bando(f'{server.url}/bando')
+    try:
+        server.interrotto = True
+        scaricatore = ScaricatorePdf(db, cartella=str(tmp_path / 'pdf'))
+        scaricatore.accoda([bando])
+        scaricatore.esegui()
+        tentativi, = db.conn.execute('SELECT tentativi FROM allegati_in_sospeso').fetchone()
+        assert tentativi == 1
+
+        # Run successivo: nessun bando nuovo, ma quello in sospeso viene riaccodato
+        monkeypatch.setattr(allegati, 'ATTESA_RIPRESA', 0)
+        server.interrotto = False
+        scaricatore = ScaricatorePdf(db, cartella=str(tmp_path / 'pdf'))
+        scaricatore.esegui()
+    finally:
+        server.chiudi()
+    assert db.conn.execute('SELECT COUNT(*) FROM allegati_in_sospeso').fetchone()[0] == 0
+    assert db.conn.execute('SELECT sha256 FROM pdf_archivio').fetchone()[0] == hashlib.sha256(NUOVO).hexdigest()
+
+
+def test_bando_abbandonato_dopo_max_riprese(db, salva_bando, tmp_path, monkeypatch):
+    monkeypatch.setattr(allegati.time, 'sleep', lambda secondi: None)
+    monkeypatch.setattr(allegati, 'ATTESA_RIPRESA', 0)
+    server = ServerPdf(NUOVO, '"v2"')
+    server.interrotto = True
+    bando = salva_bando(f'{server.url}/bando', titolo='Voucher digitalizzazione', ente=None)
+    try:
+        scaricatore = ScaricatorePdf(db, cartella=str(tmp_path / 'pdf'))
+        scaricatore.accoda([bando])
+        for _ in range(allegati.MAX_RIPRESE):
+            scaricatore.esegui()
+    finally:
+        server.chiudi()
+    assert db.conn.execute('SELECT COUNT(*) FROM allegati_in_sospeso').fetchone()[0] == 0
+
+
+def test_avvia_non_attende_i_download(db, salva_bando, tmp_path):
+    server = ServerPdf(NUOVO, '"v2"')
+    server.trattieni = threading.Event()
+    bando = salva_bando(f'{server.url}/bando')
+    try:
+        scaricatore = ScaricatorePdf(db, cartella=str(tmp_path / 'pdf'))
+        scaricatore.accoda([bando])
+        assert scaricatore.avvia() == 1
+        # Il download è fermo sul server: raccogli() non aspetta
+        assert scaricatore.raccogli() == 1
+        server.trattieni.set()
+        assert scaricatore.raccogli(timeout=None) == 0
+    finally:
+        server.chiudi()
+    assert db.conn.execute('SELECT COUNT(*) FROM pdf_archivio').fetchone()[0] == 1
+
+
+def test_abbandona_lascia_il_bando_in_sospeso(db, salva_bando, tmp_path):
+    server = ServerPdf(NUOVO, '"v2"')
+    server.trattieni = threading.Event()
+    bando = salva_bando(f'{server.url}/bando')
+    try:
+        scaricatore = ScaricatorePdf(db, cartella=str(tmp_path / 'pdf'))
+        scaricatore.accoda([bando])
+        scaricatore.avvia()
+        assert scaricatore.raccogli(timeout=0.2) == 1
+        scaricatore.abbandona()
+    finally:
+        server.trattieni.set()
+        server.chiudi()
+    assert db.conn.execute('SELECT tentativi FROM allegati_in_sospeso').fetchall() == [(1,)]
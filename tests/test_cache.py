@@ -0,0 +1,66 @@
+"""
+La versione di una pagina si conferma in cache solo se la fonte è stata letta davvero
+"""
+
+import pytest
+import motore
+import scrapers
+from http_cache import HttpCache
+from scraper import aggiorna_cache
+from server_locali import ServerPagine
+
+ELENCO = '''<html><body><ul>
+<li>Avviso pubblico per contributi alle imprese del turismo</li>
+<li>Bando per la formazione professionale dei giovani</li>
+</ul></body></html>'''.encode('utf-8')
+
+
+@pytest.fixture
+def server():
+    server = ServerPagine({'/elenco': (ELENCO, 'text/html; charset=utf-8')})
+    yield server
+    server.chiudi()
+
+
+def crea(server, cache):
+    return scrapers.crea_scraper({
+        'id': 'prova',
+        'nome': 'Fonte di prova',
+        'tipo_scraper': 'elenco',
+        'url_base': server.url,
+        'url_bandi': f'{server.url}/elenco',
+        'fallback_js': False,
+    }, cache=cache)
+
+
+def scansiona(scraper, cache):
+    bandi = scraper.scrape()
+    esito = motore.crea_esito(scraper, bandi, motore.esito_completato(scraper, bandi), 0.0)
+    aggiorna_cache(cache, esito, motore.esito_fallito(esito))
+    return esito
+
+
+def test_errore_di_parsing_non_conferma_la_pagina(server, db, monkeypatch):
+    cache = HttpCache(db)
+    scraper = crea(server, cache)
+
+    def rotto(contenuto, encoding=None):
+        raise ValueError('markup inatteso')
+
+    monkeypatch.setattr(scraper, 'estrai', rotto)
+    primo = scansiona(scraper, cache)
+    assert primo['esito'] == 'vuoto' and primo['errore']
+    monkeypatch.undo()
+
+    # Stessa pagina, stesso hash: deve essere analizzata comunque
+    cache = HttpCache(db)
+    secondo = scansiona(crea(server, cache), cache)
+    assert secondo['esito'] == 'ok'
+    assert len(secondo['bandi']) == 2
+
+
+def test_pagina_letta_diventa_invariata(server, db):
+    cache = HttpCache(db)
+    assert scansiona(crea(server, cache), cache)['esito'] == 'ok'
+    cache = HttpCache(db)
+    assert scansiona(crea(server, cache), cache)['esito'] == 'invariato'
@@ -0,0 +1,49 @@
+"""
+I quasi-duplicati fra fonti non compaiono due volte nel riepilogo e non vengono notificati
+"""
+
+from datetime import date, timedelta
+import pytest
+from dedup import IndiceBandi
+from metriche import Metriche
+from rilevanza import MotoreRilevanza
+from scraper import elabora_esito
+from simili import IndiceSimili
+
+TESTO = ('Contributi a fondo perduto per la digitalizzazione delle micro, piccole e medie imprese '
+         'liguri: acquisto di software, hardware e servizi di consulenza per il commercio elettronico.')
+
+
+class Scraper:
+    def opzioni_richiesta(self):
+        return {}
+
+
+@pytest.fixture
+def voucher(nuovo_bando):
+    def crea(ente, url, giorni=30):
+        scadenza = (date.today() + timedelta(days=giorni)).strftime('%d/%m/%Y')
+        return nuovo_bando(url, titolo='Bando voucher digitalizzazione imprese 2026', ente=ente,
+                           testo=TESTO, data_scadenza=scadenza)
+    return crea
+
+
+def test_duplicato_fuori_da_riepilogo_e_notifiche(db, voucher, coda_finta, scaricatore_finto):
+    indice, simili, rilevanza = IndiceBandi(db), IndiceSimili(db), MotoreRilevanza(db.conn)
+
+    def elabora(fonte, bando):
+        esito = {'fonte': fonte, 'bandi': [bando], 'scraper': Scraper()}
+        return elabora_esito(esito, db, indice, simili, rilevanza, coda_finta, scaricatore_finto, Metriche())
+
+    elabora('FILSE', voucher('FILSE', 'https://filse.it/bando/1'))
+    elabora('Camera di Commercio', voucher('Camera di Commercio', 'https://camcom.it/bando/7'))
+    assert db.conn.execute('SELECT COUNT(*) FROM bandi WHERE canonico_id IS NOT NULL').fetchone()[0] == 1
+    assert len(coda_finta.messaggi) == 1
+
+    assert db.conta_riepilogo() == 1
+    assert [ente for _, ente, _ in db.itera_riepilogo()] == ['FILSE']
+
+    # La proroga pubblicata solo dalla seconda fonte non genera una notifica
+    assert elabora('Camera di Commercio',
+                   voucher('Camera di Commercio', 'https://camcom.it/bando/7', giorni=60)) == (0, 1)
+    assert len(coda_finta.messaggi) == 1
@@ -0,0 +1,18 @@
+"""
+Verifica dei certificati: attiva di default, disattivabile solo per fonte
+"""
+
+import http_client
+import scrapers
+
+
+def test_sessione_verifica_i_certificati():
+    assert http_client.crea_sessione().verify is True
+
+
+def test_verify_per_fonte():
+    fonti = {fonte['id']: fonte for fonte in scrapers.carica_fonti()}
+    assert scrapers.crea_scraper(fonti['regione']).opzioni_richiesta()['verify'] is False
+    config = dict(fonti['regione'])
+    del config['verify']
+    assert 'verify' not in scrapers.crea_scraper(config).opzioni_richiesta()
@@ -0,0 +1,78 @@
+"""
+Keywords e score dei bandi
+"""
+
+from datetime import date
+import pytest
+from keywords import MatcherKeywords, analizza_bando, get_matcher, punti_scadenza
+
+OGGI = date(2025, 3, 1)
+
+
+@pytest.mark.parametrize('data_scadenza, punti', [
+    ('15/03/2025', 15),
+    ('30-05-2025', 15),
+    ('3 marzo 2025', 5),
+    ('01/03/2025', 5),
+    ('28/02/2025', 0),
+    ('31 dicembre 2025', 10),
+    (None, 5),
+    ('entro fine mese', 5),
+    ('31/02/2025', 5),
+])
+def test_punti_scadenza(data_scadenza, punti):
+    assert punti_scadenza(data_scadenza, OGGI) == punti
+
+
+def test_scadenza_entra_nello_score():
+    bando = {'titolo': 'Bando formazione', 'testo': '', 'ente': 'Comune'}
+    passato = analizza_bando(dict(bando, data_scadenza='01/01/2000'))
+    sconosciuto = analizza_bando(bando)
+    assert passato.dettaglio['scadenza'] == 0 and sconosciuto.dettaglio['scadenza'] == 5
+    assert sconosciuto.score - passato.score == 5
+
+
+@pytest.fixture
+def matcher():
+    return MatcherKeywords({'fondo perduto': 15, 'contributo a fondo perduto': 15, 'turismo': 15,
+                            'PMI': 10, 'piccola media impresa': 10, 'impresa': 8},
+                           ['esiti', 'graduatoria definitiva'])
+
+
+@pytest.mark.parametrize('testo, trovate', [
+    ('Bando per il turismo', ['turismo']),
+    ('Cicloturismo e turistico', []),
+    ('PMI liguri', ['PMI']),
+    ('Ampliamento PMIs', []),
+    ('Fondo non perduto', []),
+    ("Contributo a fondo perduto per l'impresa", ['contributo a fondo perduto', 'fondo perduto', 'impresa']),
+    ('Contributo a un fondo perduto', ['fondo perduto']),
+    ('Fondo PERDUTO per la piccola  media impresa', ['fondo perduto', 'piccola media impresa', 'impresa']),
+])
+def test_confini_di_parola_e_sovrapposizioni(matcher, testo, trovate):
+    negative, positive, _ = matcher.analizza(testo)
+    assert negative == [] and sorted(positive) == sorted(trovate)
+
+
+def test_pesi_delle_keywords_sovrapposte(matcher):
+    assert matcher.analizza('contributo a fondo perduto')[2] == 30
+
+
+@pytest.mark.parametrize('testo, negative', [
+    ('Esiti del bando turismo', ['esiti']),
+    ('Graduatoria definitiva turismo', ['graduatoria definitiva']),
+    ('Graduatoria provvisoria turismo', []),
+    ('Esitì del bando', ['esiti']),
+    ('Requisiti del bando', []),
+])
+def test_keywords_negative(matcher, testo, negative):
+    assert matcher.analizza(testo)[0] == negative
+
+
+def test_esclusione_nello_score():
+    assert get_matcher().analizza('Esiti della formazione')[0] == ['esiti']
+    bando = {'titolo': 'Formazione turismo', 'testo': '', 'ente': 'Comune'}
+    assert not analizza_bando(bando).escluso
+    escluso = analizza_bando(dict(bando, titolo='Graduatoria definitiva formazione turismo'))
+    assert escluso.escluso and escluso.negative == ['graduatoria definitiva']
+    assert escluso.keywords == ['formazione', 'turismo']
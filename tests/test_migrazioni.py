@@ -0,0 +1,56 @@
+"""
+Aggiornamento di un database creato dallo schema originale (prima delle migrazioni)
+"""
+
+import os
+import subprocess
+import types
+import pytest
+import migrazioni
+from database import Database
+from dedup import chiave_url
+
+# Commit di partenza, con il database.py senza user_version
+BASELINE = '5c34756'
+RADICE = os.path.join(os.path.dirname(__file__), '..')
+
+
+@pytest.fixture
+def database_originale():
+    try:
+        sorgente = subprocess.run(['git', 'show', f'{BASELINE}:src/database.py'], capture_output=True,
+                                  text=True, check=True, cwd=RADICE).stdout
+    except (OSError, subprocess.CalledProcessError):
+        pytest.skip(f'database.py di {BASELINE} non disponibile (serve la storia git)')
+    modulo = types.ModuleType('database_originale')
+    exec(compile(sorgente, f'{BASELINE}:src/database.py', 'exec'), modulo.__dict__)
+    return modulo.Database
+
+
+def test_aggiorna_database_originale(tmp_path, database_originale):
+    percorso = str(tmp_path / 'dati' / 'sentinel.db')
+    vecchio = database_originale(percorso)
+    for titolo, url, scadenza in [
+        ('Voucher digitalizzazione', 'https://filse.it/bandi/voucher', '30-06-2025'),
+        ('Bando turismo', 'https://regione.liguria.it/bandi#bando-turismo', '15 marzo 2025'),
+        # Stessa pagina e stesso titolo normalizzato: con la nuova identità è lo stesso bando
+        ('Bando Turismo!', 'https://regione.liguria.it/bandi#bando-turismo-1', None),
+        ('Formazione FSE', 'https://alfa.it/formazione', 'entro fine mese'),
+    ]:
+        assert vecchio.salva_bando({'titolo': titolo, 'url': url, 'data_scadenza': scadenza,
+                                    'data_trovato': '2025-01-01'})
+
+    with Database(percorso) as db:
+        assert migrazioni.versione_corrente(db.conn) == migrazioni.MIGRAZIONI[-1].versione
+        righe = db.conn.execute('SELECT url, chiave, scadenza_iso FROM bandi ORDER BY id').fetchall()
+        assert [scadenza for _, _, scadenza in righe] == ['2025-06-30', '2025-03-15', None, None]
+        chiavi = [chiave for _, chiave, _ in righe]
+        assert chiavi[0] == chiave_url('https://filse.it/bandi/voucher')
+        assert all(len(chiave) == 16 for chiave in chiavi if chiave is not None)
+        # Il doppione resta nello storico senza chiave
+        assert chiavi[2] is None and None not in chiavi[:2] + chiavi[3:]
+        assert len(set(chiavi)) == len(chiavi)
+
+    # Una seconda apertura non riapplica nulla
+    with Database(percorso) as db:
+        assert migrazioni.applica(db.conn) == []
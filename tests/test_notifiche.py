@@ -0,0 +1,75 @@
+"""
+Notifiche non inviate: riprovate nei run successivi, fino a MAX_RIPRESE
+"""
+
+import time
+import notifiche
+from notifiche import CodaNotifiche
+
+
+def sempre_errore(testo):
+    return 'errore', None
+
+
+def in_sospeso(db):
+    return db.conn.execute('SELECT testo, tentativi FROM notifiche_in_sospeso').fetchall()
+
+
+def test_notifica_fallita_resta_in_sospeso(db):
+    coda = CodaNotifiche(db, invia=sempre_errore, rate=1000)
+    coda.aggiungi('Nuovo bando')
+    coda.chiudi()
+    assert in_sospeso(db) == [('Nuovo bando', 1)]
+
+    CodaNotifiche(db, invia=sempre_errore, rate=1000).chiudi()
+    assert in_sospeso(db) == [('Nuovo bando', 2)]
+
+
+def test_notifica_scartata_dopo_max_riprese(db):
+    with db.conn:
+        db.conn.execute('INSERT INTO notifiche_in_sospeso (testo, tentativi) VALUES (?, ?)',
+                        ('Messaggio rifiutato', notifiche.MAX_RIPRESE - 1))
+    CodaNotifiche(db, invia=sempre_errore, rate=1000).chiudi()
+    assert in_sospeso(db) == []
+
+
+def test_salva_registra_i_falliti_senza_chiudere(db):
+    coda = CodaNotifiche(db, invia=sempre_errore, rate=1000)
+    coda.aggiungi('Nuovo bando')
+    # Il worker spedisce in background: si attende che il tentativo sia fatto
+    for _ in range(100):
+        coda.salva()
+        if in_sospeso(db):
+            break
+        time.sleep(0.01)
+    assert in_sospeso(db) == [('Nuovo bando', 1)]
+    coda.chiudi()
+    # chiudi() non lo registra una seconda volta
+    assert in_sospeso(db) == [('Nuovo bando', 1)]
+
+
+def test_recupera_riprova_i_falliti_nello_stesso_processo(db):
+    esiti = ['errore', 'ok']
+    inviati = []
+
+    def invia(testo):
+        esito = esiti.pop(0)
+        if esito == 'ok':
+            inviati.append(testo)
+        return esito, None
+
+    coda = CodaNotifiche(db, invia=invia, rate=1000)
+    coda.aggiungi('Nuovo bando')
+    for _ in range(100):
+        coda.salva()
+        if in_sospeso(db):
+            break
+        time.sleep(0.01)
+    assert in_sospeso(db) == [('Nuovo bando', 1)]
+
+    # Come fa il demone ogni RIPROVA_NOTIFICHE: rimessa in coda una volta sola
+    assert coda.recupera() == 1
+    assert coda.recupera() == 0
+    coda.chiudi()
+    assert inviati == ['Nuovo bando']
+    assert in_sospeso(db) == []
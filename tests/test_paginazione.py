@@ -0,0 +1,61 @@
+"""
+Paginazione dal più recente: ci si ferma alla prima pagina senza niente da salvare
+"""
+
+import pytest
+import scrapers
+from server_locali import ServerPagine
+
+
+def pagina(*titoli):
+    voci = ''.join(f'<li>{titolo}</li>' for titolo in titoli)
+    return (f'<html><body><ul>{voci}</ul></body></html>'.encode('utf-8'), 'text/html; charset=utf-8')
+
+
+@pytest.fixture
+def server():
+    server = ServerPagine({
+        '/elenco': pagina('Avviso pubblico per contributi alle imprese del turismo',
+                          'Esiti della graduatoria del bando formazione 2024'),
+        '/elenco/2': pagina('Bando per la formazione professionale dei giovani'),
+        '/elenco/3': pagina('Voucher per la digitalizzazione delle PMI liguri'),
+    })
+    yield server
+    server.chiudi()
+
+
+class Indice:
+    def __init__(self, chiavi):
+        self.chiavi = set(chiavi)
+
+    def contiene(self, chiave):
+        return chiave in self.chiavi
+
+
+def crea(server, indice=None):
+    return scrapers.crea_scraper({
+        'id': 'prova',
+        'nome': 'Fonte di prova',
+        'tipo_scraper': 'elenco',
+        'url_base': server.url,
+        'url_bandi': f'{server.url}/elenco',
+        'url_pagina': server.url + '/elenco/{pagina}',
+        'max_pagine': 3,
+        'fallback_js': False,
+    }, indice=indice)
+
+
+def test_bando_escluso_non_impedisce_lo_stop(server):
+    prima = crea(server).scrape()
+    # Noto solo il bando salvato: l'esito escluso dalle keywords non entra mai nell'indice
+    indice = Indice(bando['chiave'] for bando in prima if not bando['titolo'].startswith('Esiti'))
+    scraper = crea(server, indice)
+    bandi = scraper.scrape()
+    assert len(bandi) == 2
+    assert scraper.statistiche['pagine'] == 1
+
+
+def test_bando_nuovo_fa_proseguire(server):
+    scraper = crea(server, Indice([]))
+    assert len(scraper.scrape()) == 4
+    assert scraper.statistiche['pagine'] == 3
@@ -0,0 +1,56 @@
+"""
+Fallback JavaScript: i bandi trovati dal browser arrivano fino all'esito e la cache statica si scarta
+"""
+
+import pytest
+import motore
+import scrapers
+from http_cache import HttpCache
+from rendering import PaginaRenderizzata
+from scraper import aggiorna_cache
+from server_locali import ServerPagine
+
+STATICA = b'<html><body><div id="app">Caricamento...</div></body></html>'
+RENDERIZZATA = '''<html><body><ul>
+<li>Avviso pubblico per contributi alle imprese del turismo</li>
+<li>Bando per la formazione professionale dei giovani</li>
+</ul></body></html>'''
+
+
+class BrowserFinto:
+    def __init__(self):
+        self.richieste = []
+
+    def renderizza(self, url, attendi=None):
+        self.richieste.append(url)
+        return PaginaRenderizzata(url, RENDERIZZATA)
+
+
+@pytest.fixture
+def server():
+    server = ServerPagine({'/elenco': (STATICA, 'text/html; charset=utf-8')})
+    yield server
+    server.chiudi()
+
+
+def test_fallback_js_in_scansiona_fonti(server, db):
+    cache = HttpCache(db)
+    browser = BrowserFinto()
+    scraper = scrapers.crea_scraper({
+        'id': 'prova',
+        'nome': 'Fonte di prova',
+        'tipo_scraper': 'elenco',
+        'url_base': server.url,
+        'url_bandi': f'{server.url}/elenco',
+    }, cache=cache, browser=browser)
+
+    # Lo scrape gira in un thread del pool, come nel run vero
+    esito, = motore.scansiona_fonti([scraper])
+    assert esito['esito'] == 'ok' and len(esito['bandi']) == 2
+    assert browser.richieste == [f'{server.url}/elenco']
+
+    # La pagina statica non entra in cache: al prossimo giro si renderizza di nuovo
+    aggiorna_cache(cache, esito, motore.esito_fallito(esito))
+    assert db.conn.execute('SELECT COUNT(*) FROM http_cache').fetchone()[0] == 0
+    esito, = motore.scansiona_fonti([scraper])
+    assert len(esito['bandi']) == 2
@@ -0,0 +1,62 @@
+"""
+Rilevanza TF-IDF: conteggio delle keywords, ordinamento e scala non saturata
+"""
+
+import random
+import sqlite3
+import pytest
+import migrazioni
+import rilevanza
+from bench_keywords import genera_bandi
+
+PROFILO = {'formazione': 20, 'turismo': 15, 'fondo perduto': 15, 'contributo a fondo perduto': 15}
+
+
+@pytest.fixture
+def conn(capsys):
+    conn = sqlite3.connect(':memory:')
+    migrazioni.applica(conn)
+    yield conn
+    conn.close()
+
+
+def test_conta_frasi_e_parole():
+    profilo = rilevanza.Profilo(PROFILO)
+    colonne, parole = profilo.conta('Contributo a FONDO PERDUTO per la formazione; formazione e turismo')
+    assert parole == 10
+    assert sorted(profilo.termini[c] for c in colonne) == [
+        'contributo a fondo perduto', 'fondo perduto', 'formazione', 'formazione', 'turismo']
+    # Le keywords valgono solo come parole intere
+    assert profilo.conta('deformazione turistica')[0] == []
+
+
+def test_ordinamento(conn):
+    motore = rilevanza.MotoreRilevanza(conn, PROFILO)
+    bandi = [
+        {'titolo': 'Bando per la formazione e il turismo', 'testo': 'Contributo a fondo perduto per la formazione.'},
+        {'titolo': 'Bando per la formazione', 'testo': 'Corsi di formazione professionale.'},
+        {'titolo': 'Avviso per il turismo', 'testo': 'Interventi nelle strutture ricettive.'},
+        {'titolo': 'Avviso per lavori stradali', 'testo': 'Manutenzione delle strade provinciali.'},
+    ]
+    # Corpus di riferimento: le keywords rare pesano di più
+    motore.assegna([{'titolo': 'Avviso', 'testo': 'Procedura di gara'} for _ in range(20)], nuovi=True)
+    motore.assegna(bandi, nuovi=True)
+    valori = [bando['rilevanza'] for bando in bandi]
+    assert valori == sorted(valori, reverse=True) and len(set(valori)) == 4
+    assert valori[-1] == 0 and valori[0] < 100
+
+
+def test_scala_calibrata_sul_corpus(conn):
+    with conn:
+        conn.executemany('INSERT INTO bandi (titolo, url, testo) VALUES (?, ?, ?)', [
+            (titolo, f'https://esempio.it/{i}', testo)
+            for i, (titolo, testo) in enumerate(genera_bandi(2000, random.Random(7)))
+        ])
+    motore = rilevanza.MotoreRilevanza(conn)
+    motore.ricalcola()
+    valori = sorted(riga[0] for riga in conn.execute('SELECT rilevanza FROM bandi WHERE rilevanza > 0'))
+    # La mediana vale 50 e i bandi restano distinguibili in alto
+    assert valori[len(valori) // 2] == pytest.approx(50, abs=1)
+    assert valori[int(len(valori) * 0.99)] < 90
+    # La scala resta per i bandi dei run successivi
+    assert rilevanza.MotoreRilevanza(conn).scala == pytest.approx(motore.scala)
@@ -0,0 +1,36 @@
+"""
+Normalizzazione delle date di scadenza nei formati delle fonti
+"""
+
+import pytest
+from scadenze import normalizza_data
+
+
+@pytest.mark.parametrize('testo, iso', [
+    ('15/03/2025', '2025-03-15'),
+    ('30-06-2025', '2025-06-30'),
+    ('15.03.2025', '2025-03-15'),
+    ('5/3/2025', '2025-03-05'),
+    ('15 marzo 2025', '2025-03-15'),
+    ('1 Dicembre 2025', '2025-12-01'),
+    ('Scadenza: 30 giugno 2025 ore 12:00', '2025-06-30'),
+    ('entro il 30-06-2025', '2025-06-30'),
+])
+def test_formati_riconosciuti(testo, iso):
+    assert normalizza_data(testo) == iso
+
+
+@pytest.mark.parametrize('testo', [
+    None,
+    '',
+    'N/A',
+    'entro fine mese',
+    '32/01/2025',
+    '15/13/2025',
+    '00/03/2025',
+    '15/03/25',
+    '15 marzolino 2025',
+    '2025-03-15',
+])
+def test_date_non_riconosciute(testo):
+    assert normalizza_data(testo) is None
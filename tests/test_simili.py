@@ -0,0 +1,91 @@
+"""
+Quasi-duplicati fra fonti: firme MinHash, soglia di similarità e collegamento al canonico
+"""
+
+import pytest
+import simili
+from simili import IndiceSimili, firma, frammenti, similarita
+
+FILSE = {
+    'titolo': 'Bando voucher digitalizzazione imprese 2026',
+    'testo': 'Contributi a fondo perduto per la digitalizzazione delle micro, piccole e medie imprese '
+             'liguri: acquisto di software, hardware e servizi di consulenza. Scadenza 30/06/2026',
+}
+# Lo stesso bando riscritto da un altro portale
+REGIONE = {
+    'titolo': 'Voucher per la digitalizzazione delle imprese 2026',
+    'testo': 'Contributi a fondo perduto per la digitalizzazione di micro, piccole e medie imprese '
+             'liguri: software, hardware e consulenza. Domande entro il 30 giugno 2026',
+}
+# Un altro bando con parte del lessico in comune
+FORMAZIONE = {
+    'titolo': 'Bando formazione turismo 2026',
+    'testo': 'Contributi a fondo perduto per corsi di formazione del personale di alberghi e '
+             'ristoranti liguri.',
+}
+
+
+def jaccard(a, b):
+    a, b = frammenti(a), frammenti(b)
+    return len(a & b) / len(a | b)
+
+
+def test_frammenti_senza_date_e_parole_vuote():
+    assert frammenti({'titolo': 'Scadenza delle domande: 15 marzo 2026 o 30/06/2026', 'testo': 'PMI e ICT'}) \
+        == {'pmi', 'ict'}
+    assert firma({'titolo': 'Scadenza 15 marzo 2026'}) is None
+
+
+@pytest.mark.parametrize('altro', [REGIONE, FORMAZIONE])
+def test_stima_vicina_a_jaccard(altro):
+    assert similarita(firma(FILSE), firma(altro)) == pytest.approx(jaccard(FILSE, altro), abs=0.15)
+
+
+def test_soglia():
+    assert similarita(firma(FILSE), firma(FILSE)) == 1
+    assert similarita(firma(FILSE), firma(REGIONE)) >= simili.SOGLIA
+    assert similarita(firma(FILSE), firma(FORMAZIONE)) < simili.SOGLIA
+
+
+@pytest.fixture
+def pubblica(salva_bando):
+    def salva(ente, url, contenuto, scadenza='30/06/2026'):
+        return salva_bando(url, ente=ente, data_scadenza=scadenza, **contenuto)
+    return salva
+
+
+def test_quasi_duplicato_di_un_altra_fonte(db, pubblica):
+    indice = IndiceSimili(db)
+    originale = pubblica('FILSE', 'https://filse.it/bandi/voucher', FILSE)
+    assert indice.collega([originale]) == {}
+
+    doppione = pubblica('Regione Liguria', 'https://regione.liguria.it/voucher', REGIONE)
+    canonico_id, titolo, ente, url, valore = indice.collega([doppione])[doppione['id']]
+    assert (canonico_id, ente, url) == (originale['id'], 'FILSE', 'https://filse.it/bandi/voucher')
+    assert valore >= simili.SOGLIA
+
+    # Un terzo portale si collega al canonico, non al doppione
+    terzo = pubblica('Camera di Commercio', 'https://camcom.it/voucher', REGIONE)
+    assert indice.collega([terzo])[terzo['id']][0] == originale['id']
+    assert db.conn.execute('SELECT COUNT(*) FROM bandi WHERE canonico_id = ?',
+                           (originale['id'],)).fetchone()[0] == 2
+
+
+@pytest.mark.parametrize('ente, contenuto, scadenza', [
+    ('FILSE', REGIONE, '30/06/2026'),               # stessa fonte: sono due bandi
+    ('Regione Liguria', FORMAZIONE, '30/06/2026'),  # sotto soglia
+    ('Regione Liguria', REGIONE, '31/12/2026'),     # edizione con un'altra scadenza
+])
+def test_non_collegati(db, pubblica, ente, contenuto, scadenza):
+    indice = IndiceSimili(db)
+    indice.collega([pubblica('FILSE', 'https://filse.it/bandi/voucher', FILSE)])
+    assert indice.collega([pubblica(ente, 'https://esempio.it/bando', contenuto, scadenza)]) == {}
+
+
+def test_soglia_configurabile(db, pubblica):
+    valore = similarita(firma(FILSE), firma(REGIONE))
+    severo = IndiceSimili(db, soglia=valore + 0.01)
+    severo.collega([pubblica('FILSE', 'https://filse.it/bandi/voucher', FILSE)])
+    assert severo.collega([pubblica('Regione Liguria', 'https://regione.liguria.it/voucher', REGIONE)]) == {}
+    assert IndiceSimili(db, soglia=valore).collega(
+        [pubblica('Camera di Commercio', 'https://camcom.it/voucher', REGIONE)]) != {}